@@ -0,0 +1,340 @@
+import argparse
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+try:
+    import pgserver
+    PGSERVER_AVAILABLE = True
+except ImportError:
+    PGSERVER_AVAILABLE = False
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+ML_DIR = os.path.dirname(BENCHMARK_DIR)
+RESULTS_DIR = os.environ.get('REDLINE_BENCHMARK_DIR', os.path.join(BENCHMARK_DIR, "results"))
+
+BENCHMARKS = ('simulation', 'kernel', 'features', 'feature_engineer', 'ingestion')
+DB_MODES = ('pgserver', 'env', 'none')
+
+# Metrics where a larger value is better; every other metric is a time, a size or an error.
+HIGHER_IS_BETTER = ('per_sec', 'speedup')
+REGRESSION_THRESHOLD = 0.10
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is in bytes on macOS and in kilobytes on Linux.
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return max_rss / (1024 * 1024) if sys.platform == 'darwin' else max_rss / 1024
+
+
+def latency_summary(seconds) -> dict:
+    milliseconds = np.asarray(seconds) * 1000
+    return {
+        'p50_ms': float(np.percentile(milliseconds, 50)),
+        'p95_ms': float(np.percentile(milliseconds, 95)),
+        'p99_ms': float(np.percentile(milliseconds, 99)),
+        'mean_ms': float(milliseconds.mean()),
+    }
+
+
+def load_synthetic_service(config):
+    # The service module loads its tools at import: point it at a synthetic bundle so it never reaches a database.
+    bundle_path = os.path.join(tempfile.mkdtemp(prefix='redline-bench-'), "serving_bundle.npz")
+    os.environ['REDLINE_SERVING_BUNDLE'] = bundle_path
+    os.environ['REDLINE_INFERENCE_BACKEND'] = 'numpy'
+
+    from benchmarks.synthetic import simulation_fixture
+    from src.model.serving_bundle import save_serving_bundle
+
+    fixture = simulation_fixture(config['seasons'], config['drivers'], config['rounds'], config['sprints'])
+    features_df, model, scaler, driver_encoder, constructor_encoder, noise_factor, snapshot = fixture
+    save_serving_bundle(bundle_path, snapshot, noise_factor, driver_encoder, constructor_encoder)
+    from src.model import simulate_championship as sc
+
+    sc.MODEL, sc.SCALER, sc.NOISE_FACTOR, sc.FEATURE_SNAPSHOT = model, scaler, noise_factor, snapshot
+    sc.DRIVER_ENC, sc.CONSTRUCTOR_ENC = driver_encoder, constructor_encoder
+    sc.N_SIMULATIONS = config['simulations']
+    return sc
+
+
+def bench_simulation(config) -> dict:
+    from benchmarks.synthetic import simulation_request
+
+    sc = load_synthetic_service(config)
+    standings, races = simulation_request(config['drivers'], config['remaining_rounds'], config['remaining_sprints'])
+    results = {}
+    for mode in config['inference_modes']:
+        if mode == 'fused' and not sc.NUMBA_AVAILABLE:
+            continue
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            sc.run_full_simulation(standings, races, inference_mode=mode, seed=0)
+            latencies = []
+            for request in range(config['requests']):
+                started_at = time.perf_counter()
+                outcome = sc.run_full_simulation(standings, races, inference_mode=mode, seed=request + 1)
+                latencies.append(time.perf_counter() - started_at)
+        if isinstance(outcome, dict) and 'error' in outcome:
+            raise RuntimeError(f"{mode} simulation failed: {outcome['error']}")
+
+        results[mode] = {
+            'sims_per_sec': config['simulations'] * len(latencies) / sum(latencies),
+            **latency_summary(latencies),
+        }
+    return results
+
+
+def bench_kernel(config) -> dict:
+    from benchmarks.synthetic import constructor_ids, driver_ids
+
+    sc = load_synthetic_service(config)
+    if not sc.NUMBA_AVAILABLE:
+        return {'skipped': "numba is not installed"}
+
+    drivers = driver_ids(config['drivers'])
+    base_features_df = sc.prepare_simulation_features(sc.FEATURE_SNAPSHOT, drivers,
+                                                      dict(zip(drivers, constructor_ids(config['drivers']))))
+    points_table = sc.build_points_table(base_features_df['driver_points_roll_5'].values,
+                                         base_features_df['constructor_points_roll_5'].values,
+                                         base_features_df['driver_encoded'].values,
+                                         base_features_df['constructor_encoded'].values)
+    n_events = config['remaining_rounds'] + config['remaining_sprints']
+
+    def season_points(mode, n_sims):
+        rngs = [np.random.default_rng(stream_seed) for stream_seed in np.random.SeedSequence(0).spawn(3)]
+        return sc.simulate_season_points(rngs, n_sims, n_events, base_features_df, points_table,
+                                         sc.NOISE_FACTOR, mode)
+
+    # The first call compiles the kernel (or loads it from numba's cache).
+    season_points('fused', 1)
+
+    # The same entry point run_full_simulation uses per chunk, without the reductions around it.
+    results = {}
+    totals = {}
+    for mode in ('tabulated', 'fused'):
+        timings = []
+        for _ in range(config['repeats']):
+            started_at = time.perf_counter()
+            totals[mode] = season_points(mode, config['simulations'])
+            timings.append(time.perf_counter() - started_at)
+        results[mode] = {'sims_per_sec': config['simulations'] / min(timings), 'best_ms': min(timings) * 1000}
+    results['speedup'] = results['tabulated']['best_ms'] / results['fused']['best_ms']
+    results['max_mean_points_gap'] = float(np.abs(totals['fused'].mean(axis=0)
+                                                  - totals['tabulated'].mean(axis=0)).max())
+    return results
+
+
+def bench_features(config) -> dict:
+    from benchmarks.synthetic import constructor_ids, driver_ids, simulation_fixture
+    from src.model.feature_snapshot import lookup_features
+
+    snapshot = simulation_fixture(config['seasons'], config['drivers'], config['rounds'], config['sprints'])[-1]
+    drivers = driver_ids(config['drivers'])
+    constructors = dict(zip(drivers, constructor_ids(config['drivers'])))
+
+    # The function run_full_simulation calls per request, minus the module's import-time tooling.
+    latencies = []
+    for _ in range(config['requests'] * 50):
+        started_at = time.perf_counter()
+        lookup_features(snapshot, drivers, constructors)
+        latencies.append(time.perf_counter() - started_at)
+    return {'prepare_simulation_features': {'requests_per_sec': len(latencies) / sum(latencies),
+                                            **latency_summary(latencies)}}
+
+
+def bench_feature_engineer(config) -> dict:
+    from benchmarks.synthetic import synthetic_history
+    from src.model.data_loader import feature_engineer
+
+    history = synthetic_history(config['seasons'], config['drivers'], config['rounds'], config['sprints'])
+    timings = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(config['repeats']):
+            started_at = time.perf_counter()
+            feature_engineer(history.copy())
+            timings.append(time.perf_counter() - started_at)
+    return {'feature_engineer': {'rows': len(history), 'rows_per_sec': len(history) / min(timings),
+                                 'best_ms': min(timings) * 1000}}
+
+
+def start_database(db_mode):
+    if db_mode == 'pgserver':
+        if not PGSERVER_AVAILABLE:
+            return None, "pgserver is not installed"
+        data_dir = tempfile.mkdtemp(prefix='redline-bench-pg-')
+        server = pgserver.get_server(data_dir, cleanup_mode='delete')
+        server.psql("CREATE DATABASE redline_bench;")
+        os.environ.update({'PG_HOST': data_dir, 'PG_USER': 'postgres', 'PG_PASS': '', 'PG_DB': 'redline_bench'})
+        return server, None
+    if db_mode == 'env':
+        # A disposable local database named by the usual PG_* variables; its tables are dropped and recreated.
+        return None, None
+    return None, "no database requested"
+
+
+def bench_ingestion(config) -> dict:
+    server, reason = start_database(config['db'])
+    if reason:
+        return {'skipped': reason}
+
+    from benchmarks.synthetic import ingestion_events, synthetic_history
+
+    # ingest_data enables FastF1's cache in ./ff1_cache at import; nothing is downloaded here.
+    work_dir = tempfile.mkdtemp(prefix='redline-bench-')
+    os.makedirs(os.path.join(work_dir, "ff1_cache"))
+    os.chdir(work_dir)
+    from database import ingest_data
+    from database.init_db import initialize_schema
+
+    events = ingestion_events(synthetic_history(config['seasons'], config['drivers'], config['rounds'],
+                                                config['sprints']))
+    rows = sum(len(session[2]) for event in events for session in event['sessions'])
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        initialize_schema()
+        with ingest_data.get_db_connection() as conn:
+            ingest_data.ensure_ingestion_state(conn)
+            event_seconds = []
+            started_at = time.perf_counter()
+            for loaded in events:
+                event_started_at = time.perf_counter()
+                if not ingest_data.write_event(conn, loaded):
+                    raise RuntimeError(f"Writing {loaded['year']} R{loaded['round']} failed.")
+                event_seconds.append(time.perf_counter() - event_started_at)
+            elapsed = time.perf_counter() - started_at
+        ingest_data.close_pool()
+
+    if server is not None:
+        server.cleanup()
+    return {'write_event': {'rows': rows, 'events': len(events), 'rows_per_sec': rows / elapsed,
+                            **latency_summary(event_seconds)}}
+
+
+BENCHMARK_FUNCTIONS = {
+    'simulation': bench_simulation,
+    'kernel': bench_kernel,
+    'features': bench_features,
+    'feature_engineer': bench_feature_engineer,
+    'ingestion': bench_ingestion,
+}
+
+
+def run_isolated(name, config) -> dict:
+    # Each benchmark gets a fresh interpreter, so its peak RSS is its own and no import-time state leaks.
+    results = BENCHMARK_FUNCTIONS[name](config)
+    results['peak_rss_mb'] = peak_rss_mb()
+    return results
+
+
+def flatten_metrics(results, prefix='') -> dict:
+    metrics = {}
+    for key, value in results.items():
+        if isinstance(value, dict):
+            metrics.update(flatten_metrics(value, f"{prefix}{key}."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            metrics[f"{prefix}{key}"] = float(value)
+    return metrics
+
+
+def compare_to_baseline(report, baseline) -> list:
+    current = flatten_metrics(report['benchmarks'])
+    reference = flatten_metrics(baseline['benchmarks'])
+    regressions = []
+
+    print(f"\n--- Compared with baseline '{baseline.get('label')}' ---")
+    for metric in sorted(set(current) & set(reference)):
+        if metric.endswith(('.rows', '.events')) or reference[metric] == 0:
+            continue
+        change = current[metric] / reference[metric] - 1
+        higher_is_better = any(token in metric for token in HIGHER_IS_BETTER)
+        regressed = change < -REGRESSION_THRESHOLD if higher_is_better else change > REGRESSION_THRESHOLD
+        if regressed:
+            regressions.append(metric)
+        print(f"  {'!' if regressed else ' '} {metric}: {reference[metric]:.2f} -> {current[metric]:.2f} "
+              f"({change:+.1%})")
+
+    print(f"--- {len(regressions)} regression(s) beyond {REGRESSION_THRESHOLD:.0%} ---")
+    return regressions
+
+
+def run_benchmarks(config, names=BENCHMARKS, label=None, baseline_path=None, results_dir=RESULTS_DIR):
+    report = {
+        'label': label or time.strftime('%Y%m%d-%H%M%S'),
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'machine': {
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'cpus': os.cpu_count(),
+            'platform': platform.platform(),
+        },
+        'config': config,
+        'benchmarks': {},
+    }
+
+    context = multiprocessing.get_context('spawn')
+    for name in names:
+        print(f"--- Running {name} benchmark ---")
+        with context.Pool(1) as pool:
+            results = pool.apply(run_isolated, (name, config))
+        report['benchmarks'][name] = results
+        print(json.dumps(results, indent=2))
+
+    os.makedirs(results_dir, exist_ok=True)
+    path = os.path.join(results_dir, f"{report['label']}.json")
+    with open(path, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"--- Results saved to {path} ---")
+
+    if baseline_path:
+        with open(baseline_path) as f:
+            return report, compare_to_baseline(report, json.load(f))
+    return report, []
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the simulation, feature and ingestion hot paths "
+                                                 "on synthetic data.")
+    parser.add_argument('--only', action='append', choices=BENCHMARKS,
+                        help="Run only this benchmark (repeatable).")
+    parser.add_argument('--seasons', type=int, default=5)
+    parser.add_argument('--drivers', type=int, default=20)
+    parser.add_argument('--rounds', type=int, default=22)
+    parser.add_argument('--sprints', type=int, default=6, help="Sprint events per synthetic season.")
+    parser.add_argument('--remaining-rounds', type=int, default=8)
+    parser.add_argument('--remaining-sprints', type=int, default=2)
+    parser.add_argument('--simulations', type=int, default=50000, help="Monte Carlo runs per request.")
+    parser.add_argument('--requests', type=int, default=10, help="Timed simulation requests per inference mode.")
+    parser.add_argument('--repeats', type=int, default=5)
+    parser.add_argument('--inference-mode', action='append', dest='inference_modes',
+                        choices=('tabulated', 'full', 'fused'))
+    parser.add_argument('--db', choices=DB_MODES, default='pgserver' if PGSERVER_AVAILABLE else 'none',
+                        help="pgserver: throwaway local cluster; env: the PG_* database (its tables are "
+                             "recreated); none: skip ingestion.")
+    parser.add_argument('--label', help="Name of the results file (default: a timestamp).")
+    parser.add_argument('--baseline', help="Results file to compare against; exits non-zero on regressions.")
+    args = parser.parse_args()
+
+    benchmark_config = {
+        'seasons': args.seasons,
+        'drivers': args.drivers,
+        'rounds': args.rounds,
+        'sprints': args.sprints,
+        'remaining_rounds': args.remaining_rounds,
+        'remaining_sprints': args.remaining_sprints,
+        'simulations': args.simulations,
+        'requests': args.requests,
+        'repeats': args.repeats,
+        'inference_modes': args.inference_modes or ['tabulated', 'fused'],
+        'db': args.db,
+    }
+    _, regressions = run_benchmarks(benchmark_config, args.only or BENCHMARKS, args.label, args.baseline)
+    sys.exit(1 if regressions else 0)
@@ -0,0 +1,161 @@
+import numpy as np
+import pandas as pd
+from sklearn.preprocessing import LabelEncoder, StandardScaler
+
+from src.model.data_loader import RESULTS_DTYPES, feature_engineer
+from src.model.feature_snapshot import build_feature_snapshot
+from src.model.numpy_backend import NumpyPointsModel
+
+RACE_POINTS = np.array([25, 18, 15, 12, 10, 8, 6, 4, 2, 1], dtype=np.float64)
+SPRINT_POINTS = np.array([8, 7, 6, 5, 4, 3, 2, 1], dtype=np.float64)
+DNF_PROBABILITY = 0.08
+NUM_FEATURES = ['grid', 'quali_position', 'driver_points_roll_5', 'constructor_points_roll_5']
+
+
+def driver_ids(n_drivers) -> list:
+    return [f"driver_{idx:02d}" for idx in range(n_drivers)]
+
+
+def constructor_ids(n_drivers) -> list:
+    return [f"team_{idx // 2:02d}" for idx in range(n_drivers)]
+
+
+def session_points(n_drivers, classified_order, table):
+    points = np.zeros(n_drivers)
+    scored = min(len(classified_order), len(table))
+    points[classified_order[:scored]] = table[:scored]
+    return points
+
+
+def synthetic_history(seasons=5, drivers=20, rounds=22, sprints=6, start_year=2018, seed=0) -> pd.DataFrame:
+    # Results joined to their qualifying position, as data_loader.fetch_all_data returns them.
+    rng = np.random.default_rng(seed)
+    driver_names = driver_ids(drivers)
+    team_names = constructor_ids(drivers)
+    skill = rng.normal(0, 1, drivers)
+
+    rows = []
+    for year in range(start_year, start_year + seasons):
+        skill += rng.normal(0, 0.3, drivers)
+        sprint_rounds = set(rng.choice(np.arange(1, rounds + 1), size=min(sprints, rounds), replace=False))
+
+        for round_num in range(1, rounds + 1):
+            sessions = [('R', RACE_POINTS)] + ([('S', SPRINT_POINTS)] if round_num in sprint_rounds else [])
+            for session_type, points_table in sessions:
+                quali_order = np.argsort(-(skill + rng.normal(0, 0.6, drivers)))
+                grid = np.empty(drivers, dtype=np.int64)
+                grid[quali_order] = np.arange(1, drivers + 1)
+
+                race_order = np.argsort(-(skill + rng.normal(0, 0.9, drivers) - 0.05 * grid))
+                position = np.empty(drivers, dtype=np.int64)
+                position[race_order] = np.arange(1, drivers + 1)
+                dnf = rng.random(drivers) < DNF_PROBABILITY
+                points = session_points(drivers, race_order[~dnf[race_order]], points_table)
+
+                for idx in range(drivers):
+                    rows.append((year, round_num, session_type, driver_names[idx], team_names[idx], grid[idx],
+                                 position[idx], points[idx], 'Retired' if dnf[idx] else 'Finished', grid[idx]))
+
+    columns = list(RESULTS_DTYPES)
+    return pd.DataFrame(rows, columns=columns).astype(RESULTS_DTYPES)
+
+
+def ingestion_events(history: pd.DataFrame) -> list:
+    # Events shaped like ingest_data.load_event output, ready for ingest_data.write_event.
+    events = {}
+    for (year, round_num, session_type), group in history.groupby(
+            ['race_year', 'race_round', 'session_type'], observed=True, sort=True):
+        year, round_num = int(year), int(round_num)
+        loaded = events.setdefault((year, round_num), {
+            'year': year,
+            'round': round_num,
+            'name': f"Synthetic Grand Prix {round_num}",
+            'circuit': (f"circuit_{round_num:02d}", f"Circuit {round_num}", "Synthetic", "Synthetic"),
+            'date': pd.Timestamp(year=year, month=3, day=1) + pd.Timedelta(weeks=round_num),
+            'sessions': [],
+        })
+
+        driver_names = group['driverid'].astype(str).values
+        team_names = group['constructorid'].astype(str).values
+        drivers = [(driver_id, driver_id[-3:].upper(), driver_id, "", "") for driver_id in driver_names]
+        constructors = [(team_id, team_id, "") for team_id in dict.fromkeys(team_names)]
+
+        results_df = pd.DataFrame({
+            'DriverId': driver_names,
+            'ConstructorId': team_names,
+            'GridPosition': group['grid'].values,
+            'Position': group['position'].astype('int64').values,
+            'Points': group['points'].values,
+            'Status': group['status'].astype(str).values,
+        })
+        loaded['sessions'].append(('results', session_type, results_df, drivers, constructors))
+
+        quali_position = group['quali_position'].to_numpy()
+        lap_times = pd.Series(pd.to_timedelta(80 + 0.1 * quali_position, unit='s'))
+        qualifying_df = pd.DataFrame({
+            'DriverId': driver_names,
+            'ConstructorId': team_names,
+            'Position': quali_position.astype('int64'),
+            'Q1': lap_times,
+            'Q2': lap_times.where(quali_position <= 15),
+            'Q3': lap_times.where(quali_position <= 10),
+        })
+        loaded['sessions'].append(('qualifying', 'Q' if session_type == 'R' else 'SQ', qualifying_df, drivers,
+                                   constructors))
+    return list(events.values())
+
+
+def train_dummy_model(features_df: pd.DataFrame, hidden_units=32, ridge=1e-3, seed=0):
+    # Random ReLU features with a ridge-fitted output layer: trained in milliseconds and served by
+    # the same NumpyPointsModel as the production weights, with the scaler folded into the first layer.
+    rng = np.random.default_rng(seed)
+    driver_encoder = LabelEncoder().fit(features_df['driverid'].astype(str))
+    constructor_encoder = LabelEncoder().fit(features_df['constructorid'].astype(str))
+    X_num = features_df[NUM_FEATURES].fillna(0).to_numpy(np.float64)
+    scaler = StandardScaler().fit(X_num)
+
+    num_kernel = rng.normal(0, 1 / np.sqrt(len(NUM_FEATURES)), (len(NUM_FEATURES), hidden_units))
+    first_bias = rng.normal(0, 0.1, hidden_units)
+    driver_table = rng.normal(0, 0.5, (len(driver_encoder.classes_), hidden_units))
+    constructor_table = rng.normal(0, 0.5, (len(constructor_encoder.classes_), hidden_units))
+
+    folded_kernel = num_kernel / scaler.scale_[:, None]
+    folded_bias = first_bias - (scaler.mean_ / scaler.scale_) @ num_kernel
+    hidden = np.maximum(0, X_num @ folded_kernel + folded_bias
+                        + driver_table[driver_encoder.transform(features_df['driverid'].astype(str))]
+                        + constructor_table[constructor_encoder.transform(features_df['constructorid'].astype(str))])
+
+    design = np.hstack([hidden, np.ones((len(hidden), 1))])
+    target = features_df['points'].to_numpy(np.float64)
+    solution = np.linalg.solve(design.T @ design + ridge * np.eye(design.shape[1]), design.T @ target)
+
+    model = NumpyPointsModel(folded_kernel.astype(np.float32), folded_bias.astype(np.float32),
+                             driver_table.astype(np.float32), constructor_table.astype(np.float32),
+                             [(solution[:-1, None].astype(np.float32), solution[-1:].astype(np.float32), 'linear')])
+    return model, scaler, driver_encoder, constructor_encoder
+
+
+def simulation_fixture(seasons=5, drivers=20, rounds=22, sprints=6, seed=0):
+    history = synthetic_history(seasons, drivers, rounds, sprints, seed=seed)
+    features_df = feature_engineer(history)
+    model, scaler, driver_encoder, constructor_encoder = train_dummy_model(features_df, seed=seed)
+    snapshot = build_feature_snapshot(features_df, driver_encoder, constructor_encoder)
+    noise_factor = float(features_df['points'].std())
+    return features_df, model, scaler, driver_encoder, constructor_encoder, noise_factor, snapshot
+
+
+def simulation_request(n_drivers=20, remaining_rounds=8, sprints=2, seed=0):
+    rng = np.random.default_rng(seed)
+    standings = [
+        {
+            'driver': {'driverId': driver_id},
+            'constructor': {'constructorId': constructor_id},
+            'points': float(points),
+        }
+        for driver_id, constructor_id, points in zip(driver_ids(n_drivers), constructor_ids(n_drivers),
+                                                     np.sort(rng.integers(0, 300, n_drivers))[::-1])
+    ]
+    first_round = 25 - remaining_rounds
+    races = [{'round': str(round_num), **({'Sprint': {}} if idx < sprints else {})}
+             for idx, round_num in enumerate(range(first_round, first_round + remaining_rounds))]
+    return standings, races
@@ -0,0 +1,98 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import psycopg2
+from psycopg2.pool import ThreadedConnectionPool
+
+DB_NAME = os.environ.get('PG_DB', 'redline_db' )
+DB_USER = os.environ.get('PG_USER', 'admin' )
+DB_PASS = os.environ.get('PG_PASS', 'admin')
+DB_HOST = os.environ.get('PG_HOST', 'localhost')
+DB_PORT = os.environ.get('PG_PORT', '5432')
+
+DB_POOL_MIN = int(os.environ.get('PG_POOL_MIN', 1))
+DB_POOL_MAX = int(os.environ.get('PG_POOL_MAX', 8))
+DB_CONNECT_TIMEOUT = int(os.environ.get('PG_CONNECT_TIMEOUT', 5))
+DB_STATEMENT_TIMEOUT_MS = int(os.environ.get('PG_STATEMENT_TIMEOUT_MS', 5 * 60 * 1000))
+DB_CONNECT_RETRIES = int(os.environ.get('PG_CONNECT_RETRIES', 3))
+DB_RETRY_BACKOFF_SECONDS = float(os.environ.get('PG_RETRY_BACKOFF', 0.5))
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+_inherited_pools = []
+
+
+class DatabaseUnavailableError(psycopg2.OperationalError):
+    pass
+
+
+def create_pool() -> ThreadedConnectionPool:
+    last_error = None
+    for attempt in range(DB_CONNECT_RETRIES + 1):
+        if attempt:
+            delay = DB_RETRY_BACKOFF_SECONDS * 2 ** (attempt - 1)
+            print(f"Retrying database connection in {delay:.1f}s ({attempt}/{DB_CONNECT_RETRIES})...")
+            time.sleep(delay)
+        try:
+            return ThreadedConnectionPool(
+                DB_POOL_MIN,
+                DB_POOL_MAX,
+                dbname=DB_NAME,
+                user=DB_USER,
+                password=DB_PASS,
+                host=DB_HOST,
+                port=DB_PORT,
+                connect_timeout=DB_CONNECT_TIMEOUT,
+                options=f"-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}"
+            )
+        except psycopg2.OperationalError as e:
+            last_error = e
+
+    raise DatabaseUnavailableError(f"Could not connect to database '{DB_NAME}' as user '{DB_USER}': {last_error}")
+
+
+def get_pool() -> ThreadedConnectionPool:
+    global _pool, _pool_pid
+    with _pool_lock:
+        # Connections must not cross a fork: a forked worker or pool process opens its own.
+        if _pool is None or _pool_pid != os.getpid():
+            if _pool is not None:
+                # Kept referenced so the child never closes the parent's sockets.
+                _inherited_pools.append(_pool)
+            _pool = create_pool()
+            _pool_pid = os.getpid()
+        return _pool
+
+
+def close_pool():
+    global _pool, _pool_pid
+    with _pool_lock:
+        if _pool is not None and _pool_pid == os.getpid():
+            _pool.closeall()
+        _pool = None
+        _pool_pid = None
+
+
+@contextmanager
+def get_db_connection():
+    pool = get_pool()
+    conn = pool.getconn()
+    broken = False
+    try:
+        yield conn
+        if not conn.closed:
+            conn.commit()
+    except BaseException as e:
+        broken = bool(conn.closed) or isinstance(e, psycopg2.OperationalError)
+        if not conn.closed:
+            try:
+                conn.rollback()
+            except psycopg2.Error:
+                broken = True
+        raise
+    finally:
+        pool.putconn(conn, close=broken or bool(conn.closed))
+
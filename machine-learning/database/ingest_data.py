@@ -1,40 +1,57 @@
-import sys
+import argparse
+import io
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import datetime
+from datetime import timedelta
 
 import fastf1 as ff1
 import pandas as pd
 import psycopg2
 from psycopg2 import sql
-from psycopg2.extensions import connection
+from psycopg2.extras import execute_values
 
-from init_db import DB_HOST
-from init_db import DB_NAME
-from init_db import DB_PASS
-from init_db import DB_PORT
-from init_db import DB_USER
+from database.db import close_pool
+from database.db import get_db_connection
+from database.init_db import INGESTION_STATE_TABLE
+from database.init_db import create_feature_views
+from database.init_db import refresh_feature_views
 
 START_YEAR = 2018
 END_YEAR = datetime.now().year
 CACHE_PATH = 'ff1_cache'
 
+INGEST_WORKERS = int(os.environ.get('REDLINE_INGEST_WORKERS', 4))
+INGEST_EXECUTORS = ('thread', 'process')
+INGEST_EXECUTOR = os.environ.get('REDLINE_INGEST_EXECUTOR', 'thread')
+PREFETCH_PER_WORKER = 2
+# Days after an event before a session with no results is recorded as ingested (with 0 rows) instead of retried.
+INGEST_EMPTY_GRACE_DAYS = int(os.environ.get('REDLINE_INGEST_EMPTY_GRACE_DAYS', 3))
+
+# Schedule session names per stored session type. Sprint qualifying was the 'Sprint Shootout' in 2023 and is
+# 'Sprint Qualifying' from 2024; in 2021-2022 'Sprint Qualifying' was the sprint itself.
+SCHEDULE_SESSION_TYPES = {
+    'Race': 'R',
+    'Qualifying': 'Q',
+    'Sprint': 'S',
+    'Sprint Shootout': 'SQ',
+    'Sprint Qualifying': 'SQ',
+}
+SESSION_ORDER = ('R', 'Q', 'S', 'SQ')
+SESSION_TABLES = {'R': 'results', 'Q': 'qualifying', 'S': 'results', 'SQ': 'qualifying'}
+SESSION_LABELS = {'R': 'Race', 'Q': 'Qualifying', 'S': 'Sprint', 'SQ': 'Sprint Qualifying'}
+
+RESULTS_COLUMNS = ['race_year', 'race_round', 'session_type', 'driverId', 'constructorId',
+                   'grid', 'position', 'points', 'status']
+QUALIFYING_COLUMNS = ['race_year', 'race_round', 'session_type', 'driverId', 'constructorId',
+                      'position', 'q1', 'q2', 'q3']
+SESSION_KEY = ['race_year', 'race_round', 'session_type', 'driverId']
+
 print(f"Initializing FastF1... Cache directory: {CACHE_PATH}")
 ff1.Cache.enable_cache(CACHE_PATH)
 
-def get_db_connection() -> connection:
-    try:
-        conn = psycopg2.connect(
-            dbname=DB_NAME,
-            user=DB_USER,
-            password=DB_PASS,
-            host=DB_HOST,
-            port=DB_PORT
-        )
-        return conn
-    except psycopg2.OperationalError as e:
-        print(f"Error: Could not connect to database '{DB_NAME}' as user '{DB_USER}'.")
-        print(f"Details: {e}")
-        sys.exit(1)
-
 def upsert_circuits(cur, circuit_id, name, location, country):
     query = sql.SQL("""
                     INSERT INTO circuits (circuitId, name, location, country)
@@ -43,21 +60,25 @@ def upsert_circuits(cur, circuit_id, name, location, country):
                     """)
     cur.execute(query, (circuit_id, name, location, country))
 
-def upsert_drivers(cur, driver_id, code, given_name, family_name, nationality):
-    query = sql.SQL("""
-                    INSERT INTO drivers (driverId, code, givenName, familyName, nationality)
-                    VALUES (%s, %s, %s, %s, %s)
-                    ON CONFLICT (driverId) DO NOTHING;
-                    """)
-    cur.execute(query, (driver_id, code, given_name, family_name, nationality))
-
-def upsert_constructors(cur, constructor_id, name, nationality):
-    query = sql.SQL("""
-                    INSERT INTO constructors (constructorId, name, nationality)
-                    VALUES (%s, %s, %s)
-                    ON CONFLICT (constructorId) DO NOTHING;
-                    """)
-    cur.execute(query, (constructor_id, name, nationality))
+def upsert_drivers(cur, drivers):
+    if not drivers:
+        return
+    query = """
+            INSERT INTO drivers (driverId, code, givenName, familyName, nationality)
+            VALUES %s
+            ON CONFLICT (driverId) DO NOTHING;
+            """
+    execute_values(cur, query, drivers)
+
+def upsert_constructors(cur, constructors):
+    if not constructors:
+        return
+    query = """
+            INSERT INTO constructors (constructorId, name, nationality)
+            VALUES %s
+            ON CONFLICT (constructorId) DO NOTHING;
+            """
+    execute_values(cur, query, constructors)
 
 def insert_race(cur, year, round_num, circuit_id, name, date):
     query = sql.SQL("""
@@ -67,60 +88,93 @@ def insert_race(cur, year, round_num, circuit_id, name, date):
                     """)
     cur.execute(query, (year, round_num, circuit_id, name, date))
 
-def insert_results(cur, results_df, year, round_num, session_type):
+def ensure_ingestion_state(conn):
+    with conn.cursor() as cur:
+        cur.execute(INGESTION_STATE_TABLE)
+        create_feature_views(cur)
+    conn.commit()
+
+def fetch_ingested_sessions(conn) -> set:
+    with conn.cursor() as cur:
+        cur.execute("SELECT race_year, race_round, session_type FROM ingestion_state;")
+        return set(cur.fetchall())
+
+def record_ingested_session(cur, year, round_num, session_type, rows_written):
     query = sql.SQL("""
-                    INSERT INTO results (
-                        race_year, race_round, session_type, driverId, constructorId,
-                        grid, position, points, status
-                    )
-                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
-                    ON CONFLICT (race_year, race_round, session_type, driverId) DO NOTHING;
+                    INSERT INTO ingestion_state (race_year, race_round, session_type, rows_written)
+                    VALUES (%s, %s, %s, %s)
+                    ON CONFLICT (race_year, race_round, session_type)
+                    DO UPDATE SET rows_written = EXCLUDED.rows_written, committed_at = now();
                     """)
+    cur.execute(query, (year, round_num, session_type, rows_written))
+
+def clear_event(cur, year, round_num):
+    for table in ('results', 'qualifying'):
+        cur.execute(sql.SQL("DELETE FROM {table} WHERE race_year = %s AND race_round = %s;")
+                    .format(table=sql.Identifier(table)), (year, round_num))
+    cur.execute("DELETE FROM ingestion_state WHERE race_year = %s AND race_round = %s;", (year, round_num))
+
+def copy_and_merge(cur, table, columns, rows_df, conflict_columns):
+    # COPY the session into a staging table, then drain it into the target with a single INSERT ... SELECT.
+    staging = sql.Identifier(f"{table}_staging")
+    column_list = sql.SQL(', ').join(sql.Identifier(column.lower()) for column in columns)
+    conflict_list = sql.SQL(', ').join(sql.Identifier(column.lower()) for column in conflict_columns)
+
+    cur.execute(sql.SQL("CREATE TEMP TABLE IF NOT EXISTS {staging} AS SELECT {columns} FROM {table} WITH NO DATA")
+                .format(staging=staging, columns=column_list, table=sql.Identifier(table)))
+
+    buffer = io.StringIO()
+    rows_df[columns].to_csv(buffer, index=False, header=False)
+    buffer.seek(0)
+    cur.copy_expert(sql.SQL("COPY {staging} ({columns}) FROM STDIN WITH (FORMAT csv)")
+                    .format(staging=staging, columns=column_list), buffer)
+
+    cur.execute(sql.SQL("""
+                        WITH staged AS (DELETE FROM {staging} RETURNING {columns})
+                        INSERT INTO {table} ({columns})
+                        SELECT {columns} FROM staged
+                        ON CONFLICT ({conflict}) DO NOTHING;
+                        """).format(table=sql.Identifier(table), columns=column_list, staging=staging,
+                                    conflict=conflict_list))
+    return cur.rowcount
+
+def format_times(time_values):
+    return pd.Series([str(time_val.to_pytimedelta()) if isinstance(time_val, pd.Timedelta) else None
+                      for time_val in time_values], index=time_values.index, dtype=object)
+
+def session_frame(results_df, year, round_num, session_type):
+    return pd.DataFrame({
+        'race_year': year,
+        'race_round': round_num,
+        'session_type': session_type,
+        'driverId': results_df['DriverId'].values,
+        'constructorId': results_df['ConstructorId'].values,
+    }, index=results_df.index)
 
-    for row in results_df.itertuples():
-        cur.execute(query, (
-            year,
-            round_num,
-            session_type,
-            row.DriverId,
-            row.ConstructorId,
-            int(row.GridPosition),
-            int(row.Position),
-            float(row.Points),
-            row.Status
-        ))
+def insert_results(cur, results_df, year, round_num, session_type):
+    rows = session_frame(results_df, year, round_num, session_type)
+    rows['grid'] = results_df['GridPosition'].astype('int64')
+    rows['position'] = results_df['Position'].astype('int64')
+    rows['points'] = results_df['Points'].astype('float64')
+    rows['status'] = results_df['Status']
+
+    return copy_and_merge(cur, 'results', RESULTS_COLUMNS, rows, SESSION_KEY)
 
 def insert_qualifying(cur, results_df, year, round_num, session_type):
-    query = sql.SQL("""
-                    INSERT INTO qualifying (
-                        race_year, race_round, session_type, driverId, constructorId,
-                        position, q1, q2, q3
-                    )
-                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
-                    ON CONFLICT (race_year, race_round, session_type, driverId) DO NOTHING;
-                    """)
+    rows = session_frame(results_df, year, round_num, session_type)
+    rows['position'] = results_df['Position'].astype('int64')
+    rows['q1'] = format_times(results_df['Q1'])
+    rows['q2'] = format_times(results_df['Q2'])
+    rows['q3'] = format_times(results_df['Q3'])
 
-    for row in results_df.itertuples():
-        def format_time(time_val):
-            if pd.isna(time_val) or not isinstance(time_val, pd.Timedelta):
-                return None
-            return str(time_val.to_pytimedelta())
-
-        cur.execute(query, (
-            year,
-            round_num,
-            session_type,
-            row.DriverId,
-            row.ConstructorId,
-            int(row.Position),
-            format_time(row.Q1),
-            format_time(row.Q2),
-            format_time(row.Q3)
-        ))
-
-def pre_populate_and_patch_df(cur, session, results_df):
+    return copy_and_merge(cur, 'qualifying', QUALIFYING_COLUMNS, rows, SESSION_KEY)
+
+def patch_session_results(session, results_df):
     if results_df is None or results_df.empty:
-        return None
+        return None, [], []
+
+    drivers = []
+    constructors = []
 
     if 'ConstructorId' in results_df.columns:
         print("  > Processing modern data format (2018+).")
@@ -128,175 +182,285 @@ def pre_populate_and_patch_df(cur, session, results_df):
             if pd.isna(num): continue
             try:
                 driver_info = session.get_driver(num)
-                upsert_drivers(cur, driver_info['DriverId'], driver_info['Abbreviation'],
-                               driver_info['GivenName'], driver_info['FamilyName'],
-                               driver_info['Nationality'])
+                drivers.append((driver_info['DriverId'], driver_info['Abbreviation'],
+                                driver_info['GivenName'], driver_info['FamilyName'],
+                                driver_info['Nationality']))
             except Exception as e:
-                print(f"  > Warning (New Data): Could not upsert driver {num}. Error: {e}")
+                print(f"  > Warning (New Data): Could not read driver {num}. Error: {e}")
 
         for con_id in results_df['ConstructorId'].unique():
             if pd.isna(con_id): continue
             try:
                 con_info = session.get_constructor(con_id)
-                upsert_constructors(cur, con_info['ConstructorId'], con_info['Name'],
-                                    con_info['Nationality'])
+                constructors.append((con_info['ConstructorId'], con_info['Name'], con_info['Nationality']))
             except Exception as e:
-                print(f"  > Warning (New Data): Could not upsert constructor {con_id}. Error: {e}")
+                print(f"  > Warning (New Data): Could not read constructor {con_id}. Error: {e}")
 
-        return results_df
+        return results_df, drivers, constructors
 
     else:
         print("  > Patching historical data (Pre-2018)...")
 
         if 'DriverNumber' in results_df.columns:
             results_df['DriverId'] = results_df['DriverNumber'].astype(str)
-            for driver_id in results_df['DriverId'].unique():
-                if pd.isna(driver_id): continue
-                upsert_drivers(cur, driver_id=driver_id, code=driver_id,
-                               given_name=f"Driver_{driver_id}", family_name="", nationality="")
+            drivers = [(driver_id, driver_id, f"Driver_{driver_id}", "", "")
+                       for driver_id in results_df['DriverId'].unique() if not pd.isna(driver_id)]
 
         team_col = 'TeamName' if 'TeamName' in results_df.columns else 'ConstructorName'
         if team_col in results_df.columns:
             results_df['ConstructorId'] = results_df[team_col]
-            for con_id in results_df['ConstructorId'].unique():
-                if pd.isna(con_id): continue
-                upsert_constructors(cur, constructor_id=con_id, name=con_id, nationality="")
+            constructors = [(con_id, con_id, "")
+                            for con_id in results_df['ConstructorId'].unique() if not pd.isna(con_id)]
 
         if 'DriverId' not in results_df.columns or 'ConstructorId' not in results_df.columns:
             print("  > CRITICAL: Could not patch DataFrame. Missing Driver/Constructor columns.")
-            return None
+            return None, drivers, constructors
 
-        return results_df
+        return results_df, drivers, constructors
 
+def load_session(year, round_num, session_name):
+    session = ff1.get_session(year, round_num, session_name)
+    session.load(telemetry=False, weather=False, messages=False)
+    return session
 
-def populate_database():
-    try:
-        with get_db_connection() as conn:
-            with conn.cursor() as cur:
-                print("Database connection successful. Starting population...")
+def event_sessions(event) -> dict:
+    # {session type: schedule session name}, taken from the event's own Session1..Session5 names.
+    names = [str(event.get(f'Session{num}', '') or '') for num in range(1, 6)]
+    sessions = {}
+    for name in names:
+        session_type = SCHEDULE_SESSION_TYPES.get(name)
+        if session_type == 'SQ' and 'Sprint' not in names:
+            session_type = 'S'
+        if session_type is not None:
+            sessions[session_type] = name
 
-                for year in range(START_YEAR, END_YEAR + 1):
-                    print(f"\n--- Processing Year: {year} ---")
+    if 'R' not in sessions:
+        sessions = {'R': 'Race', 'Q': 'Qualifying', **sessions}
+    return {session_type: sessions[session_type] for session_type in SESSION_ORDER if session_type in sessions}
 
-                    try:
-                        schedule = ff1.get_event_schedule(year)
-                    except Exception as e:
-                        print(f"Could not fetch schedule for {year}. Error: {e}")
-                        continue
+def event_session_types(event) -> list:
+    return list(event_sessions(event))
 
-                    for index, event in schedule.iterrows():
-                        if event['EventDate'].to_pydatetime() > datetime.now():
-                            print(f"Skipping Round {event['RoundNumber']} ({event['EventName']}) - Event in future.")
-                            break
+def load_event(year, event):
+    # Runs in the loader pool: only FastF1 I/O and parsing, no database access.
+    round_num = int(event['RoundNumber'])
+    event_name = event['EventName']
+    print(f"Loading: {year} Round {round_num} - {event_name}")
 
-                        round_num = int(event['RoundNumber'])
+    session_race = ff1.get_session(year, round_num, 'R')
 
-                        if round_num == 0:
-                            print(f"Skipping event: {event['EventName']} (Round 0)")
-                            continue
+    try:
+        circuit_data = session_race.event['Circuit']
+        circuit_id = circuit_data['circuitId']
+        circuit_name = circuit_data['Location']['locality']
+        circuit_loc = circuit_data['Location']['country']
+        circuit_country = circuit_data['Location']['country']
+    except KeyError:
+        print(f"  > Using fallback circuit data for {year}")
+        circuit_id = event['Location'].lower().replace(" ", "_").replace("-", "_")
+        circuit_name = event['Location']
+        circuit_loc = event['Location']
+        circuit_country = event['Country']
+    except Exception as e:
+        print(f"  > CRITICAL: Unhandled error getting circuit info. Skipping. Error: {e}")
+        return None
 
-                        event_name = event['EventName']
-                        print(f"Processing: {year} Round {round_num} - {event_name}")
-
-                        try:
-                            session_race = ff1.get_session(year, round_num, 'R')
-
-                            try:
-                                circuit_data = session_race.event['Circuit']
-                                circuit_id = circuit_data['circuitId']
-                                circuit_name = circuit_data['Location']['locality']
-                                circuit_loc = circuit_data['Location']['country']
-                                circuit_country = circuit_data['Location']['country']
-                            except KeyError:
-                                print(f"  > Using fallback circuit data for {year}")
-                                circuit_id = event['Location'].lower().replace(" ", "_").replace("-", "_")
-                                circuit_name = event['Location']
-                                circuit_loc = event['Location']
-                                circuit_country = event['Country']
-                            except Exception as e:
-                                print(f"  > CRITICAL: Unhandled error getting circuit info. Skipping. Error: {e}")
+    session_race.load(telemetry=False, weather=False, messages=False)
+
+    loaded = {
+        'year': year,
+        'round': round_num,
+        'name': event_name,
+        'circuit': (circuit_id, circuit_name, circuit_loc, circuit_country),
+        'date': session_race.date,
+        # Past the grace period a session without results is final, so it is recorded rather than retried.
+        'settled': event['EventDate'].to_pydatetime() + timedelta(days=INGEST_EMPTY_GRACE_DAYS) < datetime.now(),
+        'sessions': [],
+    }
+
+    def add_session(session_type, session):
+        results_df, drivers, constructors = patch_session_results(session, session.results)
+        if results_df is None or results_df.empty:
+            # Dimension rows are still written, as the row-at-a-time loader used to do.
+            results_df = None
+            print(f"  > No {SESSION_LABELS[session_type]} results found for {year} R{round_num}.")
+        loaded['sessions'].append((SESSION_TABLES[session_type], session_type, results_df, drivers, constructors))
+
+    sessions = event_sessions(event)
+    if 'S' in sessions:
+        print(f"  > Sprint weekend detected for {year} R{round_num}.")
+
+    for session_type, session_name in sessions.items():
+        try:
+            add_session(session_type, session_race if session_type == 'R' else
+                        load_session(year, round_num, session_name))
+        except ValueError as e:
+            # FastF1 has no such session for this event: there is nothing to retry.
+            print(f"  > No {SESSION_LABELS[session_type]} session for {year} R{round_num}: {e}")
+            loaded['sessions'].append((SESSION_TABLES[session_type], session_type, None, [], []))
+        except Exception as e:
+            print(f"  > Error loading {SESSION_LABELS[session_type]} data for {year} R{round_num}: {e}")
+
+    return loaded
+
+def write_event(conn, loaded, reingest=False):
+    # The single writer: one transaction per event, rolled back as a whole on any database error.
+    # The ingestion_state rows commit with the data, so a crash never marks an unwritten session as done.
+    year, round_num = loaded['year'], loaded['round']
+    try:
+        with conn.cursor() as cur:
+            if reingest:
+                print(f"  > Re-ingesting {year} R{round_num}: clearing its results, qualifying and state.")
+                clear_event(cur, year, round_num)
+
+            upsert_circuits(cur, *loaded['circuit'])
+            insert_race(cur, year, round_num, loaded['circuit'][0], loaded['name'], loaded['date'])
+
+            for table, session_type, results_df, drivers, constructors in loaded['sessions']:
+                upsert_drivers(cur, drivers)
+                upsert_constructors(cur, constructors)
+                if results_df is None:
+                    # Recorded with 0 rows once settled, so --incremental does not retry an empty session forever.
+                    if loaded.get('settled', True):
+                        record_ingested_session(cur, year, round_num, session_type, 0)
+                    continue
+                if table == 'results':
+                    rows_written = insert_results(cur, results_df, year, round_num, session_type)
+                else:
+                    rows_written = insert_qualifying(cur, results_df, year, round_num, session_type)
+                record_ingested_session(cur, year, round_num, session_type, rows_written)
+
+        conn.commit()
+        print(f"  > Successfully committed {year} R{round_num}.")
+        return True
+    except Exception as e:
+        print(f"Error writing {year} Round {round_num}: {e}")
+        print("Rolling back transaction for this event.")
+        conn.rollback()
+        return False
+
+def iter_events(start_year=START_YEAR, end_year=END_YEAR):
+    for year in range(start_year, end_year + 1):
+        print(f"\n--- Processing Year: {year} ---")
+
+        try:
+            schedule = ff1.get_event_schedule(year)
+        except Exception as e:
+            print(f"Could not fetch schedule for {year}. Error: {e}")
+            continue
+
+        for index, event in schedule.iterrows():
+            if event['EventDate'].to_pydatetime() > datetime.now():
+                print(f"Skipping Round {event['RoundNumber']} ({event['EventName']}) - Event in future.")
+                break
+
+            if int(event['RoundNumber']) == 0:
+                print(f"Skipping event: {event['EventName']} (Round 0)")
+                continue
+
+            yield year, event
+
+def make_loader_pool(workers, executor=INGEST_EXECUTOR):
+    if executor not in INGEST_EXECUTORS:
+        raise ValueError(f"Unknown ingestion executor '{executor}'.")
+    if executor == 'process':
+        return ProcessPoolExecutor(max_workers=workers)
+    return ThreadPoolExecutor(max_workers=workers, thread_name_prefix='ff1-loader')
+
+def reingest_event(value) -> tuple:
+    # argparse type for --reingest YEAR:ROUND.
+    try:
+        year, round_num = (int(part) for part in value.split(':'))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected YEAR:ROUND (e.g. 2024:5), got '{value}'")
+    if round_num < 1:
+        raise argparse.ArgumentTypeError(f"round must be at least 1, got '{value}'")
+    return year, round_num
+
+def populate_database(workers=INGEST_WORKERS, executor=INGEST_EXECUTOR, incremental=False, reingest=()):
+    started_at = time.monotonic()
+    committed = 0
+    reingest = set(reingest)
+    try:
+        with get_db_connection() as conn:
+            print(f"Database connection successful. Starting population with {workers} loader(s) ({executor})...")
+
+            ensure_ingestion_state(conn)
+            ingested = fetch_ingested_sessions(conn) if incremental else set()
+            if reingest:
+                print(f"Re-ingest mode: only {sorted(reingest)} will be loaded.")
+            elif incremental:
+                print(f"Incremental mode: {len(ingested)} session(s) already ingested.")
+
+            # Events are loaded up to PREFETCH_PER_WORKER rounds per worker ahead and written in calendar order.
+            with make_loader_pool(workers, executor) as pool:
+                pending = deque()
+                # --reingest touches only the listed events, never the rest of the backfill.
+                events = (iter_events(min(year for year, _ in reingest), max(year for year, _ in reingest))
+                          if reingest else iter_events())
+                exhausted = False
+                found = set()
+
+                while pending or not exhausted:
+                    while not exhausted and len(pending) < workers * PREFETCH_PER_WORKER:
+                        next_event = next(events, None)
+                        if next_event is None:
+                            exhausted = True
+                            break
+                        year, event = next_event
+                        round_num = int(event['RoundNumber'])
+                        if reingest:
+                            if (year, round_num) not in reingest:
                                 continue
+                            found.add((year, round_num))
+                        elif all((year, round_num, session_type) in ingested
+                                 for session_type in event_session_types(event)):
+                            continue
+                        pending.append((year, int(event['RoundNumber']), pool.submit(load_event, year, event)))
 
-                            upsert_circuits(cur, circuit_id, circuit_name, circuit_loc, circuit_country)
-
-                            session_race.load(telemetry=False, weather=False, messages=False)
-                            insert_race(cur, year, round_num, circuit_id, event_name, session_race.date)
-
-                            race_results_df = pre_populate_and_patch_df(cur, session_race, session_race.results)
-
-                            if race_results_df is not None and not race_results_df.empty:
-                                insert_results(cur, race_results_df, year, round_num, 'R')
-                            else:
-                                print(f"  > No Race results found for {year} R{round_num}.")
-
-                            try:
-                                session_quali = ff1.get_session(year, round_num, 'Q')
-                                session_quali.load(telemetry=False, weather=False, messages=False)
-
-                                quali_results_df = pre_populate_and_patch_df(cur, session_quali, session_quali.results)
-
-                                if quali_results_df is not None and not quali_results_df.empty:
-                                    insert_qualifying(cur, quali_results_df, year, round_num, 'Q')
-                                else:
-                                    print(f"  > No Qualifying results found for {year} R{round_num}.")
-                            except Exception as e:
-                                print(f"  > Error loading Qualifying data for {year} R{round_num}: {e}")
-
-                            sprint_check = (str(event.get('Session1', '')) == 'Sprint'
-                                            or str(event.get('Session2', '')) == 'Sprint'
-                                            or str(event.get('Session3', '')) == 'Sprint'
-                                            or str(event.get('Session4', '')) == 'Sprint'
-                                            or str(event.get('Session5', '')) == 'Sprint')
-
-                            if year >= 2021 and sprint_check:
-                                print(f"  > Sprint weekend detected.")
-                                try:
-                                    session_sprint = ff1.get_session(year, round_num, 'S')
-                                    session_sprint.load(telemetry=False, weather=False, messages=False)
-
-                                    sprint_results_df = pre_populate_and_patch_df(cur, session_sprint, session_sprint.results)
-
-                                    if sprint_results_df is not None and not sprint_results_df.empty:
-                                        insert_results(cur, sprint_results_df, year, round_num, 'S')
-                                    else:
-                                        print(f"  > No Sprint results found for {year} R{round_num}.")
-                                except Exception as e:
-                                    print(f"  > Error loading Sprint data for {year} R{round_num}: {e}")
-
-                                try:
-                                    sq_session_name = 'SQ' if year < 2023 else 'Sprint Shootout'
-                                    session_sq = ff1.get_session(year, round_num, sq_session_name)
-                                    session_sq.load(telemetry=False, weather=False, messages=False)
-
-                                    sq_results_df = pre_populate_and_patch_df(cur, session_sq, session_sq.results)
+                    if not pending:
+                        break
 
-                                    if sq_results_df is not None and not sq_results_df.empty:
-                                        insert_qualifying(cur, sq_results_df, year, round_num, 'SQ')
-                                    else:
-                                        print(f"  > No Sprint Qualifying results found for {year} R{round_num}.")
-                                except Exception as e:
-                                    print(f"  > Error loading Sprint Qualifying data for {year} R{round_num}: {e}")
+                    year, round_num, future = pending.popleft()
+                    try:
+                        loaded = future.result()
+                    except Exception as e:
+                        print(f"Error processing {year} Round {round_num}: {e}")
+                        print("Skipping this event; nothing was written for it.")
+                        continue
 
+                    if loaded is not None and write_event(conn, loaded, reingest=(year, round_num) in reingest):
+                        committed += 1
 
-                            conn.commit()
-                            print(f"  > Successfully committed {year} R{round_num}.")
+            for year, round_num in sorted(reingest - found):
+                print(f"Warning: {year} Round {round_num} is not a past event in the FastF1 schedule; not re-ingested.")
 
-                        except Exception as e:
-                            print(f"Error processing {year} Round {round_num}: {e}")
-                            print("Rolling back transaction for this event.")
-                            conn.rollback()
+            if committed:
+                print("Refreshing feature views...")
+                with conn.cursor() as cur:
+                    refresh_feature_views(cur)
+                conn.commit()
 
-                print("\n--- Population complete. ---")
+            print(f"\n--- Population complete: {committed} event(s) committed in "
+                  f"{time.monotonic() - started_at:.1f}s. ---")
 
     except (Exception, psycopg2.DatabaseError) as e:
         print(f"\n--- FATAL ERROR ---")
         print(f"A critical error occurred: {e}")
-        if conn:
-            conn.rollback()
     finally:
-        if 'conn' in locals() and conn:
-            conn.close()
-            print("Database connection closed.")
+        close_pool()
+        print("Database connection closed.")
 
 if __name__ == "__main__":
-    populate_database()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Backfill the Redline database from FastF1.")
+    parser.add_argument('--workers', type=int, default=INGEST_WORKERS,
+                        help="Number of concurrent FastF1 session loaders.")
+    parser.add_argument('--executor', choices=INGEST_EXECUTORS, default=INGEST_EXECUTOR)
+    parser.add_argument('--incremental', action='store_true',
+                        help="Only load events with sessions missing from ingestion_state.")
+    parser.add_argument('--reingest', action='append', default=[], type=reingest_event, metavar='YEAR:ROUND',
+                        help="Delete and reload one event (repeatable); only the listed events are loaded.")
+    args = parser.parse_args()
+
+    populate_database(workers=max(1, args.workers), executor=args.executor,
+                      incremental=args.incremental, reingest=set(args.reingest))
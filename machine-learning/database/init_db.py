@@ -1,31 +1,132 @@
 import psycopg2
-import os
-import sys
-from psycopg2.extensions import connection
 
-DB_NAME = os.environ.get('PG_DB', 'redline_db' )
-DB_USER = os.environ.get('PG_USER', 'admin' )
-DB_PASS = os.environ.get('PG_PASS', 'admin')
-DB_HOST = os.environ.get('PG_HOST', 'localhost')
-DB_PORT = os.environ.get('PG_PORT', '5432')
+from database.db import DB_NAME
+from database.db import get_db_connection
 
-def get_db_connection() -> connection:
-    try:
-        conn = psycopg2.connect(
-            dbname=DB_NAME,
-            user=DB_USER,
-            password=DB_PASS,
-            host=DB_HOST,
-            port=DB_PORT
+INGESTION_STATE_TABLE = """
+    CREATE TABLE IF NOT EXISTS ingestion_state (
+        race_year INTEGER NOT NULL,
+        race_round INTEGER NOT NULL,
+        session_type TEXT NOT NULL,
+        rows_written INTEGER NOT NULL,
+        committed_at TIMESTAMP NOT NULL DEFAULT now(),
+        PRIMARY KEY (race_year, race_round, session_type)
+    )
+    """
+
+# Qualifying sessions feed the grid of the race they precede: Q -> R, SQ / Sprint Shootout -> S.
+QUALI_JOIN = """
+    LEFT JOIN qualifying q
+        ON q.race_year = r.race_year
+        AND q.race_round = r.race_round
+        AND q.driverId = r.driverId
+        AND ((r.session_type = 'R' AND q.session_type = 'Q')
+             OR (r.session_type = 'S' AND q.session_type IN ('SQ', 'Sprint Shootout')))
+    """
+
+FEATURE_INDEXES = [
+    "CREATE INDEX IF NOT EXISTS results_driver_race_idx ON results (driverId, race_year, race_round)",
+    "CREATE INDEX IF NOT EXISTS results_constructor_race_idx ON results (constructorId, race_year, race_round)",
+    "CREATE INDEX IF NOT EXISTS qualifying_driver_race_idx ON qualifying (driverId, race_year, race_round)",
+]
+
+# The rolling windows run per driver and per constructor over the events before the current one.
+FEATURE_VIEWS = {
+    'training_features': f"""
+        CREATE MATERIALIZED VIEW IF NOT EXISTS training_features AS
+        WITH constructor_events AS (
+            SELECT race_year, race_round, constructorId, sum(points) AS points
+            FROM results
+            GROUP BY race_year, race_round, constructorId
+        ),
+        constructor_rolls AS (
+            SELECT
+                race_year, race_round, constructorId,
+                coalesce(avg(points) OVER (PARTITION BY constructorId ORDER BY race_year, race_round
+                                           ROWS BETWEEN 5 PRECEDING AND 1 PRECEDING), 0) AS constructor_points_roll_5
+            FROM constructor_events
+        )
+        SELECT
+            r.resultId,
+            r.race_year,
+            r.race_round,
+            r.session_type,
+            r.driverId,
+            r.constructorId,
+            r.grid,
+            r.position,
+            r.points,
+            r.status,
+            coalesce(q.position, r.grid) AS quali_position,
+            coalesce(avg(r.points) OVER (PARTITION BY r.driverId ORDER BY r.race_year, r.race_round, r.resultId
+                                         ROWS BETWEEN 5 PRECEDING AND 1 PRECEDING), 0) AS driver_points_roll_5,
+            c.constructor_points_roll_5,
+            (r.status IS DISTINCT FROM 'Finished')::INTEGER AS dnf
+        FROM results r
+        {QUALI_JOIN}
+        JOIN constructor_rolls c
+            ON c.race_year = r.race_year AND c.race_round = r.race_round AND c.constructorId = r.constructorId
+        """,
+    'driver_snapshot_features': f"""
+        CREATE MATERIALIZED VIEW IF NOT EXISTS driver_snapshot_features AS
+        WITH history AS (
+            SELECT
+                r.driverId,
+                r.constructorId,
+                r.points,
+                coalesce(q.position, r.grid) AS quali_position,
+                (r.status IS DISTINCT FROM 'Finished')::INTEGER AS dnf,
+                row_number() OVER (PARTITION BY r.driverId
+                                   ORDER BY r.race_year DESC, r.race_round DESC, r.resultId DESC) AS recency
+            FROM results r
+            {QUALI_JOIN}
+        )
+        SELECT
+            driverId,
+            max(constructorId) FILTER (WHERE recency = 1) AS constructorId,
+            avg(points) FILTER (WHERE recency <= 5) AS driver_points_roll_5,
+            avg(quali_position) FILTER (WHERE recency <= 10) AS q_proxy,
+            stddev_samp(quali_position) FILTER (WHERE recency <= 10) AS q_stdev,
+            avg(dnf) AS dnf_rate
+        FROM history
+        GROUP BY driverId
+        """,
+    'constructor_snapshot_features': """
+        CREATE MATERIALIZED VIEW IF NOT EXISTS constructor_snapshot_features AS
+        WITH constructor_events AS (
+            SELECT
+                constructorId,
+                sum(points) AS points,
+                row_number() OVER (PARTITION BY constructorId ORDER BY race_year DESC, race_round DESC) AS recency
+            FROM results
+            GROUP BY race_year, race_round, constructorId
         )
-        return conn
-    except psycopg2.OperationalError as e:
-        print(f"Error: Could not connect to database '{DB_NAME}' as user '{DB_USER}'")
-        print(f"Details: {e}")
-        sys.exit(1)
+        SELECT constructorId, avg(points) AS constructor_points_roll_5
+        FROM constructor_events
+        WHERE recency <= 5
+        GROUP BY constructorId
+        """,
+}
+
+FEATURE_VIEW_INDEXES = [
+    "CREATE INDEX IF NOT EXISTS training_features_race_idx ON training_features (race_year, race_round, resultId)",
+]
+
+def create_feature_views(cur):
+    for statement in FEATURE_INDEXES:
+        cur.execute(statement)
+    for statement in FEATURE_VIEWS.values():
+        cur.execute(statement)
+    for statement in FEATURE_VIEW_INDEXES:
+        cur.execute(statement)
+
+def refresh_feature_views(cur):
+    for view in FEATURE_VIEWS:
+        cur.execute(f"REFRESH MATERIALIZED VIEW {view}")
 
 def initialize_schema():
     drop_statements = [
+        "DROP TABLE IF EXISTS ingestion_state CASCADE",
         "DROP TABLE IF EXISTS qualifying CASCADE",
         "DROP TABLE IF EXISTS results CASCADE",
         "DROP TABLE IF EXISTS races CASCADE",
@@ -105,7 +206,8 @@ def initialize_schema():
             FOREIGN KEY (constructorId) REFERENCES constructors (constructorId),
             UNIQUE (race_year, race_round, session_type, driverId)
         )
-        """
+        """,
+        INGESTION_STATE_TABLE
     ]
 
     try:
@@ -120,6 +222,9 @@ def initialize_schema():
                 for statement in create_statements:
                     cur.execute(statement)
 
+                print("Creating feature indexes and views")
+                create_feature_views(cur)
+
                 print(f"Database schema for '{DB_NAME}' created'")
 
     except (Exception, psycopg2.DatabaseError) as e:
@@ -1,28 +1,195 @@
 from flask import Flask, request, jsonify
 import src.model.simulate_championship as simulation_runner
+from src.jobs import QueueFullError, SimulationJobQueue
+from src.result_cache import ResultCache, make_cache_key
+import math
 import os
 
 app = Flask(__name__)
+result_cache = ResultCache()
+job_queue = SimulationJobQueue()
 
 print("Model loaded. API is ready.")
 
+served_feature_version = getattr(simulation_runner.FEATURE_SNAPSHOT, 'version', None)
+
+def sync_feature_version():
+    # Cache keys carry the snapshot version, but entries for the old data would only age out: drop them now.
+    global served_feature_version
+    version = getattr(simulation_runner.FEATURE_SNAPSHOT, 'version', None)
+    if version != served_feature_version:
+        # The invalidation reaches every worker; only the one that rebuilt the snapshot issues it.
+        if version == simulation_runner.refreshed_feature_version:
+            removed = result_cache.invalidate()
+            print(f"Feature snapshot changed to {version}; invalidated {removed} cached result(s).")
+        else:
+            print(f"Feature snapshot changed to {version} (rebuilt by another worker).")
+        served_feature_version = version
+    return version
+
+@app.before_request
+def refresh_feature_snapshot():
+    simulation_runner.schedule_feature_refresh()
+    sync_feature_version()
+
+def positive_number(data, field, integer=False):
+    value = data.get(field)
+    if value is None:
+        return None
+    # bool is an int subclass, but "maxSimulations": true is not a count.
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value) or value <= 0:
+        raise ValueError(f"'{field}' must be a positive number.")
+    if integer:
+        if value != int(value):
+            raise ValueError(f"'{field}' must be a positive integer.")
+        return int(value)
+    return float(value)
+
+def parse_simulation_request(data):
+    if not data or 'currentStandings' not in data or 'remainingRaces' not in data:
+        raise ValueError("Missing 'currentStandings' or 'remainingRaces' in request")
+
+    adaptive_options = {
+        'tolerance': positive_number(data, 'tolerance'),
+        'max_simulations': positive_number(data, 'maxSimulations', integer=True),
+        'time_budget': positive_number(data, 'timeBudget'),
+    }
+
+    cache_key = make_cache_key(
+        simulation_runner.canonicalize_request(data['currentStandings'], data['remainingRaces']),
+        outputs=data.get('outputs'),
+        model=simulation_runner.MODEL_FINGERPRINT,
+        data=getattr(simulation_runner.FEATURE_SNAPSHOT, 'version', None),
+        n_simulations=simulation_runner.N_SIMULATIONS,
+        seed=simulation_runner.SIM_SEED,
+        workers=simulation_runner.SIM_WORKERS,
+        inference_mode=simulation_runner.INFERENCE_MODE,
+        inference_backend=simulation_runner.INFERENCE_BACKEND,
+        **adaptive_options
+    )
+
+    return cache_key, adaptive_options
+
+def run_and_cache_simulation(cache_key, data, adaptive_options, progress=None):
+    probabilities = simulation_runner.run_full_simulation(
+        data['currentStandings'],
+        data['remainingRaces'],
+        outputs=data.get('outputs'),
+        progress=progress,
+        **adaptive_options
+    )
+    if 'error' not in probabilities:
+        result_cache.put(cache_key, probabilities)
+    return probabilities
+
 @app.route('/simulate', methods=['POST'])
 def simulate():
     data = request.get_json()
 
-    if not data or 'currentStandings' not in data or 'remainingRaces' not in data:
-        return jsonify({"error": "Missing 'currentStandings' or 'remainingRaces' in request"}), 400
+    try:
+        cache_key, adaptive_options = parse_simulation_request(data)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    probabilities = result_cache.get(cache_key)
+    if probabilities is None:
+        probabilities = run_and_cache_simulation(cache_key, data, adaptive_options)
+
+    return jsonify(probabilities)
+
+@app.route('/jobs/simulate', methods=['POST'])
+def submit_simulation_job():
+    data = request.get_json()
+
+    try:
+        cache_key, adaptive_options = parse_simulation_request(data)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    cached = result_cache.get(cache_key)
+    if cached is not None:
+        return jsonify(job_queue.complete(cache_key, cached)), 202
+
+    try:
+        job = job_queue.submit(cache_key, run_and_cache_simulation, cache_key, data, adaptive_options)
+    except QueueFullError as e:
+        response = jsonify({"error": str(e)})
+        response.headers['Retry-After'] = '5'
+        return response, 429
+
+    return jsonify(job), 202
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_simulation_job(job_id):
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({"error": f"Unknown job '{job_id}'"}), 404
+    return jsonify(job)
+
+@app.route('/jobs', methods=['GET'])
+def simulation_job_stats():
+    return jsonify(job_queue.stats())
+
+@app.route('/simulate/batch', methods=['POST'])
+def simulate_batch():
+    data = request.get_json()
+
+    if not data or 'currentStandings' not in data or 'remainingRaces' not in data or 'scenarios' not in data:
+        return jsonify({"error": "Missing 'currentStandings', 'remainingRaces' or 'scenarios' in request"}), 400
 
     standings_json = data['currentStandings']
     races_json = data['remainingRaces']
+    scenarios = data['scenarios']
+    outputs = data.get('outputs')
 
-    probabilities = simulation_runner.run_full_simulation(
-        standings_json,
-        races_json
+    if not isinstance(scenarios, list) or not scenarios:
+        return jsonify({"error": "'scenarios' must be a non-empty list."}), 400
+    invalid_scenarios = simulation_runner.validate_scenarios(
+        scenarios, {s['driver']['driverId'] for s in standings_json})
+    if invalid_scenarios:
+        return jsonify({"error": "Invalid scenarios.", "scenarioErrors": invalid_scenarios}), 400
+
+    cache_key = make_cache_key(
+        {**simulation_runner.canonicalize_request(standings_json, races_json), 'scenarios': scenarios},
+        outputs=outputs,
+        model=simulation_runner.MODEL_FINGERPRINT,
+        data=getattr(simulation_runner.FEATURE_SNAPSHOT, 'version', None),
+        n_simulations=simulation_runner.N_SIMULATIONS,
+        seed=simulation_runner.SIM_SEED,
+        workers=simulation_runner.SIM_WORKERS,
+        # Scenarios are always tabulated, so only the backend, not REDLINE_INFERENCE_MODE, changes the result.
+        inference_backend=simulation_runner.INFERENCE_BACKEND
     )
 
-    return jsonify(probabilities)
+    results = result_cache.get(cache_key)
+    if results is None:
+        results = simulation_runner.run_scenario_batch(
+            standings_json,
+            races_json,
+            scenarios,
+            outputs=outputs
+        )
+        if 'error' not in results:
+            result_cache.put(cache_key, results)
+
+    return jsonify(results)
+
+@app.route('/features/refresh', methods=['POST'])
+def features_refresh():
+    changed = simulation_runner.check_feature_snapshot(force=True)
+    version = sync_feature_version()
+    return jsonify({"changed": changed, "version": list(version) if version is not None else None})
+
+@app.route('/cache/stats', methods=['GET'])
+def cache_stats():
+    return jsonify(result_cache.stats())
+
+@app.route('/cache/invalidate', methods=['POST'])
+def cache_invalidate():
+    data = request.get_json(silent=True) or {}
+    removed = result_cache.invalidate(data.get('key'))
+    return jsonify({"invalidated": removed})
 
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
-    app.run(debug=False, host='0.0.0.0', port=port)
\ No newline at end of file
+    app.run(debug=False, host='0.0.0.0', port=port)
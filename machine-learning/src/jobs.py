@@ -0,0 +1,260 @@
+import json
+import os
+import re
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+JOB_WORKERS = int(os.environ.get('REDLINE_JOB_WORKERS', 2))
+JOB_QUEUE_DEPTH = int(os.environ.get('REDLINE_JOB_QUEUE_DEPTH', 16))
+JOB_TTL_SECONDS = float(os.environ.get('REDLINE_JOB_TTL', 60 * 60))
+# Shared job directory: with several server processes, any of them can answer a poll for any job.
+JOB_DIR = os.environ.get('REDLINE_JOB_DIR')
+# A running job's progress is written to the job directory at most this often.
+JOB_PROGRESS_WRITE_SECONDS = 0.5
+
+ACTIVE_STATUSES = ('queued', 'running')
+JOB_ID_PATTERN = re.compile(r'[0-9a-f]{32}')
+
+# Owner tokens of the queues alive in this process, so a reused pid is not mistaken for a live owner.
+_local_owners = set()
+
+
+class QueueFullError(Exception):
+    pass
+
+
+def process_alive(pid) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class SimulationJobQueue:
+
+    def __init__(self, max_workers=JOB_WORKERS, max_queue_depth=JOB_QUEUE_DEPTH, ttl_seconds=JOB_TTL_SECONDS,
+                 store_dir=JOB_DIR):
+        self.max_queue_depth = max_queue_depth
+        self.ttl_seconds = ttl_seconds
+        self.store_dir = store_dir
+        self.owner = uuid.uuid4().hex
+        _local_owners.add(self.owner)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='simulation-job')
+        self._jobs = {}
+        self._in_flight = {}
+        self._lock = threading.Lock()
+
+        if self.store_dir:
+            os.makedirs(os.path.join(self.store_dir, "in_flight"), exist_ok=True)
+
+    def submit(self, key, function, *args, **kwargs) -> dict:
+        with self._lock:
+            self._prune(time.time())
+
+            existing = self._find_in_flight(key)
+            if existing is not None:
+                return self._describe(existing, deduplicated=True)
+
+            active = sum(1 for job in self._all_jobs() if job['status'] in ACTIVE_STATUSES)
+            if active >= self.max_queue_depth:
+                raise QueueFullError(f"Simulation queue is full ({active} active jobs).")
+
+            job = self._new_job(key, 'queued')
+            if not self._claim(key, job['id']):
+                # Another process started the same simulation between the lookup and the claim.
+                del self._jobs[job['id']]
+                existing = self._find_in_flight(key)
+                if existing is not None:
+                    return self._describe(existing, deduplicated=True)
+            self._save(job)
+
+        self._executor.submit(self._run, job, function, args, kwargs)
+        return self._describe(job)
+
+    def complete(self, key, result) -> dict:
+        with self._lock:
+            self._prune(time.time())
+            job = self._new_job(key, 'done')
+            job['progress'] = 1.0
+            job['result'] = result
+            job['finished_at'] = job['created_at']
+            self._save(job)
+        return self._describe(job)
+
+    def get(self, job_id):
+        if not JOB_ID_PATTERN.fullmatch(job_id):
+            return None
+        with self._lock:
+            job = self._jobs.get(job_id) or self._load(job_id)
+            return None if job is None else self._describe(job, include_result=True)
+
+    def stats(self) -> dict:
+        with self._lock:
+            counts = {}
+            for job in self._all_jobs():
+                counts[job['status']] = counts.get(job['status'], 0) + 1
+            return {'jobs': counts, 'max_queue_depth': self.max_queue_depth}
+
+    def _new_job(self, key, status):
+        job = {
+            'id': uuid.uuid4().hex,
+            'key': key,
+            'status': status,
+            'progress': 0.0,
+            # Simulations completed and win-probability precision reached so far, when the simulation reports them.
+            'details': {},
+            'result': None,
+            'error': None,
+            'created_at': time.time(),
+            'finished_at': None,
+            'pid': os.getpid(),
+            'owner': self.owner,
+        }
+        self._jobs[job['id']] = job
+        return job
+
+    def _run(self, job, function, args, kwargs):
+        last_write = [time.monotonic()]
+
+        def report(fraction, **details):
+            job['progress'] = float(fraction)
+            job['details'].update(details)
+            if self.store_dir and time.monotonic() - last_write[0] >= JOB_PROGRESS_WRITE_SECONDS:
+                last_write[0] = time.monotonic()
+                self._save(job)
+
+        job['status'] = 'running'
+        self._save(job)
+        try:
+            result = function(*args, progress=report, **kwargs)
+            if isinstance(result, dict) and 'error' in result:
+                job['error'] = result['error']
+                job['status'] = 'failed'
+            else:
+                job['result'] = result
+                job['progress'] = 1.0
+                job['status'] = 'done'
+        except Exception as e:
+            print(f"Simulation job {job['id']} failed: {e}")
+            job['error'] = str(e)
+            job['status'] = 'failed'
+        finally:
+            job['finished_at'] = time.time()
+            with self._lock:
+                self._save(job)
+                self._release(job['key'], job['id'])
+
+    def _find_in_flight(self, key):
+        job_id = self._in_flight.get(key)
+        if job_id is not None:
+            return self._jobs[job_id]
+        if not self.store_dir:
+            return None
+
+        try:
+            with open(self._in_flight_path(key)) as f:
+                job_id = f.read().strip()
+        except FileNotFoundError:
+            return None
+        job = self._load(job_id) if JOB_ID_PATTERN.fullmatch(job_id) else None
+        if job is not None and job['status'] in ACTIVE_STATUSES:
+            return job
+        # Left behind by a process that died mid-job.
+        self._remove(self._in_flight_path(key))
+        return None
+
+    def _claim(self, key, job_id) -> bool:
+        if self.store_dir:
+            try:
+                fd = os.open(self._in_flight_path(key), os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                return False
+            with os.fdopen(fd, 'w') as f:
+                f.write(job_id)
+        self._in_flight[key] = job_id
+        return True
+
+    def _release(self, key, job_id):
+        if self._in_flight.get(key) == job_id:
+            del self._in_flight[key]
+            if self.store_dir:
+                self._remove(self._in_flight_path(key))
+
+    def _all_jobs(self):
+        if not self.store_dir:
+            return list(self._jobs.values())
+        job_ids = [name[:-len('.json')] for name in os.listdir(self.store_dir) if name.endswith('.json')]
+        jobs = [self._jobs.get(job_id) or self._load(job_id) for job_id in job_ids]
+        return [job for job in jobs if job is not None]
+
+    def _job_path(self, job_id):
+        return os.path.join(self.store_dir, f"{job_id}.json")
+
+    def _in_flight_path(self, key):
+        return os.path.join(self.store_dir, "in_flight", key)
+
+    def _save(self, job):
+        if not self.store_dir:
+            return
+        tmp_path = f"{self._job_path(job['id'])}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, 'w') as f:
+                json.dump(job, f)
+            os.replace(tmp_path, self._job_path(job['id']))
+        except OSError as e:
+            print(f"Warning: could not write simulation job {job['id']}: {e}")
+
+    def _load(self, job_id):
+        if not self.store_dir:
+            return None
+        try:
+            with open(self._job_path(job_id)) as f:
+                job = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+        # A job owned by a process that is gone will never finish: report it as failed.
+        owner_alive = job.get('owner') in _local_owners if job['pid'] == os.getpid() else process_alive(job['pid'])
+        if job['status'] in ACTIVE_STATUSES and job['id'] not in self._jobs and not owner_alive:
+            job['status'] = 'failed'
+            job['error'] = f"Server process {job['pid']} exited before the job finished."
+            job['finished_at'] = time.time()
+            self._save(job)
+        return job
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def _prune(self, now):
+        expired = [job_id for job_id, job in self._jobs.items()
+                   if job['finished_at'] is not None and now - job['finished_at'] > self.ttl_seconds]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+        if self.store_dir:
+            for job in self._all_jobs():
+                if job['finished_at'] is not None and now - job['finished_at'] > self.ttl_seconds:
+                    self._remove(self._job_path(job['id']))
+
+    def _describe(self, job, include_result=False, deduplicated=False):
+        description = {
+            'jobId': job['id'],
+            'status': job['status'],
+            'progress': job['progress'],
+            **{name: value for name, value in job.get('details', {}).items() if value is not None},
+        }
+        if deduplicated:
+            description['deduplicated'] = True
+        if include_result and job['status'] == 'done':
+            description['result'] = job['result']
+        if job['error'] is not None:
+            description['error'] = job['error']
+        return description
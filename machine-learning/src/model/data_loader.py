@@ -1,98 +1,223 @@
-import psycopg2
 import os
-import sys
+import threading
+
+import psycopg2
 import pandas as pd
-from psycopg2.extensions import connection
+from pandas.api.types import union_categoricals
 
-from database.init_db import DB_USER
-from database.init_db import DB_PORT
-from database.init_db import DB_PASS
-from database.init_db import DB_HOST
-from database.init_db import DB_NAME
+from database.db import get_db_connection
+from database.init_db import QUALI_JOIN
+from src.model.dataset_cache import (DATASET_CACHE_DIR, PYARROW_AVAILABLE, dataset_cache_path, read_dataset_cache,
+                                     write_dataset_cache)
 
-def get_db_connection() -> connection:
-    try:
-        conn = psycopg2.connect(
-            dbname=DB_NAME,
-            user=DB_USER,
-            password=DB_PASS,
-            host=DB_HOST,
-            port=DB_PORT
-        )
-        return conn
-    except psycopg2.OperationalError as e:
-        print(f"Error: Could not connect to database '{DB_NAME}' as user '{DB_USER}'.")
-        print(f"Details: {e}")
-        sys.exit(1)
-
-def fetch_all_data() -> pd.DataFrame:
-
-    results_query = """
-                    SELECT
-                        race_year,
-                        race_round,
-                        session_type,
-                        driverId,
-                        constructorId,
-                        grid,
-                        position,
-                        points,
-                        status
-                    FROM results; \
-                    """
-
-    quali_query = """
+# 'sql' reads the windows materialized by database/init_db.py instead of running feature_engineer locally.
+FEATURE_SOURCES = ('pandas', 'sql')
+FEATURE_SOURCE = os.environ.get('REDLINE_FEATURE_SOURCE', 'pandas')
+# Rows parsed per chunk while a COPY streams in; only the typed chunks are kept, never the CSV text.
+COPY_CHUNK_ROWS = int(os.environ.get('REDLINE_COPY_CHUNK_ROWS', 100000))
+
+RESULTS_DTYPES = {
+    'race_year': 'int16',
+    'race_round': 'int16',
+    'session_type': 'category',
+    'driverid': 'category',
+    'constructorid': 'category',
+    'grid': 'int16',
+    'position': 'float32',
+    'points': 'float32',
+    'status': 'category',
+    'quali_position': 'float32',
+}
+
+# The same qualifying join as the materialized views, so the pandas and SQL feature sources cannot drift apart.
+RESULTS_QUERY = f"""
+                SELECT
+                    r.race_year,
+                    r.race_round,
+                    r.session_type,
+                    r.driverId,
+                    r.constructorId,
+                    r.grid,
+                    r.position,
+                    r.points,
+                    r.status,
+                    q.position AS quali_position
+                FROM results r
+                {QUALI_JOIN}
+                WHERE r.race_year BETWEEN %s AND %s
+                ORDER BY r.resultId
+                """
+
+# Row counts and the highest ids change with every insert, delete and re-ingest, at the cost of two index scans.
+WATERMARK_QUERY = """
                   SELECT
-                      race_year,
-                      race_round,
-                      session_type AS quali_session_type,
-                      driverId,
-                      position AS quali_position
-                  FROM qualifying; \
+                      (SELECT count(*) FROM results WHERE race_year BETWEEN %s AND %s),
+                      (SELECT coalesce(max(resultId), 0) FROM results WHERE race_year BETWEEN %s AND %s),
+                      (SELECT count(*) FROM qualifying WHERE race_year BETWEEN %s AND %s),
+                      (SELECT coalesce(max(qualifyId), 0) FROM qualifying WHERE race_year BETWEEN %s AND %s)
                   """
 
-    try:
-        with get_db_connection() as conn:
-            print("Fetching results data...")
-            results_df = pd.read_sql_query(results_query, conn)
+MATERIALIZED_FEATURES_DTYPES = {
+    **RESULTS_DTYPES,
+    'driver_points_roll_5': 'float64',
+    'constructor_points_roll_5': 'float64',
+    'dnf': 'int8',
+}
+
+MATERIALIZED_FEATURES_QUERY = """
+                              SELECT
+                                  race_year, race_round, session_type, driverId, constructorId, grid, position,
+                                  points, status, quali_position, driver_points_roll_5, constructor_points_roll_5, dnf
+                              FROM training_features
+                              WHERE race_year BETWEEN %s AND %s
+                              ORDER BY race_year, race_round, resultId
+                              """
+
+SNAPSHOT_DRIVERS_QUERY = """
+                         SELECT driverId, constructorId, driver_points_roll_5, q_proxy, q_stdev, dnf_rate
+                         FROM driver_snapshot_features
+                         ORDER BY driverId
+                         """
+
+SNAPSHOT_CONSTRUCTORS_QUERY = """
+                              SELECT constructorId, constructor_points_roll_5
+                              FROM constructor_snapshot_features
+                              ORDER BY constructorId
+                              """
+
+# The same (rows, last year, last round) version and points spread the pandas snapshot derives from the history.
+SNAPSHOT_VERSION_QUERY = """
+                         SELECT
+                             count(*),
+                             coalesce(max(race_year), 0),
+                             coalesce(max(race_round) FILTER (WHERE race_year = (SELECT max(race_year) FROM results)), 0),
+                             stddev_samp(points)
+                         FROM results
+                         """
+
+# Every committed session upserts its ingestion_state row, so this moves with each ingestion run.
+INGESTION_WATERMARK_QUERY = """
+                            SELECT count(*), coalesce(sum(rows_written), 0), max(committed_at)
+                            FROM ingestion_state
+                            """
+
+def year_bounds(start_year, end_year):
+    return (-32768 if start_year is None else start_year), (32767 if end_year is None else end_year)
+
+def fetch_watermark(start_year=None, end_year=None) -> list:
+    with get_db_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(WATERMARK_QUERY, year_bounds(start_year, end_year) * 4)
+            return [int(value) for value in cur.fetchone()]
+
+def fetch_ingestion_watermark() -> tuple:
+    with get_db_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(INGESTION_WATERMARK_QUERY)
+            n_sessions, rows_written, committed_at = cur.fetchone()
+    return int(n_sessions), int(rows_written), committed_at.isoformat() if committed_at else None
+
+def fetch_data_version() -> tuple:
+    with get_db_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(SNAPSHOT_VERSION_QUERY)
+            n_results, last_year, last_round, _ = cur.fetchone()
+    return int(n_results), int(last_year), int(last_round)
+
+def concat_chunks(chunks) -> pd.DataFrame:
+    # Each chunk only knows the categories it has seen: align them so the concatenated columns stay categorical.
+    for column in chunks[0].columns:
+        if isinstance(chunks[0][column].dtype, pd.CategoricalDtype) and len(chunks) > 1:
+            categories = union_categoricals([chunk[column] for chunk in chunks], sort_categories=True).categories
+            for chunk in chunks:
+                chunk[column] = chunk[column].cat.set_categories(categories)
+    return pd.concat(chunks, ignore_index=True)
 
-            print("Fetching qualifying data...")
-            quali_df = pd.read_sql_query(quali_query, conn)
+def copy_query(cur, query, params, dtype, chunk_rows=COPY_CHUNK_ROWS) -> pd.DataFrame:
+    # COPY writes into a pipe on a helper thread while read_csv parses it chunk by chunk, so the CSV text is
+    # never held in memory as a whole; the kernel's pipe buffer bounds how far the writer runs ahead.
+    read_fd, write_fd = os.pipe()
+    copy_errors = []
 
-        print("Data fetched successfully. Merging dataframes...")
+    def write_copy():
+        try:
+            with open(write_fd, 'wb') as pipe:
+                cur.copy_expert(f"COPY ({cur.mogrify(query, params).decode()}) TO STDOUT WITH (FORMAT csv, HEADER)",
+                                pipe)
+        except Exception as e:
+            copy_errors.append(e)
 
-        q_to_r = quali_df[quali_df['quali_session_type'] == 'Q'].copy()
-        q_to_r['session_type'] = 'R'
+    writer = threading.Thread(target=write_copy, name='copy-to-stdout', daemon=True)
+    writer.start()
+    try:
+        with open(read_fd, 'rb') as pipe:
+            chunks = list(pd.read_csv(pipe, dtype=dtype, keep_default_na=False, na_values=[''],
+                                      chunksize=chunk_rows))
+    except Exception:
+        # A failed COPY ends the stream early: its error is the one worth reporting. A failed parse closes the
+        # read end, which stops the writer with a broken pipe.
+        writer.join()
+        if copy_errors:
+            raise copy_errors[0]
+        raise
+    writer.join()
 
-        sq_to_s = quali_df[quali_df['quali_session_type'].isin(['SQ', 'Sprint Shootout'])].copy()
-        sq_to_s['session_type'] = 'S'
+    if copy_errors:
+        raise copy_errors[0]
+    return concat_chunks(chunks)
 
-        combined_quali_df = pd.concat([q_to_r, sq_to_s])
-        combined_quali_df = combined_quali_df.drop(columns=['quali_session_type'])
+def fetch_all_data(start_year=None, end_year=None) -> pd.DataFrame:
+    start_year, end_year = year_bounds(start_year, end_year)
 
-        merged_df = pd.merge(
-            results_df,
-            combined_quali_df,
-            on=['race_year', 'race_round', 'session_type', 'driverid'],
-            how='left'
-        )
+    try:
+        with get_db_connection() as conn:
+            with conn.cursor() as cur:
+                print("Fetching results with qualifying positions...")
+                merged_df = copy_query(cur, RESULTS_QUERY, (start_year, end_year), RESULTS_DTYPES)
 
+        print(f"Data fetched successfully: {len(merged_df)} results.")
         return merged_df
 
     except (Exception, psycopg2.DatabaseError) as e:
         print(f"Error fetching data: {e}")
         return pd.DataFrame()
 
+def fetch_materialized_features(start_year=None, end_year=None) -> pd.DataFrame:
+    try:
+        with get_db_connection() as conn:
+            with conn.cursor() as cur:
+                print("Fetching materialized training features...")
+                features_df = copy_query(cur, MATERIALIZED_FEATURES_QUERY, year_bounds(start_year, end_year),
+                                         MATERIALIZED_FEATURES_DTYPES)
+        print(f"Materialized features fetched successfully: {len(features_df)} results.")
+        return features_df
+
+    except (Exception, psycopg2.DatabaseError) as e:
+        print(f"Error fetching materialized features: {e}")
+        return pd.DataFrame()
+
+def fetch_snapshot_features():
+    with get_db_connection() as conn:
+        with conn.cursor() as cur:
+            latest = copy_query(cur, SNAPSHOT_DRIVERS_QUERY, None, {'driverid': str, 'constructorid': str})
+            constructor_roll_5 = copy_query(cur, SNAPSHOT_CONSTRUCTORS_QUERY, None, {'constructorid': str})
+            cur.execute(SNAPSHOT_VERSION_QUERY)
+            n_results, last_year, last_round, noise_factor = cur.fetchone()
+
+    version = (int(n_results), int(last_year), int(last_round))
+    return (version, latest.set_index('driverid'), constructor_roll_5.set_index('constructorid')['constructor_points_roll_5'],
+            float(noise_factor or 0.0))
+
 def feature_engineer(df: pd.DataFrame) -> pd.DataFrame:
 
     print("Starting feature engineering...")
 
     df = df.sort_values(by=['race_year', 'race_round'])
 
-    df['driver_points_roll_5'] = df.groupby('driverid')['points'].shift(1).rolling(window=5, min_periods=1).mean().fillna(0)
+    df['driver_points_roll_5'] = df.groupby('driverid', observed=True)['points'].shift(1).rolling(window=5, min_periods=1).mean().fillna(0)
 
-    constructor_points = df.groupby(['race_year', 'race_round', 'constructorid'])['points'].sum().reset_index()
-    constructor_points['constructor_points_roll_5'] = constructor_points.groupby('constructorid')['points'].shift(1).rolling(window=5, min_periods=1).mean().fillna(0)
+    constructor_points = df.groupby(['race_year', 'race_round', 'constructorid'], observed=True)['points'].sum().reset_index()
+    constructor_points['constructor_points_roll_5'] = constructor_points.groupby('constructorid', observed=True)['points'].shift(1).rolling(window=5, min_periods=1).mean().fillna(0)
 
     df = pd.merge(
         df,
@@ -108,14 +233,41 @@ def feature_engineer(df: pd.DataFrame) -> pd.DataFrame:
     print("Feature engineering complete.")
     return df
 
+def load_feature_data(start_year=None, end_year=None, cache_dir=DATASET_CACHE_DIR) -> pd.DataFrame:
+    if FEATURE_SOURCE == 'sql':
+        # The materialized view already is the cache; it is refreshed after every ingestion run.
+        return fetch_materialized_features(start_year, end_year)
 
-if __name__ == "__main__":
-    raw_data = fetch_all_data()
+    if not cache_dir or not PYARROW_AVAILABLE:
+        return feature_engineer(fetch_all_data(start_year, end_year))
+
+    path = dataset_cache_path(cache_dir, start_year, end_year)
+    try:
+        watermark = fetch_watermark(start_year, end_year)
+    except psycopg2.Error as e:
+        print(f"Could not fetch the data watermark, using the dataset cache unvalidated: {e}")
+        watermark = None
+
+    cached = read_dataset_cache(path, watermark)
+    if cached is not None:
+        print(f"Dataset cache hit: {path} ({len(cached)} rows).")
+        return cached
 
-    if not raw_data.empty:
-        print(f"Successfully loaded {len(raw_data)} results.")
+    raw_data = fetch_all_data(start_year, end_year)
+    if raw_data.empty:
+        return raw_data
+
+    processed_data = feature_engineer(raw_data)
+    if watermark is not None:
+        write_dataset_cache(path, processed_data, watermark)
+    return processed_data
+
+
+if __name__ == "__main__":
+    processed_data = load_feature_data()
 
-        processed_data = feature_engineer(raw_data)
+    if not processed_data.empty:
+        print(f"Successfully loaded {len(processed_data)} results.")
 
         print("\n--- Processed Data Sample (Head) ---")
         print(processed_data.head())
@@ -0,0 +1,71 @@
+import json
+import os
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
+# Bump when feature_engineer changes, so caches written by older code are rebuilt.
+DATASET_CACHE_FORMAT_VERSION = 1
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+MODEL_DIR = os.path.join(SCRIPT_DIR, "data")
+DATASET_CACHE_DIR = os.environ.get('REDLINE_DATASET_CACHE_DIR', os.path.join(MODEL_DIR, "dataset_cache"))
+
+
+def dataset_cache_path(cache_dir, start_year=None, end_year=None):
+    start = 'first' if start_year is None else start_year
+    end = 'last' if end_year is None else end_year
+    return os.path.join(cache_dir, f"features_{start}_{end}.arrow")
+
+
+def dataframe_to_table(df: pd.DataFrame):
+    columns = {}
+    for name in df.columns:
+        values = df[name]
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            columns[name] = pa.DictionaryArray.from_pandas(values)
+        else:
+            # Keep NaN as a float value rather than a null so the column can be read back without a copy.
+            columns[name] = pa.array(values.to_numpy(), from_pandas=values.dtype.kind not in 'fiub')
+    return pa.table(columns)
+
+
+def write_dataset_cache(path, df: pd.DataFrame, watermark):
+    table = dataframe_to_table(df).replace_schema_metadata({
+        'format_version': str(DATASET_CACHE_FORMAT_VERSION),
+        'watermark': json.dumps(watermark),
+    })
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with pa.OSFile(tmp_path, 'wb') as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(tmp_path, path)
+    print(f"Dataset cache written to {path} ({len(df)} rows).")
+
+
+def read_dataset_cache(path, watermark=None):
+    # Memory-mapped: numeric columns and categorical codes point into the page cache, shared by every reader.
+    if not os.path.exists(path):
+        return None
+
+    try:
+        with pa.memory_map(path) as source:
+            table = pa.ipc.open_file(source).read_all()
+    except (OSError, pa.ArrowInvalid) as e:
+        print(f"Warning: could not read dataset cache {path}: {e}")
+        return None
+
+    metadata = {key.decode(): value.decode() for key, value in (table.schema.metadata or {}).items()}
+    if metadata.get('format_version') != str(DATASET_CACHE_FORMAT_VERSION):
+        return None
+    if watermark is not None and json.loads(metadata.get('watermark', 'null')) != watermark:
+        return None
+
+    return table.to_pandas(split_blocks=True)
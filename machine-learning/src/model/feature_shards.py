@@ -0,0 +1,103 @@
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+from src.model import data_loader
+from src.model.dataset_cache import PYARROW_AVAILABLE, dataframe_to_table
+
+if PYARROW_AVAILABLE:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+MODEL_DIR = os.path.join(SCRIPT_DIR, "data")
+SHARD_DIR = os.environ.get('REDLINE_SHARD_DIR', os.path.join(MODEL_DIR, "feature_shards"))
+
+# Rows decoded at a time; peak memory follows this, not the number of seasons.
+SHARD_READ_ROWS = int(os.environ.get('REDLINE_SHARD_READ_ROWS', 65536))
+SHARD_ROW_GROUP_ROWS = 16384
+
+# Enough of the history for the serving snapshot and the training state, without the wide feature columns.
+SNAPSHOT_COLUMNS = ['race_year', 'race_round', 'driverid', 'constructorid', 'points', 'quali_position', 'dnf']
+
+
+def shard_path(shard_dir, year):
+    return os.path.join(shard_dir, f"race_year={year}", "part-0.parquet")
+
+
+def shard_paths(shard_dir=SHARD_DIR) -> list:
+    if not os.path.isdir(shard_dir):
+        return []
+    partitions = sorted(name for name in os.listdir(shard_dir) if name.startswith('race_year='))
+    return [os.path.join(shard_dir, name, "part-0.parquet") for name in partitions
+            if os.path.exists(os.path.join(shard_dir, name, "part-0.parquet"))]
+
+
+def season_features(year) -> pd.DataFrame:
+    if data_loader.FEATURE_SOURCE == 'sql':
+        return data_loader.fetch_materialized_features(year, year)
+
+    # The previous season seeds the rolling windows at the start of this one.
+    raw_data = data_loader.fetch_all_data(year - 1, year)
+    if raw_data.empty:
+        return raw_data
+    processed_data = data_loader.feature_engineer(raw_data)
+    return processed_data[processed_data['race_year'] == year].reset_index(drop=True)
+
+
+def write_feature_shards(start_year, end_year, shard_dir=SHARD_DIR):
+    if not PYARROW_AVAILABLE:
+        raise RuntimeError("Feature shards require pyarrow.")
+
+    written = 0
+    for year in range(start_year, end_year + 1):
+        season = season_features(year)
+        if season.empty:
+            continue
+
+        path = shard_path(shard_dir, year)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        pq.write_table(dataframe_to_table(season), tmp_path, row_group_size=SHARD_ROW_GROUP_ROWS)
+        os.replace(tmp_path, path)
+        written += len(season)
+        print(f"  > {year}: {len(season)} rows")
+
+    print(f"Feature shards written to {shard_dir} ({written} rows).")
+
+
+def iter_shard_batches(paths, columns=None, read_rows=SHARD_READ_ROWS):
+    for path in paths:
+        parquet_file = pq.ParquetFile(path)
+        for batch in parquet_file.iter_batches(batch_size=read_rows, columns=columns):
+            yield path, batch.to_pandas()
+
+
+def shard_row_count(paths) -> int:
+    return sum(pq.ParquetFile(path).metadata.num_rows for path in paths)
+
+
+def read_shard_columns(paths, columns=SNAPSHOT_COLUMNS) -> pd.DataFrame:
+    # Column projection: only these columns are decoded from each shard.
+    tables = [pq.read_table(path, columns=columns) for path in paths]
+    if not tables:
+        return pd.DataFrame(columns=columns)
+    return pa.concat_tables(tables, promote_options='permissive').to_pandas()
+
+
+def validation_mask(path, n_rows, test_size, seed) -> np.ndarray:
+    # Seeded by the shard, so every pass over the shards puts a row on the same side of the split.
+    season = int(os.path.basename(os.path.dirname(path)).split('=')[1])
+    return np.random.default_rng([seed, season]).random(n_rows) < test_size
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write the engineered features as one Parquet shard per season.")
+    parser.add_argument('--start-year', type=int, required=True)
+    parser.add_argument('--end-year', type=int, required=True)
+    parser.add_argument('--shard-dir', default=SHARD_DIR)
+    args = parser.parse_args()
+
+    write_feature_shards(args.start_year, args.end_year, args.shard_dir)
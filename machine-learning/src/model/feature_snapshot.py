@@ -0,0 +1,136 @@
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_Q_PROXY = 10.0
+DEFAULT_Q_STDEV = 3.0
+DEFAULT_DNF_RATE = 0.05
+UNKNOWN_ENCODING = -1
+
+SNAPSHOT_COLUMNS = [
+    'constructorid', 'driver_points_roll_5', 'constructor_points_roll_5',
+    'q_proxy', 'q_stdev', 'dnf_rate', 'driver_encoded', 'constructor_encoded'
+]
+
+
+@dataclass
+class FeatureSnapshot:
+    version: tuple
+    driver_ids: np.ndarray
+    driver_constructor: np.ndarray
+    driver_points_roll_5: np.ndarray
+    q_proxy: np.ndarray
+    q_stdev: np.ndarray
+    dnf_rate: np.ndarray
+    driver_encoded: np.ndarray
+    constructor_ids: np.ndarray
+    constructor_points_roll_5: np.ndarray
+    constructor_encoded: np.ndarray
+
+    def __post_init__(self):
+        self.driver_index = {driver_id: idx for idx, driver_id in enumerate(self.driver_ids)}
+        self.constructor_index = {constructor_id: idx for idx, constructor_id in enumerate(self.constructor_ids)}
+
+
+def data_version(df_historical: pd.DataFrame) -> tuple:
+    if df_historical.empty:
+        return 0, 0, 0
+    last_year = int(df_historical['race_year'].max())
+    last_round = int(df_historical.loc[df_historical['race_year'] == last_year, 'race_round'].max())
+    return len(df_historical), last_year, last_round
+
+
+def encoding_lookup(encoder, labels) -> np.ndarray:
+    positions = {label: idx for idx, label in enumerate(encoder.classes_)}
+    return np.array([positions.get(label, UNKNOWN_ENCODING) for label in labels], dtype=np.int64)
+
+
+def build_feature_snapshot(df_historical: pd.DataFrame, driver_encoder, constructor_encoder) -> FeatureSnapshot:
+    print("Building feature snapshot...")
+
+    df_sorted = df_historical.sort_values(by=['race_year', 'race_round'])
+    latest = df_sorted.groupby('driverid', observed=True).last()[['constructorid']]
+
+    driver_roll_5 = df_sorted.groupby('driverid', observed=True)['points'].rolling(window=5, min_periods=1).mean().reset_index()
+    latest['driver_points_roll_5'] = driver_roll_5.groupby('driverid', observed=True).last()['points']
+
+    q_history = df_sorted.groupby('driverid', observed=True)['quali_position'].rolling(window=10, min_periods=1)
+    latest['q_proxy'] = q_history.mean().reset_index().groupby('driverid', observed=True).last()['quali_position']
+    latest['q_stdev'] = q_history.std().reset_index().groupby('driverid', observed=True).last()['quali_position']
+
+    latest['dnf_rate'] = df_sorted.groupby('driverid', observed=True)['dnf'].mean()
+
+    constructor_points = df_sorted.groupby(['race_year', 'race_round', 'constructorid'], observed=True)['points'].sum().reset_index()
+    constructor_roll_5 = constructor_points.groupby('constructorid', observed=True)['points'].rolling(window=5, min_periods=1).mean().reset_index()
+    constructor_roll_5 = constructor_roll_5.groupby('constructorid', observed=True).last()['points']
+
+    return assemble_feature_snapshot(data_version(df_historical), latest, constructor_roll_5,
+                                     driver_encoder, constructor_encoder)
+
+
+def assemble_feature_snapshot(version: tuple, latest: pd.DataFrame, constructor_roll_5: pd.Series,
+                              driver_encoder, constructor_encoder) -> FeatureSnapshot:
+    constructor_ids = np.union1d(constructor_roll_5.index.values.astype(str),
+                                 np.asarray(constructor_encoder.classes_).astype(str))
+
+    snapshot = FeatureSnapshot(
+        version=version,
+        driver_ids=latest.index.values.astype(str),
+        driver_constructor=latest['constructorid'].values.astype(object),
+        driver_points_roll_5=latest['driver_points_roll_5'].fillna(0).values.astype(np.float64),
+        q_proxy=latest['q_proxy'].fillna(DEFAULT_Q_PROXY).values.astype(np.float64),
+        q_stdev=latest['q_stdev'].fillna(DEFAULT_Q_STDEV).values.astype(np.float64),
+        dnf_rate=latest['dnf_rate'].fillna(DEFAULT_DNF_RATE).values.astype(np.float64),
+        driver_encoded=encoding_lookup(driver_encoder, latest.index.values),
+        constructor_ids=constructor_ids,
+        constructor_points_roll_5=constructor_roll_5.reindex(constructor_ids).fillna(0).values.astype(np.float64),
+        constructor_encoded=encoding_lookup(constructor_encoder, constructor_ids),
+    )
+
+    print(f"Feature snapshot built: {len(snapshot.driver_ids)} drivers, {len(snapshot.constructor_ids)} constructors.")
+    return snapshot
+
+
+def lookup_features(snapshot: FeatureSnapshot, drivers_db_ids: list, constructors_db_map: dict) -> pd.DataFrame:
+    n_drivers = len(drivers_db_ids)
+    driver_rows = [snapshot.driver_index.get(driver_id) for driver_id in drivers_db_ids]
+
+    features = {
+        'constructorid': np.empty(n_drivers, dtype=object),
+        'driver_points_roll_5': np.zeros(n_drivers),
+        'constructor_points_roll_5': np.zeros(n_drivers),
+        'q_proxy': np.full(n_drivers, DEFAULT_Q_PROXY),
+        'q_stdev': np.full(n_drivers, DEFAULT_Q_STDEV),
+        'dnf_rate': np.full(n_drivers, DEFAULT_DNF_RATE),
+        'driver_encoded': np.full(n_drivers, UNKNOWN_ENCODING, dtype=np.int64),
+        'constructor_encoded': np.full(n_drivers, UNKNOWN_ENCODING, dtype=np.int64),
+    }
+
+    for idx, (driver_id, row) in enumerate(zip(drivers_db_ids, driver_rows)):
+        constructor_id = constructors_db_map.get(driver_id)
+        if row is not None:
+            if constructor_id is None:
+                constructor_id = snapshot.driver_constructor[row]
+            features['driver_points_roll_5'][idx] = snapshot.driver_points_roll_5[row]
+            features['q_proxy'][idx] = snapshot.q_proxy[row]
+            features['q_stdev'][idx] = snapshot.q_stdev[row]
+            features['dnf_rate'][idx] = snapshot.dnf_rate[row]
+            features['driver_encoded'][idx] = snapshot.driver_encoded[row]
+
+        features['constructorid'][idx] = constructor_id
+        constructor_row = snapshot.constructor_index.get(constructor_id)
+        if constructor_row is not None:
+            features['constructor_points_roll_5'][idx] = snapshot.constructor_points_roll_5[constructor_row]
+            features['constructor_encoded'][idx] = snapshot.constructor_encoded[constructor_row]
+
+    unknown_drivers = [driver_id for driver_id, code in zip(drivers_db_ids, features['driver_encoded'])
+                       if code == UNKNOWN_ENCODING]
+    unknown_constructors = [constructor_id for constructor_id, code
+                            in zip(features['constructorid'], features['constructor_encoded'])
+                            if code == UNKNOWN_ENCODING]
+    if unknown_drivers or unknown_constructors:
+        raise ValueError(f"Unknown ids for the model encoders: drivers={unknown_drivers}, "
+                         f"constructors={unknown_constructors}")
+
+    return pd.DataFrame(features, index=pd.Index(drivers_db_ids, name='driverid'))[SNAPSHOT_COLUMNS]
@@ -0,0 +1,211 @@
+import argparse
+import itertools
+import json
+import math
+import multiprocessing
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+MODEL_DIR = os.path.join(SCRIPT_DIR, "data")
+SWEEP_DIR = os.environ.get('REDLINE_SWEEP_DIR', os.path.join(MODEL_DIR, "sweep"))
+LEADERBOARD_FILE = "leaderboard.csv"
+
+SWEEP_WORKERS = int(os.environ.get('REDLINE_SWEEP_WORKERS', os.cpu_count() or 1))
+# Per-process TensorFlow threads; workers * threads should not exceed the cores.
+SWEEP_THREADS_PER_WORKER = int(os.environ.get('REDLINE_SWEEP_THREADS', 1))
+SWEEP_EPOCHS = int(os.environ.get('REDLINE_SWEEP_EPOCHS', 30))
+SWEEP_PATIENCE = int(os.environ.get('REDLINE_SWEEP_PATIENCE', 8))
+SWEEP_START_METHOD = os.environ.get('REDLINE_SWEEP_START_METHOD', 'spawn')
+
+ARRAY_NAMES = ('X_num_train', 'X_driver_train', 'X_constructor_train', 'y_train',
+               'X_num_test', 'X_driver_test', 'X_constructor_test', 'y_test')
+
+SEARCH_SPACE = {
+    'driver_embedding': [6, 10, 16],
+    'constructor_embedding': [4, 8],
+    'dense_units': [(64, 32), (128, 64, 32), (256, 128, 64)],
+    'dropout': [(0.0, 0.0), (0.3, 0.2)],
+    'learning_rate': [0.0005, 0.001, 0.002],
+    'batch_size': [256, 1024],
+}
+
+_worker_arrays = None
+_worker_vocabs = None
+
+
+def write_sweep_arrays(sweep_dir=SWEEP_DIR):
+    from src.model import data_loader
+    from src.model.model_trainer import preprocess_data
+
+    processed_data = data_loader.load_feature_data()
+    if processed_data.empty:
+        raise RuntimeError("No data loaded.")
+
+    (X_train_list, X_test_list, y_train, y_test), vocabs = preprocess_data(processed_data.copy(),
+                                                                          save_artifacts=False)
+    arrays = [*X_train_list, y_train, *X_test_list, y_test]
+    dtypes = (np.float32, np.int32, np.int32, np.float32) * 2
+
+    os.makedirs(sweep_dir, exist_ok=True)
+    for name, values, dtype in zip(ARRAY_NAMES, arrays, dtypes):
+        np.save(os.path.join(sweep_dir, f"{name}.npy"), np.ascontiguousarray(values, dtype=dtype))
+    with open(os.path.join(sweep_dir, "vocabs.json"), 'w') as f:
+        json.dump(vocabs, f)
+    print(f"Sweep arrays written to {sweep_dir} ({len(y_train)} train / {len(y_test)} validation rows).")
+
+
+def load_sweep_arrays(sweep_dir=SWEEP_DIR):
+    # Memory-mapped read-only: every worker maps the same page-cache pages instead of loading a copy.
+    arrays = {name: np.load(os.path.join(sweep_dir, f"{name}.npy"), mmap_mode='r') for name in ARRAY_NAMES}
+    with open(os.path.join(sweep_dir, "vocabs.json")) as f:
+        vocabs = json.load(f)
+    return arrays, vocabs
+
+
+def grid_candidates(space=SEARCH_SPACE) -> list:
+    names = list(space)
+    return [dict(zip(names, values)) for values in itertools.product(*(space[name] for name in names))]
+
+
+def random_candidates(n_trials, space=SEARCH_SPACE, seed=0) -> list:
+    candidates = grid_candidates(space)
+    return random.Random(seed).sample(candidates, min(n_trials, len(candidates)))
+
+
+def init_worker(sweep_dir, threads):
+    global _worker_arrays, _worker_vocabs
+    from src.model.model_trainer import configure_threading
+
+    configure_threading(threads, threads)
+    _worker_arrays, _worker_vocabs = load_sweep_arrays(sweep_dir)
+
+
+def make_batches(arrays, split, batch_size, shuffle, seed):
+    import tensorflow as tf
+
+    class MemmapBatches(tf.keras.utils.PyDataset):
+        # Gathers one batch at a time from the mapped arrays, so only the current batch is copied.
+
+        def __init__(self):
+            super().__init__()
+            self.inputs = [arrays[f'X_num_{split}'], arrays[f'X_driver_{split}'], arrays[f'X_constructor_{split}']]
+            self.targets = arrays[f'y_{split}']
+            self.rng = np.random.default_rng(seed)
+            self.order = np.arange(len(self.targets))
+            self.on_epoch_end()
+
+        def __len__(self):
+            return math.ceil(len(self.targets) / batch_size)
+
+        def __getitem__(self, idx):
+            rows = np.sort(self.order[idx * batch_size:(idx + 1) * batch_size])
+            return tuple(part[rows] for part in self.inputs), self.targets[rows]
+
+        def on_epoch_end(self):
+            if shuffle:
+                self.rng.shuffle(self.order)
+
+    return MemmapBatches()
+
+
+def evaluate_candidate(candidate, epochs=SWEEP_EPOCHS, patience=SWEEP_PATIENCE, seed=42):
+    import tensorflow as tf
+    from tensorflow.keras.callbacks import EarlyStopping
+
+    from src.model.model_trainer import build_model, warmup_cosine_schedule
+
+    tf.keras.utils.set_random_seed(seed)
+    started_at = time.perf_counter()
+    train_batches = make_batches(_worker_arrays, 'train', candidate['batch_size'], shuffle=True, seed=seed)
+    test_batches = make_batches(_worker_arrays, 'test', candidate['batch_size'], shuffle=False, seed=seed)
+
+    schedule = warmup_cosine_schedule(candidate['learning_rate'], len(train_batches), epochs)
+    model = build_model(_worker_vocabs, num_features_shape=_worker_arrays['X_num_train'].shape[1],
+                        learning_rate=schedule, architecture=candidate)
+    history = model.fit(
+        train_batches,
+        validation_data=test_batches,
+        epochs=epochs,
+        callbacks=[EarlyStopping(monitor='val_loss', patience=patience, restore_best_weights=True)],
+        verbose=0
+    )
+
+    return {
+        **candidate,
+        'best_val_mae': float(min(history.history['val_mean_absolute_error'])),
+        'best_val_loss': float(min(history.history['val_loss'])),
+        'epochs': len(history.history['loss']),
+        'seconds': time.perf_counter() - started_at,
+        'pid': os.getpid(),
+    }
+
+
+def write_leaderboard(results, sweep_dir=SWEEP_DIR) -> pd.DataFrame:
+    leaderboard = pd.DataFrame(results).sort_values('best_val_mae').reset_index(drop=True)
+    for column in ('dense_units', 'dropout'):
+        leaderboard[column] = leaderboard[column].map(lambda values: '-'.join(str(value) for value in values))
+    leaderboard.to_csv(os.path.join(sweep_dir, LEADERBOARD_FILE), index_label='rank')
+    return leaderboard
+
+
+def run_sweep(candidates, workers=SWEEP_WORKERS, threads=SWEEP_THREADS_PER_WORKER, sweep_dir=SWEEP_DIR,
+              epochs=SWEEP_EPOCHS):
+    print(f"--- Sweeping {len(candidates)} candidates on {workers} worker(s) x {threads} thread(s) ---")
+    started_at = time.perf_counter()
+    results = []
+
+    # Spawned, not forked: TensorFlow's thread pools do not survive a fork.
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context(SWEEP_START_METHOD),
+                             initializer=init_worker, initargs=(sweep_dir, threads)) as executor:
+        futures = [executor.submit(evaluate_candidate, candidate, epochs) for candidate in candidates]
+        for future in as_completed(futures):
+            try:
+                result = future.result()
+            except Exception as e:
+                print(f"  > Candidate failed: {e}")
+                continue
+            results.append(result)
+            # Rewritten after every candidate, so an interrupted sweep keeps what finished.
+            write_leaderboard(results, sweep_dir)
+            print(f"  > [{len(results)}/{len(candidates)}] val MAE {result['best_val_mae']:.4f} in "
+                  f"{result['seconds']:.1f}s: {dict((key, result[key]) for key in SEARCH_SPACE)}")
+
+    elapsed = time.perf_counter() - started_at
+    if not results:
+        print("--- No candidate finished. ---")
+        return None
+
+    leaderboard = write_leaderboard(results, sweep_dir)
+    print(f"--- Sweep complete in {elapsed:.1f}s; leaderboard saved to "
+          f"{os.path.join(sweep_dir, LEADERBOARD_FILE)} ---")
+    print(leaderboard.head(5).to_string())
+    return leaderboard
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Hyperparameter sweep for the Redline points model.")
+    parser.add_argument('--search', choices=('grid', 'random'), default='random')
+    parser.add_argument('--trials', type=int, default=16, help="Candidates sampled by the random search.")
+    parser.add_argument('--workers', type=int, default=SWEEP_WORKERS)
+    parser.add_argument('--threads', type=int, default=SWEEP_THREADS_PER_WORKER,
+                        help="TensorFlow intra/inter-op threads per worker.")
+    parser.add_argument('--epochs', type=int, default=SWEEP_EPOCHS)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--reuse-arrays', action='store_true',
+                        help="Skip the database fetch and preprocessing when the sweep arrays already exist.")
+    args = parser.parse_args()
+
+    if not (args.reuse_arrays and os.path.exists(os.path.join(SWEEP_DIR, "vocabs.json"))):
+        write_sweep_arrays(SWEEP_DIR)
+
+    if args.search == 'grid':
+        candidates = grid_candidates()
+    else:
+        candidates = random_candidates(args.trials, seed=args.seed)
+    run_sweep(candidates, args.workers, args.threads, SWEEP_DIR, args.epochs)
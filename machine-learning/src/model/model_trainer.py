@@ -1,15 +1,25 @@
+import argparse
+import itertools
+import math
+import time
+
 import pandas as pd
 import numpy as np
 import tensorflow as tf
-from tensorflow.keras.models import Model
+from tensorflow.keras.models import Model, clone_model, load_model
 from tensorflow.keras.layers import Input, Dense, Embedding, Concatenate, Flatten, Dropout
-from tensorflow.keras.callbacks import EarlyStopping
+from tensorflow.keras.callbacks import Callback, EarlyStopping
 from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import StandardScaler, LabelEncoder
 import joblib
+import json
 import os
 
 from src.model import data_loader
+from src.model.feature_shards import (SHARD_DIR, iter_shard_batches, read_shard_columns, shard_paths, shard_row_count,
+                                      validation_mask)
+from src.model.numpy_backend import export_numpy_weights
+from src.model.serving_bundle import build_serving_bundle
 
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 MODEL_DIR = os.path.join(SCRIPT_DIR, "data")
@@ -17,44 +27,94 @@ MODEL_PATH = os.path.join(MODEL_DIR, "model.keras")
 SCALER_PATH = os.path.join(MODEL_DIR, "scaler.joblib")
 DRIVER_ENCODER_PATH = os.path.join(MODEL_DIR, "driver_encoder.joblib")
 CONSTRUCTOR_ENCODER_PATH = os.path.join(MODEL_DIR, "constructor_encoder.joblib")
-
-def preprocess_data(df: pd.DataFrame):
+TRAINING_STATE_PATH = os.path.join(MODEL_DIR, "training_state.json")
+
+TARGET = 'points'
+CAT_FEATURES = ['driverid', 'constructorid']
+NUM_FEATURES = [
+    'grid',
+    'quali_position',
+    'driver_points_roll_5',
+    'constructor_points_roll_5'
+]
+EMBEDDING_LAYERS = {'driverid': 'embedding_driver', 'constructorid': 'embedding_constructor'}
+
+TRAINING_MODES = ('standard', 'fast')
+TRAINING_MODE = os.environ.get('REDLINE_TRAINING_MODE', 'standard')
+
+BASE_BATCH_SIZE = 32
+BASE_LEARNING_RATE = 0.001
+STANDARD_EPOCHS = 500
+STANDARD_PATIENCE = 100
+
+# Large batches amortize the per-step overhead that dominates this small network on CPU.
+FAST_BATCH_SIZE = int(os.environ.get('REDLINE_TRAIN_BATCH_SIZE', 1024))
+FAST_EPOCHS = int(os.environ.get('REDLINE_TRAIN_EPOCHS', 60))
+FAST_PATIENCE = int(os.environ.get('REDLINE_TRAIN_PATIENCE', 15))
+WARMUP_EPOCHS = int(os.environ.get('REDLINE_TRAIN_WARMUP_EPOCHS', 3))
+
+# 0 leaves the choice to TensorFlow (one thread per core).
+TRAIN_INTRA_OP_THREADS = int(os.environ.get('REDLINE_TRAIN_INTRA_OP_THREADS', 0))
+TRAIN_INTER_OP_THREADS = int(os.environ.get('REDLINE_TRAIN_INTER_OP_THREADS', 0))
+
+DEFAULT_ARCHITECTURE = {
+    'driver_embedding': 10,
+    'constructor_embedding': 8,
+    'dense_units': (128, 64, 32),
+    # Applied after the dense layer at the same position; the last hidden layer has none.
+    'dropout': (0.3, 0.2),
+}
+
+# Incremental retraining fine-tunes on the new rounds plus this many earlier rounds replayed alongside them.
+INCREMENTAL_CONTEXT_ROUNDS = int(os.environ.get('REDLINE_INCREMENTAL_CONTEXT_ROUNDS', 10))
+INCREMENTAL_EPOCHS = int(os.environ.get('REDLINE_INCREMENTAL_EPOCHS', 10))
+INCREMENTAL_LEARNING_RATE = float(os.environ.get('REDLINE_INCREMENTAL_LEARNING_RATE', BASE_LEARNING_RATE / 10))
+INCREMENTAL_PATIENCE = int(os.environ.get('REDLINE_INCREMENTAL_PATIENCE', 3))
+# A single round is about 20 results, too few for the before/after comparison to mean anything on its own.
+INCREMENTAL_MIN_HOLDOUT_ROWS = int(os.environ.get('REDLINE_INCREMENTAL_MIN_HOLDOUT_ROWS', 40))
+
+TRAIN_SEED = 42
+TEST_SIZE = 0.2
+
+def configure_threading(intra_op_threads=TRAIN_INTRA_OP_THREADS, inter_op_threads=TRAIN_INTER_OP_THREADS):
+    # Only takes effect before TensorFlow runs its first op.
+    try:
+        tf.config.threading.set_intra_op_parallelism_threads(intra_op_threads)
+        tf.config.threading.set_inter_op_parallelism_threads(inter_op_threads)
+    except RuntimeError as e:
+        print(f"Could not configure TensorFlow threading: {e}")
+
+def clean_features(df: pd.DataFrame):
+    df[NUM_FEATURES] = df[NUM_FEATURES].fillna(0)
+    df[CAT_FEATURES] = df[CAT_FEATURES].astype(object).fillna('unknown')
+    return df[CAT_FEATURES + NUM_FEATURES], df[TARGET]
+
+def preprocess_data(df: pd.DataFrame, save_artifacts=True):
 
     print("Starting preprocessing...")
 
-    os.makedirs(MODEL_DIR, exist_ok=True)
-
-    target = 'points'
-
-    cat_features = ['driverid', 'constructorid']
-    num_features = [
-        'grid',
-        'quali_position',
-        'driver_points_roll_5',
-        'constructor_points_roll_5'
-    ]
-
-    features = cat_features + num_features
-
-    df[num_features] = df[num_features].fillna(0)
-    df[cat_features] = df[cat_features].fillna('unknown')
+    if save_artifacts:
+        os.makedirs(MODEL_DIR, exist_ok=True)
 
-    X = df[features]
-    y = df[target]
+    X, y = clean_features(df)
 
     driver_encoder = LabelEncoder()
     X_cat_driver = driver_encoder.fit_transform(X['driverid'])
-    joblib.dump(driver_encoder, DRIVER_ENCODER_PATH)
+    if save_artifacts:
+        joblib.dump(driver_encoder, DRIVER_ENCODER_PATH)
 
     constructor_encoder = LabelEncoder()
     X_cat_constructor = constructor_encoder.fit_transform(X['constructorid'])
-    joblib.dump(constructor_encoder, CONSTRUCTOR_ENCODER_PATH)
+    if save_artifacts:
+        joblib.dump(constructor_encoder, CONSTRUCTOR_ENCODER_PATH)
 
     scaler = StandardScaler()
-    X_num = scaler.fit_transform(X[num_features])
-    joblib.dump(scaler, SCALER_PATH)
+    X_num = scaler.fit_transform(X[NUM_FEATURES])
+    if save_artifacts:
+        joblib.dump(scaler, SCALER_PATH)
 
-    print("Preprocessors saved.")
+    if save_artifacts:
+        print("Preprocessors saved.")
 
     (
         X_num_train, X_num_test,
@@ -66,8 +126,8 @@ def preprocess_data(df: pd.DataFrame):
         X_cat_driver,
         X_cat_constructor,
         y,
-        test_size=0.2,
-        random_state=42
+        test_size=TEST_SIZE,
+        random_state=TRAIN_SEED
     )
 
     X_train_list = [X_num_train, X_cat_driver_train, X_cat_constructor_train]
@@ -81,27 +141,29 @@ def preprocess_data(df: pd.DataFrame):
     return (X_train_list, X_test_list, y_train, y_test), vocab_sizes
 
 
-def build_model(vocab_sizes: dict, num_features_shape: int) -> Model:
+def build_model(vocab_sizes: dict, num_features_shape: int, learning_rate=BASE_LEARNING_RATE,
+                architecture=None) -> Model:
 
     print("Building model architecture...")
+    architecture = {**DEFAULT_ARCHITECTURE, **(architecture or {})}
 
     input_num = Input(shape=(num_features_shape,), name="input_numerical")
     input_driver = Input(shape=(1,), name="input_driverid")
     input_constructor = Input(shape=(1,), name="input_constructorid")
 
-    emb_driver = Embedding(input_dim=vocab_sizes['driverid'], output_dim=10, name="embedding_driver")(input_driver)
-    emb_constructor = Embedding(input_dim=vocab_sizes['constructorid'], output_dim=8, name="embedding_constructor")(input_constructor)
+    emb_driver = Embedding(input_dim=vocab_sizes['driverid'], output_dim=architecture['driver_embedding'], name="embedding_driver")(input_driver)
+    emb_constructor = Embedding(input_dim=vocab_sizes['constructorid'], output_dim=architecture['constructor_embedding'], name="embedding_constructor")(input_constructor)
 
     flat_driver = Flatten()(emb_driver)
     flat_constructor = Flatten()(emb_constructor)
 
     concat = Concatenate()([input_num, flat_driver, flat_constructor])
 
-    x = Dense(128, activation='relu')(concat)
-    x = Dropout(0.3)(x)
-    x = Dense(64, activation='relu')(x)
-    x = Dropout(0.2)(x)
-    x = Dense(32, activation='relu')(x)
+    x = concat
+    for idx, units in enumerate(architecture['dense_units']):
+        x = Dense(units, activation='relu')(x)
+        if idx < len(architecture['dropout']) and architecture['dropout'][idx] > 0:
+            x = Dropout(architecture['dropout'][idx])(x)
 
     output = Dense(1, activation='linear', name="output_points")(x)
 
@@ -111,42 +173,418 @@ def build_model(vocab_sizes: dict, num_features_shape: int) -> Model:
     )
 
     model.compile(
-        optimizer=tf.keras.optimizers.Adam(learning_rate=0.001),
+        optimizer=tf.keras.optimizers.Adam(learning_rate=learning_rate),
         loss='mean_squared_error',
         metrics=['mean_absolute_error']
     )
 
     return model
 
-def train_model():
+def make_dataset(X_list, y, batch_size, shuffle=False, seed=TRAIN_SEED) -> tf.data.Dataset:
+    features = tuple(np.asarray(part, dtype=np.float32 if idx == 0 else np.int32) for idx, part in enumerate(X_list))
+    dataset = tf.data.Dataset.from_tensor_slices((features, np.asarray(y, dtype=np.float32)))
+    # Cached once as tensors, so every later epoch skips the NumPy -> tensor conversion.
+    dataset = dataset.cache()
+    if shuffle:
+        dataset = dataset.shuffle(len(y), seed=seed, reshuffle_each_iteration=True)
+    return dataset.batch(batch_size).prefetch(tf.data.AUTOTUNE)
+
+def scaled_learning_rate(batch_size, base_learning_rate=BASE_LEARNING_RATE, base_batch_size=BASE_BATCH_SIZE):
+    # Square-root scaling: the linear rule overshoots with Adam at a 32x larger batch.
+    return base_learning_rate * math.sqrt(batch_size / base_batch_size)
+
+def warmup_cosine_schedule(peak_learning_rate, steps_per_epoch, epochs=FAST_EPOCHS, warmup_epochs=WARMUP_EPOCHS):
+    warmup_steps = max(1, warmup_epochs * steps_per_epoch)
+    return tf.keras.optimizers.schedules.CosineDecay(
+        initial_learning_rate=peak_learning_rate / 10,
+        decay_steps=max(1, (epochs - warmup_epochs) * steps_per_epoch),
+        alpha=0.05,
+        warmup_target=peak_learning_rate,
+        warmup_steps=warmup_steps,
+    )
 
-    raw_data = data_loader.fetch_all_data()
-    if raw_data.empty:
-        print("No data loaded. Exiting.")
-        return
+class EpochTimer(Callback):
 
-    processed_data = data_loader.feature_engineer(raw_data)
+    def on_train_begin(self, logs=None):
+        self.started_at = time.perf_counter()
+        self.elapsed = []
+        self.val_mae = []
 
-    (X_train_list, X_test_list, y_train, y_test), vocabs = preprocess_data(processed_data)
+    def on_epoch_end(self, epoch, logs=None):
+        self.elapsed.append(time.perf_counter() - self.started_at)
+        self.val_mae.append((logs or {}).get('val_mean_absolute_error', float('inf')))
 
-    model = build_model(vocabs, num_features_shape=X_train_list[0].shape[1])
-    model.summary()
+    def time_to_target(self, target_mae):
+        for epoch, (elapsed, val_mae) in enumerate(zip(self.elapsed, self.val_mae)):
+            if val_mae <= target_mae:
+                return elapsed, epoch + 1
+        return None, None
 
-    print("\nStarting model training...")
-    early_stopping = EarlyStopping(monitor='val_loss', patience=100, restore_best_weights=True)
+def fit_standard(vocabs, X_train_list, X_test_list, y_train, y_test, callbacks=(), verbose=1):
+    model = build_model(vocabs, num_features_shape=X_train_list[0].shape[1])
+    early_stopping = EarlyStopping(monitor='val_loss', patience=STANDARD_PATIENCE, restore_best_weights=True)
 
     history = model.fit(
         X_train_list,
         y_train,
         validation_data=(X_test_list, y_test),
-        epochs=500,
-        batch_size=32,
-        callbacks=[early_stopping],
-        verbose=1
+        epochs=STANDARD_EPOCHS,
+        batch_size=BASE_BATCH_SIZE,
+        callbacks=[early_stopping, *callbacks],
+        verbose=verbose
+    )
+    return model, history
+
+def fit_fast(vocabs, X_train_list, X_test_list, y_train, y_test, callbacks=(), verbose=1,
+             batch_size=FAST_BATCH_SIZE, epochs=FAST_EPOCHS, patience=FAST_PATIENCE):
+    train_dataset = make_dataset(X_train_list, y_train, batch_size, shuffle=True)
+    test_dataset = make_dataset(X_test_list, y_test, batch_size)
+
+    steps_per_epoch = math.ceil(len(y_train) / batch_size)
+    schedule = warmup_cosine_schedule(scaled_learning_rate(batch_size), steps_per_epoch, epochs)
+    model = build_model(vocabs, num_features_shape=X_train_list[0].shape[1], learning_rate=schedule)
+    early_stopping = EarlyStopping(monitor='val_loss', patience=patience, restore_best_weights=True)
+
+    history = model.fit(
+        train_dataset,
+        validation_data=test_dataset,
+        epochs=epochs,
+        shuffle=False,
+        callbacks=[early_stopping, *callbacks],
+        verbose=verbose
     )
+    return model, history
+
+FIT_FUNCTIONS = {'standard': fit_standard, 'fast': fit_fast}
+
+def train_model(mode=None):
+    mode = mode or TRAINING_MODE
+    if mode not in TRAINING_MODES:
+        raise ValueError(f"Unknown training mode '{mode}'.")
+    configure_threading()
+    tf.keras.utils.set_random_seed(TRAIN_SEED)
+
+    processed_data = data_loader.load_feature_data()
+    if processed_data.empty:
+        print("No data loaded. Exiting.")
+        return
+
+    (X_train_list, X_test_list, y_train, y_test), vocabs = preprocess_data(processed_data.copy())
 
+    print(f"\nStarting model training ({mode} mode)...")
+    model, history = FIT_FUNCTIONS[mode](vocabs, X_train_list, X_test_list, y_train, y_test)
+    model.summary()
+
+    publish_model(model, processed_data, mode)
+
+def publish_model(model, processed_data, mode):
     model.save(MODEL_PATH)
     print(f"\nModel training complete. Model saved to {MODEL_PATH}")
 
+    write_training_state(processed_data, mode)
+    export_numpy_weights(model, joblib.load(SCALER_PATH))
+    build_serving_bundle(processed_data,
+                         joblib.load(DRIVER_ENCODER_PATH),
+                         joblib.load(CONSTRUCTOR_ENCODER_PATH))
+
+def round_keys(df: pd.DataFrame) -> np.ndarray:
+    return df['race_year'].to_numpy(np.int64) * 1000 + df['race_round'].to_numpy(np.int64)
+
+def write_training_state(processed_data, mode):
+    last_key = int(round_keys(processed_data).max())
+    state = {
+        'last_year': last_key // 1000,
+        'last_round': last_key % 1000,
+        'rows': len(processed_data),
+        'mode': mode,
+        'trained_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    }
+    with open(TRAINING_STATE_PATH, 'w') as f:
+        json.dump(state, f, indent=2)
+
+def read_training_state():
+    if not os.path.exists(TRAINING_STATE_PATH):
+        return None
+    with open(TRAINING_STATE_PATH) as f:
+        return json.load(f)
+
+def extend_encoder(encoder, labels) -> list:
+    # Unseen labels are appended, so every existing id keeps its code and its embedding row.
+    known = set(encoder.classes_)
+    new_labels = sorted({label for label in labels if label not in known})
+    if new_labels:
+        encoder.classes_ = np.concatenate([np.asarray(encoder.classes_, dtype=object),
+                                           np.asarray(new_labels, dtype=object)])
+    return new_labels
+
+def expand_embeddings(model, vocab_sizes: dict):
+    layer_sizes = {EMBEDDING_LAYERS[feature]: size for feature, size in vocab_sizes.items()}
+    if all(model.get_layer(name).input_dim >= size for name, size in layer_sizes.items()):
+        return model
+
+    def clone_layer(layer):
+        config = layer.get_config()
+        if layer.name in layer_sizes:
+            config['input_dim'] = max(layer.input_dim, layer_sizes[layer.name])
+        return layer.__class__.from_config(config)
+
+    expanded = clone_model(model, clone_function=clone_layer)
+    for layer in model.layers:
+        weights = layer.get_weights()
+        if layer.name in layer_sizes:
+            table = weights[0]
+            # New ids start from the average embedding rather than a random vector.
+            n_new = expanded.get_layer(layer.name).input_dim - table.shape[0]
+            weights = [np.concatenate([table, np.repeat(table.mean(axis=0, keepdims=True), n_new, axis=0)])]
+        expanded.get_layer(layer.name).set_weights(weights)
+    return expanded
+
+def round_label(key) -> str:
+    return f"{key // 1000} R{key % 1000}"
+
+def incremental_holdout(selected_keys, new_rows, min_rows=INCREMENTAL_MIN_HOLDOUT_ROWS):
+    # Whole new rounds are held out latest first, always training on the earliest one; a lone new round
+    # gives up a share of its rows. Then the latest replayed rounds, until there are enough rows to compare.
+    new_keys = np.unique(selected_keys[new_rows])
+    holdout = np.zeros(len(selected_keys), dtype=bool)
+    sources = []
+    if len(new_keys) == 1:
+        _, holdout_index = train_test_split(np.flatnonzero(new_rows), test_size=TEST_SIZE, random_state=TRAIN_SEED)
+        holdout[holdout_index] = True
+        sources.append(f"{TEST_SIZE:.0%} of new round {round_label(new_keys[0])}")
+
+    candidates = [(key, "new") for key in new_keys[:0:-1]]
+    candidates += [(key, "replayed") for key in np.unique(selected_keys[~new_rows])[::-1]]
+    for key, kind in candidates:
+        if sources and holdout.sum() >= min_rows:
+            break
+        holdout |= selected_keys == key
+        sources.append(f"{kind} round {round_label(key)}")
+    return holdout, ", ".join(sources)
+
+def retrain_incremental(context_rounds=INCREMENTAL_CONTEXT_ROUNDS, epochs=INCREMENTAL_EPOCHS):
+    state = read_training_state()
+    if state is None or not os.path.exists(MODEL_PATH):
+        print(f"No previous training found ({TRAINING_STATE_PATH}). Run a full training first.")
+        return
+
+    configure_threading()
+    tf.keras.utils.set_random_seed(TRAIN_SEED)
+
+    processed_data = data_loader.load_feature_data()
+    if processed_data.empty:
+        print("No data loaded. Exiting.")
+        return
+
+    keys = round_keys(processed_data)
+    last_trained_key = state['last_year'] * 1000 + state['last_round']
+    is_new = keys > last_trained_key
+    if not is_new.any():
+        print(f"Model is up to date with {state['last_year']} round {state['last_round']}.")
+        return
+
+    # The new rounds plus a short replay of the rounds before them, so the fine-tune does not forget them.
+    replay_keys = np.unique(keys[~is_new])[-context_rounds:] if context_rounds else []
+    selected = is_new | np.isin(keys, replay_keys)
+    X, y = clean_features(processed_data.loc[selected].copy())
+    new_rows = is_new[selected]
+
+    holdout, holdout_source = incremental_holdout(keys[selected], new_rows)
+    if holdout.sum() < INCREMENTAL_MIN_HOLDOUT_ROWS:
+        print(f"Only {int(holdout.sum())} results can be held out ({holdout_source}), fewer than "
+              f"REDLINE_INCREMENTAL_MIN_HOLDOUT_ROWS={INCREMENTAL_MIN_HOLDOUT_ROWS}. "
+              f"Replay more rounds or run a full training.")
+        return
+
+    driver_encoder = joblib.load(DRIVER_ENCODER_PATH)
+    constructor_encoder = joblib.load(CONSTRUCTOR_ENCODER_PATH)
+    # The scaler stays as fitted: refitting it would shift every input the model has learned.
+    scaler = joblib.load(SCALER_PATH)
+    new_drivers = extend_encoder(driver_encoder, X['driverid'])
+    new_constructors = extend_encoder(constructor_encoder, X['constructorid'])
+
+    X_list = [
+        scaler.transform(X[NUM_FEATURES]),
+        driver_encoder.transform(X['driverid']),
+        constructor_encoder.transform(X['constructorid'])
+    ]
+    model = expand_embeddings(load_model(MODEL_PATH, compile=False), {
+        'driverid': len(driver_encoder.classes_),
+        'constructorid': len(constructor_encoder.classes_)
+    })
+    model.compile(
+        optimizer=tf.keras.optimizers.Adam(learning_rate=INCREMENTAL_LEARNING_RATE),
+        loss='mean_squared_error',
+        metrics=['mean_absolute_error']
+    )
+
+    print(f"\nFine-tuning on {int((new_rows & ~holdout).sum())} new and {int((~new_rows).sum())} replayed results, "
+          f"validating on {int(holdout.sum())} held-out results from {holdout_source} "
+          f"(new drivers: {new_drivers or 'none'}, new constructors: {new_constructors or 'none'})...")
+    train_dataset = make_dataset([part[~holdout] for part in X_list], y[~holdout], BASE_BATCH_SIZE, shuffle=True)
+    holdout_dataset = make_dataset([part[holdout] for part in X_list], y[holdout], FAST_BATCH_SIZE)
+    mae_before = model.evaluate(holdout_dataset, verbose=0)[1]
+    early_stopping = EarlyStopping(monitor='val_mean_absolute_error', patience=INCREMENTAL_PATIENCE,
+                                   restore_best_weights=True)
+    model.fit(train_dataset, validation_data=holdout_dataset, epochs=epochs, shuffle=False,
+              callbacks=[early_stopping], verbose=1)
+    mae_after = model.evaluate(holdout_dataset, verbose=0)[1]
+    print(f"Held-out MAE: {mae_before:.4f} before, {mae_after:.4f} after fine-tuning.")
+
+    if mae_after > mae_before:
+        # Nothing is written, so the served model, the encoders and training_state.json stay as they were.
+        print("Fine-tuning made the held-out rounds worse; keeping the current model. "
+              "Run a full training to take in the new rounds.")
+        return
+
+    joblib.dump(driver_encoder, DRIVER_ENCODER_PATH)
+    joblib.dump(constructor_encoder, CONSTRUCTOR_ENCODER_PATH)
+    publish_model(model, processed_data, 'incremental')
+
+def fit_streaming_preprocessors(paths):
+    # One pass over the shards: label sets for the encoders and running moments for the scaler.
+    driver_ids, constructor_ids = set(), set()
+    scaler = StandardScaler()
+    for _, batch in iter_shard_batches(paths, CAT_FEATURES + NUM_FEATURES + [TARGET]):
+        X, _ = clean_features(batch)
+        driver_ids.update(X['driverid'].unique())
+        constructor_ids.update(X['constructorid'].unique())
+        scaler.partial_fit(X[NUM_FEATURES])
+
+    driver_encoder = LabelEncoder().fit(sorted(driver_ids))
+    constructor_encoder = LabelEncoder().fit(sorted(constructor_ids))
+    return scaler, driver_encoder, constructor_encoder
+
+def shard_dataset(paths, preprocessors, batch_size, split, shuffle=False, seed=TRAIN_SEED) -> tf.data.Dataset:
+    scaler, driver_encoder, constructor_encoder = preprocessors
+    epochs = itertools.count()
+
+    def generate():
+        rng = np.random.default_rng([seed, next(epochs)])
+        # Shuffled across shards by order and within each decoded block, never across the whole history.
+        for shard in (rng.permutation(len(paths)) if shuffle else range(len(paths))):
+            path = paths[shard]
+            in_validation = validation_mask(path, shard_row_count([path]), TEST_SIZE, seed)
+            offset = 0
+            for _, batch in iter_shard_batches([path], CAT_FEATURES + NUM_FEATURES + [TARGET]):
+                keep = in_validation[offset:offset + len(batch)]
+                offset += len(batch)
+                X, y = clean_features(batch.loc[keep if split == 'test' else ~keep].copy())
+                if X.empty:
+                    continue
+
+                X_num = scaler.transform(X[NUM_FEATURES]).astype(np.float32)
+                X_driver = driver_encoder.transform(X['driverid']).astype(np.int32)
+                X_constructor = constructor_encoder.transform(X['constructorid']).astype(np.int32)
+                y = y.to_numpy(np.float32)
+
+                rows = rng.permutation(len(y)) if shuffle else np.arange(len(y))
+                for start in range(0, len(rows), batch_size):
+                    idx = rows[start:start + batch_size]
+                    yield (X_num[idx], X_driver[idx], X_constructor[idx]), y[idx]
+
+    signature = (
+        (tf.TensorSpec(shape=(None, len(NUM_FEATURES)), dtype=tf.float32),
+         tf.TensorSpec(shape=(None,), dtype=tf.int32),
+         tf.TensorSpec(shape=(None,), dtype=tf.int32)),
+        tf.TensorSpec(shape=(None,), dtype=tf.float32),
+    )
+    return tf.data.Dataset.from_generator(generate, output_signature=signature).prefetch(tf.data.AUTOTUNE)
+
+def train_model_out_of_core(shard_dir=SHARD_DIR, batch_size=FAST_BATCH_SIZE, epochs=FAST_EPOCHS,
+                            patience=FAST_PATIENCE):
+    paths = shard_paths(shard_dir)
+    if not paths:
+        print(f"No feature shards found in {shard_dir}. Write them with `python -m src.model.feature_shards`.")
+        return
+
+    configure_threading()
+    tf.keras.utils.set_random_seed(TRAIN_SEED)
+
+    print(f"Fitting encoders and scaler over {len(paths)} shard(s)...")
+    preprocessors = fit_streaming_preprocessors(paths)
+    scaler, driver_encoder, constructor_encoder = preprocessors
+    os.makedirs(MODEL_DIR, exist_ok=True)
+    joblib.dump(driver_encoder, DRIVER_ENCODER_PATH)
+    joblib.dump(constructor_encoder, CONSTRUCTOR_ENCODER_PATH)
+    joblib.dump(scaler, SCALER_PATH)
+    print("Preprocessors saved.")
+
+    vocabs = {
+        'driverid': len(driver_encoder.classes_),
+        'constructorid': len(constructor_encoder.classes_)
+    }
+    steps_per_epoch = math.ceil(shard_row_count(paths) * (1 - TEST_SIZE) / batch_size)
+    schedule = warmup_cosine_schedule(scaled_learning_rate(batch_size), steps_per_epoch, epochs)
+    model = build_model(vocabs, num_features_shape=len(NUM_FEATURES), learning_rate=schedule)
+
+    print("\nStarting out-of-core model training...")
+    model.fit(
+        shard_dataset(paths, preprocessors, batch_size, 'train', shuffle=True),
+        validation_data=shard_dataset(paths, preprocessors, batch_size, 'test'),
+        epochs=epochs,
+        callbacks=[EarlyStopping(monitor='val_loss', patience=patience, restore_best_weights=True)],
+        verbose=1
+    )
+    model.summary()
+
+    publish_model(model, read_shard_columns(paths), 'out-of-core')
+
+def benchmark_training(modes=TRAINING_MODES, tolerance=0.01, verbose=0):
+    # Every mode trains on the same split and seed; the first mode's best validation MAE is the target.
+    configure_threading()
+    processed_data = data_loader.load_feature_data()
+    if processed_data.empty:
+        print("No data loaded. Exiting.")
+        return {}
+
+    (X_train_list, X_test_list, y_train, y_test), vocabs = preprocess_data(processed_data.copy(),
+                                                                          save_artifacts=False)
+    print(f"--- Training benchmark: {len(y_train)} train / {len(y_test)} validation rows ---")
+
+    timers = {}
+    results = {}
+    for mode in modes:
+        tf.keras.utils.set_random_seed(TRAIN_SEED)
+        timers[mode] = EpochTimer()
+        started_at = time.perf_counter()
+        model, history = FIT_FUNCTIONS[mode](vocabs, X_train_list, X_test_list, y_train, y_test,
+                                             callbacks=[timers[mode]], verbose=verbose)
+        results[mode] = {
+            'wall_seconds': time.perf_counter() - started_at,
+            'epochs': len(history.history['loss']),
+            'best_val_mae': float(min(history.history['val_mean_absolute_error'])),
+        }
+        print(f"  > {mode}: {results[mode]['wall_seconds']:.1f}s for {results[mode]['epochs']} epochs, "
+              f"best val MAE {results[mode]['best_val_mae']:.4f}")
+
+    target_mae = results[modes[0]]['best_val_mae'] * (1 + tolerance)
+    print(f"--- Time to val MAE <= {target_mae:.4f} ({modes[0]} best + {tolerance:.0%}) ---")
+    for mode in modes:
+        seconds, epoch = timers[mode].time_to_target(target_mae)
+        results[mode]['seconds_to_target'] = seconds
+        reached = f"{seconds:.1f}s (epoch {epoch})" if seconds is not None else "not reached"
+        print(f"  > {mode}: {reached}")
+    return results
+
 if __name__ == "__main__":
-    train_model()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Train the Redline points model.")
+    parser.add_argument('--mode', choices=TRAINING_MODES, default=None,
+                        help="Training mode (default: REDLINE_TRAINING_MODE or standard).")
+    parser.add_argument('--incremental', action='store_true',
+                        help="Fine-tune the saved model on the rounds added since it was last trained.")
+    parser.add_argument('--out-of-core', action='store_true',
+                        help="Stream the training data from the per-season feature shards instead of loading it.")
+    parser.add_argument('--shard-dir', default=SHARD_DIR)
+    parser.add_argument('--benchmark', action='store_true',
+                        help="Compare wall time and validation MAE of the training modes without saving artifacts.")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        benchmark_training()
+    elif args.incremental:
+        retrain_incremental()
+    elif args.out_of_core:
+        train_model_out_of_core(args.shard_dir)
+    else:
+        train_model(args.mode)
\ No newline at end of file
@@ -0,0 +1,136 @@
+import os
+import threading
+
+import numpy as np
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+MODEL_DIR = os.path.join(SCRIPT_DIR, "data")
+NUMPY_WEIGHTS_PATH = os.path.join(MODEL_DIR, "model_weights.npz")
+
+N_NUMERICAL_FEATURES = 4
+ACTIVATIONS = ('relu', 'linear')
+
+
+def export_numpy_weights(model, scaler, path=NUMPY_WEIGHTS_PATH):
+    driver_embedding = model.get_layer("embedding_driver").get_weights()[0]
+    constructor_embedding = model.get_layer("embedding_constructor").get_weights()[0]
+    dense_layers = [layer for layer in model.layers if type(layer).__name__ == 'Dense']
+
+    first_kernel, first_bias = dense_layers[0].get_weights()
+    n_driver_dims = driver_embedding.shape[1]
+    num_kernel = first_kernel[:N_NUMERICAL_FEATURES]
+    driver_kernel = first_kernel[N_NUMERICAL_FEATURES:N_NUMERICAL_FEATURES + n_driver_dims]
+    constructor_kernel = first_kernel[N_NUMERICAL_FEATURES + n_driver_dims:]
+
+    # Fold the StandardScaler into the first layer: ((x - mean) / scale) @ W == x @ (W / scale) - (mean / scale) @ W
+    folded_num_kernel = num_kernel / scaler.scale_[:, None]
+    folded_bias = first_bias - (scaler.mean_ / scaler.scale_) @ num_kernel
+
+    # Fold each embedding table into its slice of the first layer, turning it into a row lookup.
+    arrays = {
+        'num_kernel': folded_num_kernel,
+        'first_bias': folded_bias,
+        'driver_table': driver_embedding @ driver_kernel,
+        'constructor_table': constructor_embedding @ constructor_kernel,
+        'first_activation': np.array(dense_layers[0].activation.__name__),
+        'n_hidden': np.array(len(dense_layers) - 1),
+    }
+    for idx, layer in enumerate(dense_layers[1:]):
+        kernel, bias = layer.get_weights()
+        arrays[f'kernel_{idx}'] = kernel
+        arrays[f'bias_{idx}'] = bias
+        arrays[f'activation_{idx}'] = np.array(layer.activation.__name__)
+
+    for name, value in arrays.items():
+        if value.dtype.kind == 'f':
+            arrays[name] = value.astype(np.float32)
+
+    np.savez(path, **arrays)
+    print(f"NumPy weights exported to {path}")
+
+
+class NumpyPointsModel:
+
+    # The scaler is folded into num_kernel, so predict() takes the raw numerical features.
+    expects_scaled_input = False
+
+    def __init__(self, num_kernel, first_bias, driver_table, constructor_table, layers, first_activation='relu'):
+        self.num_kernel = num_kernel
+        self.first_bias = first_bias
+        self.driver_table = driver_table
+        self.constructor_table = constructor_table
+        self.first_activation = first_activation
+        self.layers = layers
+        self._local = threading.local()
+
+        for activation in [first_activation] + [layer[2] for layer in layers]:
+            if activation not in ACTIVATIONS:
+                raise ValueError(f"Unsupported activation '{activation}' in exported weights.")
+
+    @classmethod
+    def load(cls, path=NUMPY_WEIGHTS_PATH):
+        with np.load(path, allow_pickle=False) as weights:
+            layers = [(weights[f'kernel_{idx}'], weights[f'bias_{idx}'], str(weights[f'activation_{idx}']))
+                      for idx in range(int(weights['n_hidden']))]
+            return cls(weights['num_kernel'], weights['first_bias'],
+                       weights['driver_table'], weights['constructor_table'],
+                       layers, str(weights['first_activation']))
+
+    def _get_buffers(self, batch_size):
+        # Preallocated per thread so concurrent requests never share scratch space.
+        if not hasattr(self._local, 'buffers'):
+            self._local.buffers = {}
+        buffers = self._local.buffers
+        if batch_size not in buffers:
+            widths = [self.first_bias.shape[0]] + [bias.shape[0] for _, bias, _ in self.layers]
+            buffers[batch_size] = (
+                np.empty((batch_size, widths[0]), dtype=np.float32),
+                [np.empty((batch_size, width), dtype=np.float32) for width in widths]
+            )
+        return buffers[batch_size]
+
+    def predict(self, inputs, batch_size=4096, verbose=0):
+        num_features, driver_ids, constructor_ids = inputs
+        num_features = np.asarray(num_features, dtype=np.float32)
+        driver_ids = np.asarray(driver_ids, dtype=np.intp).reshape(-1)
+        constructor_ids = np.asarray(constructor_ids, dtype=np.intp).reshape(-1)
+
+        n_samples = num_features.shape[0]
+        output = np.empty((n_samples, self.layers[-1][1].shape[0] if self.layers else self.first_bias.shape[0]),
+                          dtype=np.float32)
+        gather_buffer, activations = self._get_buffers(batch_size)
+
+        for start in range(0, n_samples, batch_size):
+            stop = min(start + batch_size, n_samples)
+            rows = stop - start
+            gathered = gather_buffer[:rows]
+            hidden = activations[0][:rows]
+
+            np.matmul(num_features[start:stop], self.num_kernel, out=hidden)
+            np.take(self.driver_table, driver_ids[start:stop], axis=0, out=gathered)
+            hidden += gathered
+            np.take(self.constructor_table, constructor_ids[start:stop], axis=0, out=gathered)
+            hidden += gathered
+            hidden += self.first_bias
+            if self.first_activation == 'relu':
+                np.maximum(hidden, 0, out=hidden)
+
+            for idx, (kernel, bias, activation) in enumerate(self.layers):
+                next_hidden = activations[idx + 1][:rows]
+                np.matmul(hidden, kernel, out=next_hidden)
+                next_hidden += bias
+                if activation == 'relu':
+                    np.maximum(next_hidden, 0, out=next_hidden)
+                hidden = next_hidden
+
+            output[start:stop] = hidden
+
+        return output
+
+
+if __name__ == "__main__":
+    import joblib
+    from tensorflow.keras.models import load_model
+
+    export_numpy_weights(load_model(os.path.join(MODEL_DIR, "model.keras")),
+                         joblib.load(os.path.join(MODEL_DIR, "scaler.joblib")))
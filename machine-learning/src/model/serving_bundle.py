@@ -0,0 +1,89 @@
+import os
+import time
+
+import joblib
+import numpy as np
+from sklearn.preprocessing import LabelEncoder
+
+from src.model.feature_snapshot import FeatureSnapshot, build_feature_snapshot
+
+BUNDLE_FORMAT_VERSION = 1
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+MODEL_DIR = os.path.join(SCRIPT_DIR, "data")
+SERVING_BUNDLE_PATH = os.environ.get('REDLINE_SERVING_BUNDLE', os.path.join(MODEL_DIR, "serving_bundle.npz"))
+
+SNAPSHOT_ARRAYS = {
+    'driver_ids': str,
+    'driver_constructor': str,
+    'driver_points_roll_5': np.float64,
+    'q_proxy': np.float64,
+    'q_stdev': np.float64,
+    'dnf_rate': np.float64,
+    'driver_encoded': np.int64,
+    'constructor_ids': str,
+    'constructor_points_roll_5': np.float64,
+    'constructor_encoded': np.int64,
+}
+
+
+def restore_label_encoder(classes) -> LabelEncoder:
+    encoder = LabelEncoder()
+    encoder.classes_ = classes.astype(object)
+    return encoder
+
+
+def save_serving_bundle(path, snapshot: FeatureSnapshot, noise_factor, driver_encoder, constructor_encoder):
+    arrays = {f"snapshot_{name}": np.asarray(getattr(snapshot, name)).astype(dtype)
+              for name, dtype in SNAPSHOT_ARRAYS.items()}
+
+    tmp_path = f"{path}.tmp.npz"
+    np.savez(
+        tmp_path,
+        format_version=np.int64(BUNDLE_FORMAT_VERSION),
+        created_at=np.float64(time.time()),
+        noise_factor=np.float64(noise_factor),
+        data_version=np.asarray(snapshot.version, dtype=np.int64),
+        driver_classes=np.asarray(driver_encoder.classes_).astype(str),
+        constructor_classes=np.asarray(constructor_encoder.classes_).astype(str),
+        **arrays
+    )
+    os.replace(tmp_path, path)
+    print(f"Serving bundle saved to {path}")
+
+
+def load_serving_bundle(path) -> dict:
+    with np.load(path, allow_pickle=False) as bundle:
+        format_version = int(bundle['format_version'])
+        if format_version != BUNDLE_FORMAT_VERSION:
+            raise ValueError(f"Serving bundle format {format_version} is not supported "
+                             f"(expected {BUNDLE_FORMAT_VERSION}).")
+
+        snapshot = FeatureSnapshot(
+            version=tuple(int(v) for v in bundle['data_version']),
+            **{name: bundle[f"snapshot_{name}"] for name in SNAPSHOT_ARRAYS}
+        )
+        snapshot.driver_constructor = snapshot.driver_constructor.astype(object)
+
+        return {
+            'noise_factor': float(bundle['noise_factor']),
+            'created_at': float(bundle['created_at']),
+            'driver_encoder': restore_label_encoder(bundle['driver_classes']),
+            'constructor_encoder': restore_label_encoder(bundle['constructor_classes']),
+            'snapshot': snapshot,
+        }
+
+
+def build_serving_bundle(all_data_features, driver_encoder, constructor_encoder, path=SERVING_BUNDLE_PATH):
+    noise_factor = all_data_features['points'].std()
+    snapshot = build_feature_snapshot(all_data_features, driver_encoder, constructor_encoder)
+    save_serving_bundle(path, snapshot, noise_factor, driver_encoder, constructor_encoder)
+
+
+if __name__ == "__main__":
+    from src.model import data_loader
+
+    history = data_loader.load_feature_data()
+    build_serving_bundle(history,
+                         joblib.load(os.path.join(MODEL_DIR, "driver_encoder.joblib")),
+                         joblib.load(os.path.join(MODEL_DIR, "constructor_encoder.joblib")))
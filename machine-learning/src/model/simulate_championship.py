@@ -1,11 +1,24 @@
+import fcntl
+import hashlib
+import math
+import multiprocessing
 import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import contextmanager
 
 import joblib
 import numpy as np
 import pandas as pd
-from tensorflow.keras.models import load_model
+import psycopg2
 
 from src.model import data_loader
+from src.model.feature_snapshot import (FeatureSnapshot, assemble_feature_snapshot, build_feature_snapshot, data_version,
+                                        lookup_features)
+from src.model.fused_kernel import NUMBA_AVAILABLE, fused_footprint, fused_season_points
+from src.model.numpy_backend import NUMPY_WEIGHTS_PATH, NumpyPointsModel
+from src.model.serving_bundle import SERVING_BUNDLE_PATH, load_serving_bundle, save_serving_bundle
 
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 MODEL_DIR = os.path.join(SCRIPT_DIR, "data")
@@ -16,82 +29,286 @@ CONSTRUCTOR_ENCODER_PATH = os.path.join(MODEL_DIR, "constructor_encoder.joblib")
 
 N_SIMULATIONS = 50000
 
+INFERENCE_MODES = ('tabulated', 'full', 'fused')
+INFERENCE_MODE = os.environ.get('REDLINE_INFERENCE_MODE', 'tabulated')
+
+INFERENCE_BACKENDS = ('keras', 'numpy')
+INFERENCE_BACKEND = os.environ.get('REDLINE_INFERENCE_BACKEND', 'keras')
+
+GRID_SLOTS = np.arange(1, 21)
+
+SIM_MEMORY_MB = int(os.environ.get('REDLINE_SIM_MEMORY_MB', 512))
+SAMPLE_BYTES = {'tabulated': 64, 'full': 192}
+
+SIM_SEED = int(os.environ['REDLINE_SIM_SEED']) if os.environ.get('REDLINE_SIM_SEED') else None
+SIM_WORKERS = int(os.environ.get('REDLINE_SIM_WORKERS', 1))
+SIM_START_METHOD = os.environ.get('REDLINE_SIM_START_METHOD', 'spawn')
+_SIM_POOLS = {}
+
+SIMULATION_OUTPUTS = ('winner', 'positions', 'pointsQuantiles', 'constructors')
+POINTS_PERCENTILES = (5, 25, 50, 75, 95)
+# Season points are counted in fixed bins per driver, so pointsQuantiles costs the same memory at any simulation count.
+POINTS_BIN_WIDTH = 0.25
+EVENT_POINTS_CEILING = 60.0
+
+ADAPTIVE_BATCH_SIMULATIONS = int(os.environ.get('REDLINE_ADAPTIVE_BATCH', 5000))
+ADAPTIVE_MAX_SIMULATIONS = int(os.environ.get('REDLINE_ADAPTIVE_MAX_SIMULATIONS', 500000))
+CONFIDENCE_LEVEL = 0.95
+CONFIDENCE_Z = 1.959963984540054
+
+# Seconds between checks of the ingestion_state watermark; 0 turns the automatic refresh off.
+FEATURE_REFRESH_SECONDS = float(os.environ.get('REDLINE_FEATURE_REFRESH_SECONDS', 300))
+_feature_refresh_lock = threading.Lock()
+# Shared by the workers of a pre-fork server: one of them rebuilds the snapshot and the others load its copy.
+FEATURE_SHARE_DIR = os.environ.get('REDLINE_FEATURE_DIR')
+_feature_checked_at = None
+_ingestion_watermark = None
+# The last version this process rebuilt itself, as opposed to adopting it from the shared directory.
+refreshed_feature_version = None
+
+def load_points_model(backend=None):
+    backend = backend or INFERENCE_BACKEND
+    if backend not in INFERENCE_BACKENDS:
+        raise ValueError(f"Unknown inference backend '{backend}'.")
+
+    if backend == 'numpy':
+        print(f"--- Using NumPy inference backend ({NUMPY_WEIGHTS_PATH}) ---")
+        return NumpyPointsModel.load(NUMPY_WEIGHTS_PATH)
+
+    from tensorflow.keras.models import load_model
+    return load_model(MODEL_PATH)
+
 def load_simulation_tools():
     try:
-        model = load_model(MODEL_PATH)
+        model = load_points_model()
         scaler = joblib.load(SCALER_PATH)
+
+        if os.path.exists(SERVING_BUNDLE_PATH):
+            try:
+                bundle = load_serving_bundle(SERVING_BUNDLE_PATH)
+                print(f"--- Serving bundle loaded: {SERVING_BUNDLE_PATH} ---")
+                print(f"--- Noise factor (StDev) loaded: {bundle['noise_factor']:.4f} ---")
+                return (model, scaler, bundle['driver_encoder'], bundle['constructor_encoder'],
+                        bundle['noise_factor'], bundle['snapshot'])
+            except (OSError, KeyError, ValueError) as e:
+                print(f"Could not load serving bundle, falling back to the database: {e}")
+
         driver_encoder = joblib.load(DRIVER_ENCODER_PATH)
         constructor_encoder = joblib.load(CONSTRUCTOR_ENCODER_PATH)
 
-        all_data = data_loader.feature_engineer(data_loader.fetch_all_data())
-        noise_factor = all_data['points'].std()
+        if data_loader.FEATURE_SOURCE == 'sql':
+            noise_factor, snapshot = load_sql_feature_snapshot(driver_encoder, constructor_encoder)
+        else:
+            all_data = load_historical_data_for_features()
+            noise_factor = all_data['points'].std()
+            snapshot = build_feature_snapshot(all_data, driver_encoder, constructor_encoder)
         print(f"--- Noise factor (StDev) loaded: {noise_factor:.4f} ---")
 
-        return model, scaler, driver_encoder, constructor_encoder, noise_factor
+        return model, scaler, driver_encoder, constructor_encoder, noise_factor, snapshot
     except Exception as e:
         print(f"Error loading model or preprocessors: {e}")
-        return None, None, None, None, None
+        return None, None, None, None, None, None
+
+def compute_model_fingerprint():
+    digest = hashlib.sha256()
+    for path in (MODEL_PATH, SCALER_PATH, DRIVER_ENCODER_PATH, CONSTRUCTOR_ENCODER_PATH, SERVING_BUNDLE_PATH,
+                 NUMPY_WEIGHTS_PATH):
+        if os.path.exists(path):
+            with open(path, 'rb') as f:
+                digest.update(f.read())
+    return digest.hexdigest()[:16]
 
 def load_historical_data_for_features():
-    all_data_raw = data_loader.fetch_all_data()
-    all_data_features = data_loader.feature_engineer(all_data_raw)
-    return all_data_features
+    return data_loader.load_feature_data()
+
+def load_sql_feature_snapshot(driver_encoder, constructor_encoder):
+    version, latest, constructor_roll_5, noise_factor = data_loader.fetch_snapshot_features()
+    print(f"Feature snapshot read from the materialized views ({version[0]} results).")
+    return noise_factor, assemble_feature_snapshot(version, latest, constructor_roll_5, driver_encoder,
+                                                   constructor_encoder)
+
+def prepare_simulation_features(snapshot: FeatureSnapshot, drivers_db_ids: list, constructors_db_map: dict):
+    return lookup_features(snapshot, drivers_db_ids, constructors_db_map)
+
+def refresh_feature_snapshot(df_historical: pd.DataFrame = None):
+    global FEATURE_SNAPSHOT, NOISE_FACTOR
+    if DRIVER_ENC is None or CONSTRUCTOR_ENC is None:
+        return FEATURE_SNAPSHOT
+    if df_historical is None and data_loader.FEATURE_SOURCE == 'sql':
+        NOISE_FACTOR, FEATURE_SNAPSHOT = load_sql_feature_snapshot(DRIVER_ENC, CONSTRUCTOR_ENC)
+        return FEATURE_SNAPSHOT
+    if df_historical is None:
+        df_historical = load_historical_data_for_features()
+    if df_historical.empty:
+        return FEATURE_SNAPSHOT
+
+    if FEATURE_SNAPSHOT is None or FEATURE_SNAPSHOT.version != data_version(df_historical):
+        FEATURE_SNAPSHOT = build_feature_snapshot(df_historical, DRIVER_ENC, CONSTRUCTOR_ENC)
+        NOISE_FACTOR = float(df_historical['points'].std())
+    return FEATURE_SNAPSHOT
+
+@contextmanager
+def shared_refresh_lock():
+    if not FEATURE_SHARE_DIR:
+        yield
+        return
+    os.makedirs(FEATURE_SHARE_DIR, exist_ok=True)
+    with open(os.path.join(FEATURE_SHARE_DIR, "refresh.lock"), 'w') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
 
-def prepare_simulation_features(df_historical: pd.DataFrame, drivers_db_ids: list, constructors_db_map: dict):
-    df_sorted = df_historical.sort_values(by=['race_year', 'race_round'])
-    latest_features_base = df_sorted.groupby('driverid').last().reset_index()
+def shared_snapshot_path():
+    return os.path.join(FEATURE_SHARE_DIR, "feature_snapshot.npz")
 
-    features_needed = ['driverid', 'constructorid']
-    latest_features = latest_features_base[features_needed]
+def adopt_shared_snapshot(version) -> bool:
+    global FEATURE_SNAPSHOT, NOISE_FACTOR
+    if not FEATURE_SHARE_DIR or not os.path.exists(shared_snapshot_path()):
+        return False
+    try:
+        bundle = load_serving_bundle(shared_snapshot_path())
+    except (OSError, KeyError, ValueError) as e:
+        print(f"Could not read the shared feature snapshot, rebuilding it: {e}")
+        return False
+    if bundle['snapshot'].version != version:
+        return False
+    FEATURE_SNAPSHOT = bundle['snapshot']
+    NOISE_FACTOR = bundle['noise_factor']
+    return True
+
+def check_feature_snapshot(force=False) -> bool:
+    # The ingestion_state watermark is a cheap gate: the snapshot is only compared and rebuilt after a new commit.
+    global _feature_checked_at, _ingestion_watermark, refreshed_feature_version
+    if not _feature_refresh_lock.acquire(blocking=force):
+        return False
+
+    previous_version = getattr(FEATURE_SNAPSHOT, 'version', None)
+    try:
+        watermark = data_loader.fetch_ingestion_watermark()
+        if watermark == _ingestion_watermark:
+            return False
+
+        latest_version = data_loader.fetch_data_version()
+        if latest_version != previous_version:
+            with shared_refresh_lock():
+                # Another worker may have rebuilt this version while this one waited for the lock.
+                if not adopt_shared_snapshot(latest_version):
+                    df_historical = None
+                    if data_loader.FEATURE_SOURCE != 'sql':
+                        df_historical = load_historical_data_for_features()
+                        if df_historical.empty:
+                            print("Feature snapshot refresh fetched no history; retrying at the next check.")
+                            return False
+                    refresh_feature_snapshot(df_historical)
+                    refreshed_feature_version = getattr(FEATURE_SNAPSHOT, 'version', None)
+                    if FEATURE_SHARE_DIR and FEATURE_SNAPSHOT is not None:
+                        save_serving_bundle(shared_snapshot_path(), FEATURE_SNAPSHOT, NOISE_FACTOR, DRIVER_ENC,
+                                            CONSTRUCTOR_ENC)
+        _ingestion_watermark = watermark
+    except psycopg2.Error as e:
+        print(f"Feature snapshot check failed, keeping version {previous_version}: {e}")
+        return False
+    finally:
+        _feature_checked_at = time.monotonic()
+        _feature_refresh_lock.release()
+
+    current_version = getattr(FEATURE_SNAPSHOT, 'version', None)
+    if current_version != previous_version:
+        print(f"Feature snapshot refreshed: {previous_version} -> {current_version}")
+        return True
+    return False
+
+def schedule_feature_refresh():
+    # Called on every request; the check itself runs on a background thread at most once per interval.
+    global _feature_checked_at
+    if FEATURE_REFRESH_SECONDS <= 0 or DRIVER_ENC is None or _feature_refresh_lock.locked():
+        return
+    now = time.monotonic()
+    if _feature_checked_at is not None and now - _feature_checked_at < FEATURE_REFRESH_SECONDS:
+        return
+    _feature_checked_at = now
+    threading.Thread(target=check_feature_snapshot, name='feature-refresh', daemon=True).start()
+
+(MODEL, SCALER, DRIVER_ENC, CONSTRUCTOR_ENC, NOISE_FACTOR, FEATURE_SNAPSHOT) = load_simulation_tools()
+MODEL_FINGERPRINT = compute_model_fingerprint()
+SCALER_FEATURE_NAMES = [
+    'grid', 'quali_position',
+    'driver_points_roll_5', 'constructor_points_roll_5'
+]
 
-    active_drivers_df = pd.DataFrame({'driverid': drivers_db_ids})
-    combined_df = pd.merge(active_drivers_df, latest_features, on='driverid', how='left')
-    combined_df['constructorid'] = combined_df['driverid'].map(constructors_db_map).fillna(combined_df['constructorid'])
+def predict_points(num_features, cat_driver, cat_constructor):
+    if getattr(MODEL, 'expects_scaled_input', True):
+        num_features = SCALER.transform(pd.DataFrame(num_features, columns=SCALER_FEATURE_NAMES))
+    return MODEL.predict([num_features, cat_driver, cat_constructor], batch_size=4096, verbose=0)
 
-    driver_roll_5 = df_sorted.groupby('driverid')['points'].rolling(window=5, min_periods=1).mean().reset_index()
-    driver_roll_5 = driver_roll_5.groupby('driverid').last()['points'].rename('driver_points_roll_5')
-    combined_df = combined_df.merge(driver_roll_5, on='driverid', how='left')
+def predict_points_full(sim_q, driver_roll, constructor_roll, driver_ids_encoded, constructor_ids_encoded):
+    n_sims, n_events, n_drivers = sim_q.shape
+    total_samples = sim_q.size
 
-    constructor_points = df_sorted.groupby(['race_year', 'race_round', 'constructorid'])['points'].sum().reset_index()
-    constructor_roll_5 = constructor_points.groupby('constructorid')['points'].rolling(window=5, min_periods=1).mean().reset_index()
-    constructor_roll_5 = constructor_roll_5.groupby('constructorid').last()['points'].rename('constructor_points_roll_5')
-    combined_df = combined_df.merge(constructor_roll_5, on='constructorid', how='left')
+    num_features_batch = np.zeros((total_samples, 4))
+    num_features_batch[:, 0] = sim_q.flatten()
+    num_features_batch[:, 1] = sim_q.flatten()
+    num_features_batch[:, 2] = np.tile(driver_roll, n_sims * n_events)
+    num_features_batch[:, 3] = np.tile(constructor_roll, n_sims * n_events)
 
-    q_history = df_sorted.groupby('driverid')['quali_position'].rolling(window=10, min_periods=1)
-    q_proxy = q_history.mean().reset_index().groupby('driverid').last()['quali_position'].rename('q_proxy')
-    q_stdev = q_history.std().reset_index().groupby('driverid').last()['quali_position'].rename('q_stdev')
+    cat_driver_batch = np.tile(driver_ids_encoded, n_sims * n_events)
+    cat_constructor_batch = np.tile(constructor_ids_encoded, n_sims * n_events)
 
-    combined_df = combined_df.merge(q_proxy, on='driverid', how='left')
-    combined_df = combined_df.merge(q_stdev, on='driverid', how='left')
+    print(f"Predicting {total_samples} samples ({n_drivers} drivers * {n_events} events * {n_sims} sims)...")
+    predicted_points_batch = predict_points(num_features_batch, cat_driver_batch, cat_constructor_batch)
+    print("Prediction complete.")
 
-    dnf_rate = df_sorted.groupby('driverid')['dnf'].mean().rename('dnf_rate')
-    combined_df = combined_df.merge(dnf_rate, on='driverid', how='left')
+    return predicted_points_batch.reshape(sim_q.shape)
 
-    combined_df['q_proxy'] = combined_df['q_proxy'].fillna(10.0)
-    combined_df['q_stdev'] = combined_df['q_stdev'].fillna(3.0)
-    combined_df['dnf_rate'] = combined_df['dnf_rate'].fillna(0.05)
-    combined_df = combined_df.fillna(0)
+def build_points_table(driver_roll, constructor_roll, driver_ids_encoded, constructor_ids_encoded):
+    n_drivers = len(driver_roll)
+    n_slots = len(GRID_SLOTS)
 
-    return combined_df.set_index('driverid')
+    num_features_table = np.zeros((n_drivers * n_slots, 4))
+    num_features_table[:, 0] = np.tile(GRID_SLOTS, n_drivers)
+    num_features_table[:, 1] = np.tile(GRID_SLOTS, n_drivers)
+    num_features_table[:, 2] = np.repeat(driver_roll, n_slots)
+    num_features_table[:, 3] = np.repeat(constructor_roll, n_slots)
 
-(MODEL, SCALER, DRIVER_ENC, CONSTRUCTOR_ENC, NOISE_FACTOR) = load_simulation_tools()
-ALL_DATA_FEATURES = load_historical_data_for_features()
-SCALER_FEATURE_NAMES = [
-    'grid', 'quali_position',
-    'driver_points_roll_5', 'constructor_points_roll_5'
-]
+    cat_driver_table = np.repeat(driver_ids_encoded, n_slots)
+    cat_constructor_table = np.repeat(constructor_ids_encoded, n_slots)
 
-def run_full_simulation(current_standings_json, remaining_races_json):
+    print(f"Tabulating {n_drivers * n_slots} samples ({n_drivers} drivers * {n_slots} grid slots)...")
+    predicted_points_table = predict_points(num_features_table, cat_driver_table, cat_constructor_table)
+    print("Prediction complete.")
 
-    if MODEL is None or ALL_DATA_FEATURES is None:
-        return {"error": "Model or Data not loaded."}
+    return predicted_points_table.reshape((n_drivers, n_slots))
 
-    print(f"--- Starting Vectorized Monte Carlo ({N_SIMULATIONS} runs) ---")
+def predict_points_tabulated(sim_q, points_table):
+    slot_index = sim_q.astype(np.intp) - GRID_SLOTS[0]
+    driver_index = np.arange(points_table.shape[0])
+    return points_table[driver_index, slot_index]
 
-    current_standings_map = {s['driver']['driverId']: s['points'] for s in current_standings_json}
-    constructors_map = {s['driver']['driverId']: s['constructor']['constructorId'] for s in current_standings_json}
-    driver_ids_ordered = list(current_standings_map.keys())
+def warm_up():
+    if MODEL is None or FEATURE_SNAPSHOT is None:
+        return None
 
+    started_at = time.monotonic()
+    for driver_id in FEATURE_SNAPSHOT.driver_ids:
+        try:
+            features = prepare_simulation_features(FEATURE_SNAPSHOT, [driver_id], {})
+        except ValueError:
+            continue
+        points_table = build_points_table(features['driver_points_roll_5'].values,
+                                          features['constructor_points_roll_5'].values,
+                                          features['driver_encoded'].values,
+                                          features['constructor_encoded'].values)
+        if INFERENCE_MODE == 'fused' and NUMBA_AVAILABLE:
+            # Compiles the kernel (or loads it from numba's cache) before the first request.
+            fused_season_points(np.random.default_rng(), 1, 1, features['q_proxy'].values,
+                                features['q_stdev'].values, points_table, NOISE_FACTOR,
+                                features['dnf_rate'].values)
+        return time.monotonic() - started_at
+    return None
+
+def parse_remaining_events(remaining_races_json):
     remaining_events = []
     for race in remaining_races_json:
         try:
@@ -100,73 +317,560 @@ def run_full_simulation(current_standings_json, remaining_races_json):
         remaining_events.append((round_num, 'R'))
         if race.get('Sprint') is not None:
             remaining_events.append((round_num, 'S'))
+    return remaining_events
+
+def canonicalize_request(current_standings_json, remaining_races_json):
+    standings = sorted(
+        (s['driver']['driverId'], s['constructor']['constructorId'], float(s['points']))
+        for s in current_standings_json
+    )
+    return {'currentStandings': standings, 'remainingRaces': sorted(parse_remaining_events(remaining_races_json))}
+
+def simulation_chunk_size(n_events, n_drivers, inference_mode, memory_mb=None):
+    memory_mb = SIM_MEMORY_MB if memory_mb is None else memory_mb
+    budget_bytes = memory_mb * 1024 * 1024
+    if inference_mode == 'fused':
+        # The fused kernel writes no per-event samples, only the (sims, drivers) totals.
+        bytes_per_simulation, table_bytes = fused_footprint(n_drivers)
+        budget_bytes -= table_bytes
+    else:
+        bytes_per_simulation = n_events * n_drivers * SAMPLE_BYTES[inference_mode]
+    chunk_size = budget_bytes // bytes_per_simulation
+    return int(max(1, min(N_SIMULATIONS, chunk_size)))
+
+def sample_grid_slots(quali_rng, n_sims, n_events, base_features_df):
+    q_proxy = base_features_df['q_proxy'].values
+    q_stdev = base_features_df['q_stdev'].values
+    sim_q = quali_rng.normal(q_proxy, q_stdev, size=(n_sims, n_events, len(base_features_df)))
+    return np.round(np.clip(sim_q, GRID_SLOTS[0], GRID_SLOTS[-1]))
+
+def simulate_season_points(rngs, n_sims, n_events, base_features_df, points_table, noise_factor,
+                           inference_mode):
+    n_drivers = len(base_features_df)
+    quali_rng, noise_rng, dnf_rng = rngs
+
+    if inference_mode == 'fused':
+        return fused_season_points(quali_rng, n_sims, n_events,
+                                   base_features_df['q_proxy'].values,
+                                   base_features_df['q_stdev'].values,
+                                   points_table, noise_factor,
+                                   base_features_df['dnf_rate'].values)
+
+    sim_q = sample_grid_slots(quali_rng, n_sims, n_events, base_features_df)
+
+    if inference_mode == 'tabulated':
+        predicted_points = predict_points_tabulated(sim_q, points_table)
+    else:
+        predicted_points = predict_points_full(sim_q,
+                                               base_features_df['driver_points_roll_5'].values,
+                                               base_features_df['constructor_points_roll_5'].values,
+                                               base_features_df['driver_encoded'].values,
+                                               base_features_df['constructor_encoded'].values)
+    del sim_q
+
+    noise = noise_rng.normal(0, noise_factor, size=predicted_points.shape)
+    simulated_points = np.maximum(0, predicted_points + noise)
+    del predicted_points, noise
 
-    if not remaining_events:
-        return {"error": "No remaining events."}
-
-    n_events = len(remaining_events)
-    n_drivers = len(driver_ids_ordered)
+    dnf_rate = base_features_df['dnf_rate'].values
+    dnf_rolls = dnf_rng.random((n_sims, n_events, n_drivers))
+    simulated_points[dnf_rolls < dnf_rate] = 0.0
+    del dnf_rolls
+
+    return simulated_points.sum(axis=1)
+
+def points_histogram_bins(n_events):
+    return int(np.ceil(n_events * EVENT_POINTS_CEILING / POINTS_BIN_WIDTH)) + 1
+
+def points_histogram(season_points, n_events):
+    n_sims, n_drivers = season_points.shape
+    n_bins = points_histogram_bins(n_events)
+    # Anything above the ceiling lands in the last bin.
+    bin_index = np.minimum((season_points / POINTS_BIN_WIDTH).astype(np.intp), n_bins - 1)
+    flat_index = (bin_index + np.arange(n_drivers) * n_bins).ravel()
+    return np.bincount(flat_index, minlength=n_drivers * n_bins).reshape(n_drivers, n_bins)
+
+def histogram_percentiles(counts, percentiles):
+    # Interpolated linearly inside the bin that holds each percentile, so exact to within POINTS_BIN_WIDTH.
+    cumulative = np.cumsum(counts, axis=1)
+    quantiles = np.empty((len(percentiles), counts.shape[0]))
+    for driver_idx, driver_cumulative in enumerate(cumulative):
+        targets = np.asarray(percentiles) / 100.0 * driver_cumulative[-1]
+        bin_index = np.minimum(np.searchsorted(driver_cumulative, targets, side='left'), counts.shape[1] - 1)
+        below = np.where(bin_index > 0, driver_cumulative[bin_index - 1], 0)
+        in_bin = np.maximum(counts[driver_idx, bin_index], 1)
+        quantiles[:, driver_idx] = (bin_index + np.clip((targets - below) / in_bin, 0, 1)) * POINTS_BIN_WIDTH
+    return quantiles
+
+def reduce_standings(final_standings, outputs, constructor_index, n_constructors, points_offset, n_events):
+    n_sims, n_drivers = final_standings.shape
+    reduction = {}
+
+    if 'winner' in outputs:
+        winner_indices = np.argmax(final_standings, axis=1)
+        reduction['winner'] = np.bincount(winner_indices, minlength=n_drivers)
+
+    if 'positions' in outputs:
+        finishing_order = np.argsort(-final_standings, axis=1, kind='stable')
+        final_positions = np.empty_like(finishing_order)
+        np.put_along_axis(final_positions, finishing_order, np.arange(n_drivers), axis=1)
+        flat_index = (np.arange(n_drivers) * n_drivers + final_positions).ravel()
+        reduction['positions'] = np.bincount(flat_index, minlength=n_drivers * n_drivers).reshape(n_drivers, n_drivers)
+
+    if 'pointsQuantiles' in outputs:
+        reduction['pointsQuantiles'] = points_histogram(final_standings - points_offset, n_events)
+
+    if 'constructors' in outputs:
+        constructor_totals = np.zeros((n_sims, n_constructors))
+        for driver_idx, team_idx in enumerate(constructor_index):
+            constructor_totals[:, team_idx] += final_standings[:, driver_idx]
+        champion_indices = np.argmax(constructor_totals, axis=1)
+        reduction['constructors'] = np.bincount(champion_indices, minlength=n_constructors)
+
+    return reduction
+
+def merge_reductions(reductions):
+    if isinstance(reductions[0], list):
+        return [merge_reductions(list(scenario_reductions)) for scenario_reductions in zip(*reductions)]
+
+    return {output: np.sum([reduction[output] for reduction in reductions], axis=0) for output in reductions[0]}
+
+def simulate_shard(n_sims, seed_sequence, n_events, base_features_df, current_points, points_table,
+                   noise_factor, inference_mode, memory_mb, outputs, constructor_index, n_constructors,
+                   progress=None):
+    # One stream per random quantity keeps the draws independent of the chunk size.
+    rngs = [np.random.default_rng(stream_seed) for stream_seed in seed_sequence.spawn(3)]
+    n_drivers = len(base_features_df)
+    chunk_size = simulation_chunk_size(n_events, n_drivers, inference_mode, memory_mb)
+
+    reductions = []
+    for chunk_start in range(0, n_sims, chunk_size):
+        n_chunk_sims = min(chunk_size, n_sims - chunk_start)
+        total_sim_points = simulate_season_points(rngs, n_chunk_sims, n_events, base_features_df,
+                                                  points_table, noise_factor, inference_mode)
+        final_standings = total_sim_points + current_points
+
+        reductions.append(reduce_standings(final_standings, outputs, constructor_index, n_constructors,
+                                           current_points, n_events))
+        if len(reductions) > 1:
+            reductions = [merge_reductions(reductions)]
+        if progress is not None:
+            progress(n_chunk_sims)
+
+    return reductions[0]
+
+def simulate_scenario_shard(n_sims, seed_sequence, n_events, base_features_df, points_tables, event_masks,
+                            final_offsets, constructor_indexes, n_constructors, noise_factor, memory_mb, outputs,
+                            progress=None):
+    # Every scenario sees the same grid slots, noise and DNFs (common random numbers).
+    quali_rng, noise_rng, dnf_rng = [np.random.default_rng(stream_seed) for stream_seed in seed_sequence.spawn(3)]
+    n_drivers = len(base_features_df)
+    chunk_size = simulation_chunk_size(n_events, n_drivers, 'tabulated', memory_mb)
+    dnf_rate = base_features_df['dnf_rate'].values
 
-    base_features_df = prepare_simulation_features(ALL_DATA_FEATURES,
-                                                   driver_ids_ordered,
-                                                   constructors_map)
-    base_features_df = base_features_df.reindex(driver_ids_ordered)
+    reductions = []
+    for chunk_start in range(0, n_sims, chunk_size):
+        n_chunk_sims = min(chunk_size, n_sims - chunk_start)
+        sim_q = sample_grid_slots(quali_rng, n_chunk_sims, n_events, base_features_df)
+        noise = noise_rng.normal(0, noise_factor, size=sim_q.shape)
+        is_dnf = dnf_rng.random(sim_q.shape) < dnf_rate
+
+        chunk_reductions = []
+        for scenario_idx, points_table in enumerate(points_tables):
+            simulated_points = predict_points_tabulated(sim_q, points_table) + noise
+            np.maximum(simulated_points, 0, out=simulated_points)
+            simulated_points[is_dnf] = 0.0
+            event_mask = event_masks[scenario_idx][None, :, None]
+            final_standings = simulated_points.sum(axis=1, where=event_mask) + final_offsets[scenario_idx]
+
+            chunk_reductions.append(reduce_standings(final_standings, outputs, constructor_indexes[scenario_idx],
+                                                     n_constructors[scenario_idx], final_offsets[scenario_idx],
+                                                     n_events))
+
+        reductions.append(chunk_reductions)
+        if len(reductions) > 1:
+            reductions = [merge_reductions(reductions)]
+        if progress is not None:
+            progress(n_chunk_sims)
+
+    return reductions[0]
+
+def is_round_number(value):
+    if isinstance(value, bool):
+        return False
+    return isinstance(value, int) or (isinstance(value, str) and value.strip().isdigit())
+
+def is_points_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and np.isfinite(value)
+
+def scenario_errors(scenario, known_drivers) -> list:
+    if not isinstance(scenario, dict):
+        return ["A scenario must be an object."]
+
+    errors = []
+    if 'name' in scenario and not isinstance(scenario['name'], str):
+        errors.append("'name' must be a string.")
+
+    removed_events = scenario.get('removeEvents', [])
+    if not isinstance(removed_events, list) or not all(isinstance(removed, dict) for removed in removed_events):
+        errors.append("'removeEvents' must be a list of objects.")
+    else:
+        for removed in removed_events:
+            if not is_round_number(removed.get('round')):
+                errors.append(f"'removeEvents' entry {removed} needs an integer 'round'.")
+            if removed.get('type', 'R') not in ('R', 'S'):
+                errors.append(f"'removeEvents' entry {removed} has a 'type' other than 'R' or 'S'.")
+
+    added_races = scenario.get('addRaces', [])
+    if not isinstance(added_races, list) or not all(isinstance(race, dict) and is_round_number(race.get('round'))
+                                                    for race in added_races):
+        errors.append("'addRaces' must be a list of races with an integer 'round'.")
+
+    constructor_changes = scenario.get('constructorChanges', {})
+    if not isinstance(constructor_changes, dict) or not all(isinstance(constructor_id, str)
+                                                            for constructor_id in constructor_changes.values()):
+        errors.append("'constructorChanges' must map driver ids to constructor ids.")
+        constructor_changes = {}
+
+    points_adjustments = scenario.get('pointsAdjustments', {})
+    if not isinstance(points_adjustments, dict) or not all(is_points_number(delta)
+                                                           for delta in points_adjustments.values()):
+        errors.append("'pointsAdjustments' must map driver ids to numbers.")
+        points_adjustments = {}
+
+    unknown_drivers = [driver_id for driver_id in list(constructor_changes) + list(points_adjustments)
+                       if driver_id not in known_drivers]
+    if unknown_drivers:
+        errors.append(f"References unknown drivers: {unknown_drivers}.")
+    return errors
+
+def validate_scenarios(scenarios, known_drivers) -> dict:
+    # Scenario name -> what is wrong with it, for every scenario that cannot be simulated.
+    invalid = {}
+    for idx, scenario in enumerate(scenarios):
+        errors = scenario_errors(scenario, known_drivers)
+        if errors:
+            name = scenario.get('name') if isinstance(scenario, dict) else None
+            invalid[name if isinstance(name, str) else f"scenario_{idx}"] = errors
+    return invalid
+
+def get_simulation_pool(workers):
+    if workers not in _SIM_POOLS:
+        _SIM_POOLS[workers] = ProcessPoolExecutor(max_workers=workers,
+                                                  mp_context=multiprocessing.get_context(SIM_START_METHOD))
+    return _SIM_POOLS[workers]
+
+def format_outputs(reduction, driver_ids_ordered, constructor_ids_ordered, n_sims, points_offset):
+    formatted = {}
+
+    if 'winner' in reduction:
+        formatted['winner'] = {driver_ids_ordered[idx]: (reduction['winner'][idx] / n_sims) * 100.0
+                               for idx in np.flatnonzero(reduction['winner'])}
+
+    if 'positions' in reduction:
+        position_probabilities = reduction['positions'] / n_sims * 100.0
+        formatted['positions'] = {driver_id: position_probabilities[idx].tolist()
+                                  for idx, driver_id in enumerate(driver_ids_ordered)}
+
+    if 'pointsQuantiles' in reduction:
+        quantiles = histogram_percentiles(reduction['pointsQuantiles'], POINTS_PERCENTILES) + points_offset
+        formatted['pointsQuantiles'] = {
+            driver_id: {f"p{pct}": float(quantiles[q_idx, idx]) for q_idx, pct in enumerate(POINTS_PERCENTILES)}
+            for idx, driver_id in enumerate(driver_ids_ordered)
+        }
+
+    if 'constructors' in reduction:
+        formatted['constructors'] = {constructor_ids_ordered[idx]: (reduction['constructors'][idx] / n_sims) * 100.0
+                                     for idx in np.flatnonzero(reduction['constructors'])}
+
+    return formatted
+
+def win_probability_precision(win_counts, n_sims, z=CONFIDENCE_Z):
+    # Largest Wilson-interval half-width over all drivers, in percentage points.
+    p = win_counts / n_sims
+    denominator = 1 + z ** 2 / n_sims
+    half_width = z / denominator * np.sqrt(p * (1 - p) / n_sims + z ** 2 / (4 * n_sims ** 2))
+    return float(half_width.max() * 100.0)
+
+def run_simulation_batch(n_sims, seed_sequence, workers, shard_plan, shard_function=None, progress=None):
+    shard_function = shard_function or simulate_shard
+    shard_sizes = np.full(workers, n_sims // workers)
+    shard_sizes[:n_sims % workers] += 1
+    shard_seeds = seed_sequence.spawn(workers)
+
+    shard_args = [(int(shard_sims), shard_seed, *shard_plan)
+                  for shard_sims, shard_seed in zip(shard_sizes, shard_seeds) if shard_sims > 0]
+
+    if len(shard_args) == 1:
+        shard_reductions = [shard_function(*shard_args[0], progress=progress)]
+    else:
+        # Callbacks cannot cross the process boundary, so pooled shards report when they finish.
+        pool = get_simulation_pool(workers)
+        futures = {pool.submit(shard_function, *args): args[0] for args in shard_args}
+        if progress is not None:
+            for future in as_completed(futures):
+                progress(futures[future])
+        shard_reductions = [future.result() for future in futures]
+
+    return merge_reductions(shard_reductions)
+
+class ProgressReporter:
+    # Counts simulations as chunks finish and reports them against a total that an adaptive run moves per batch.
+
+    def __init__(self, progress, total_sims):
+        self.progress = progress
+        self.total_sims = total_sims
+        self.completed = 0
+        self.precision = None
+        self.fraction = 0.0
+
+    def __call__(self, n_sims):
+        self.completed += n_sims
+        # A projected total can grow after a batch; the reported fraction never goes back.
+        self.fraction = max(self.fraction, min(1.0, self.completed / self.total_sims))
+        self.progress(self.fraction, simulations=self.completed, precision=self.precision)
+
+def progress_reporter(progress, total_sims):
+    return None if progress is None else ProgressReporter(progress, total_sims)
+
+def projected_simulations(n_sims, next_batch, precision, tolerance, elapsed, time_budget, max_simulations):
+    # Where the stopping rules point after n_sims: the precision shrinks as 1/sqrt(n) and the pace is steady.
+    projections = [max_simulations]
+    if tolerance is not None and precision is not None:
+        projections.append(math.ceil(n_sims * (precision / tolerance) ** 2))
+    if time_budget is not None and elapsed > 0:
+        projections.append(int(n_sims * time_budget / elapsed))
+    return min(max_simulations, max(n_sims + next_batch, min(projections)))
+
+def run_full_simulation(current_standings_json, remaining_races_json, inference_mode=None,
+                        seed=None, workers=None, outputs=None,
+                        tolerance=None, max_simulations=None, time_budget=None, progress=None):
+
+    if MODEL is None or FEATURE_SNAPSHOT is None:
+        return {"error": "Model or Data not loaded."}
 
-    total_samples = N_SIMULATIONS * n_events * n_drivers
+    inference_mode = inference_mode or INFERENCE_MODE
+    if inference_mode not in INFERENCE_MODES:
+        return {"error": f"Unknown inference mode '{inference_mode}'."}
+    if inference_mode == 'fused' and not NUMBA_AVAILABLE:
+        return {"error": "The fused inference mode requires numba."}
+
+    requested_outputs = list(outputs) if outputs else ['winner']
+    unknown_outputs = [output for output in requested_outputs if output not in SIMULATION_OUTPUTS]
+    if unknown_outputs:
+        return {"error": f"Unknown simulation outputs: {unknown_outputs}."}
+
+    adaptive = tolerance is not None or max_simulations is not None or time_budget is not None
+    if max_simulations is not None:
+        # A client can ask for fewer simulations than the configured ceiling, never more.
+        max_simulations = min(int(max_simulations), ADAPTIVE_MAX_SIMULATIONS)
+        if max_simulations < 1:
+            return {"error": "maxSimulations must be at least 1."}
+    else:
+        max_simulations = ADAPTIVE_MAX_SIMULATIONS if adaptive else N_SIMULATIONS
+    batch_simulations = min(ADAPTIVE_BATCH_SIMULATIONS, max_simulations) if adaptive else max_simulations
+
+    seed = SIM_SEED if seed is None else seed
+    workers = max(1, min(workers or SIM_WORKERS, batch_simulations))
+
+    mode = "adaptive" if adaptive else "fixed"
+    print(f"--- Starting Vectorized Monte Carlo ({max_simulations} runs max, {mode}, {inference_mode} inference, "
+          f"{workers} worker(s)) ---")
 
-    q_proxy = base_features_df['q_proxy'].values
-    q_stdev = base_features_df['q_stdev'].values
-    sim_q = np.random.normal(q_proxy, q_stdev, size=(N_SIMULATIONS, n_events, n_drivers))
-    sim_q = np.round(np.clip(sim_q, 1, 20))
+    current_standings_map = {s['driver']['driverId']: s['points'] for s in current_standings_json}
+    constructors_map = {s['driver']['driverId']: s['constructor']['constructorId'] for s in current_standings_json}
+    driver_ids_ordered = list(current_standings_map.keys())
 
-    driver_roll = base_features_df['driver_points_roll_5'].values
-    constructor_roll = base_features_df['constructor_points_roll_5'].values
+    remaining_events = parse_remaining_events(remaining_races_json)
 
-    num_features_batch = np.zeros((total_samples, 4))
-    num_features_batch[:, 0] = sim_q.flatten()
-    num_features_batch[:, 1] = sim_q.flatten()
-    num_features_batch[:, 2] = np.tile(driver_roll, N_SIMULATIONS * n_events)
-    num_features_batch[:, 3] = np.tile(constructor_roll, N_SIMULATIONS * n_events)
+    if not remaining_events:
+        return {"error": "No remaining events."}
 
-    num_df = pd.DataFrame(num_features_batch, columns=SCALER_FEATURE_NAMES)
-    scaled_num_batch = SCALER.transform(num_df)
+    n_events = len(remaining_events)
+    n_drivers = len(driver_ids_ordered)
 
-    driver_ids_encoded = DRIVER_ENC.transform(base_features_df.index.values)
-    constructor_ids_encoded = CONSTRUCTOR_ENC.transform(base_features_df['constructorid'].values)
+    try:
+        base_features_df = prepare_simulation_features(FEATURE_SNAPSHOT,
+                                                       driver_ids_ordered,
+                                                       constructors_map)
+    except ValueError as e:
+        return {"error": str(e)}
+
+    points_table = None
+    if inference_mode in ('tabulated', 'fused'):
+        points_table = build_points_table(base_features_df['driver_points_roll_5'].values,
+                                          base_features_df['constructor_points_roll_5'].values,
+                                          base_features_df['driver_encoded'].values,
+                                          base_features_df['constructor_encoded'].values)
 
-    cat_driver_batch = np.tile(driver_ids_encoded, N_SIMULATIONS * n_events)
-    cat_constructor_batch = np.tile(constructor_ids_encoded, N_SIMULATIONS * n_events)
+    current_points = np.array([current_standings_map[driver_id] for driver_id in driver_ids_ordered])
 
-    print(f"Predicting {total_samples} samples (20 drivers * {n_events} events * {N_SIMULATIONS} sims)...")
-    model_input = [scaled_num_batch, cat_driver_batch, cat_constructor_batch]
+    constructor_ids_ordered = list(dict.fromkeys(constructors_map[driver_id] for driver_id in driver_ids_ordered))
+    constructor_index = np.array([constructor_ids_ordered.index(constructors_map[driver_id])
+                                  for driver_id in driver_ids_ordered])
+
+    shard_memory_mb = max(1, SIM_MEMORY_MB // workers)
+    chunk_size = simulation_chunk_size(n_events, n_drivers, inference_mode, shard_memory_mb)
+    print(f"Streaming {batch_simulations} sims per batch in chunks of up to {chunk_size} per worker "
+          f"({SIM_MEMORY_MB} MB budget)...")
+
+    # 'winner' is always reduced: adaptive mode needs it for the stopping rule.
+    reduced_outputs = list(dict.fromkeys(['winner'] + requested_outputs))
+    shard_plan = (n_events, base_features_df, current_points, points_table, NOISE_FACTOR, inference_mode,
+                  shard_memory_mb, reduced_outputs, constructor_index, len(constructor_ids_ordered))
+
+    report_progress = progress_reporter(progress, max_simulations)
+    root_seed = np.random.SeedSequence(seed)
+    started_at = time.monotonic()
+    reduction = None
+    n_sims = 0
+    precision = None
+    stop_reason = 'fixed'
+
+    while n_sims < max_simulations:
+        batch_sims = min(batch_simulations, max_simulations - n_sims)
+        # The fixed mode keeps drawing from the root seed so seeded results do not change.
+        batch_seed = root_seed.spawn(1)[0] if adaptive else root_seed
+        batch_reduction = run_simulation_batch(batch_sims, batch_seed, workers, shard_plan,
+                                               progress=report_progress)
+        reduction = batch_reduction if reduction is None else merge_reductions([reduction, batch_reduction])
+        n_sims += batch_sims
+
+        if not adaptive:
+            break
+
+        precision = win_probability_precision(reduction['winner'], n_sims)
+        print(f"  > {n_sims} sims, win probability precision +/-{precision:.3f} pp")
+        if report_progress is not None:
+            report_progress.precision = precision
+            report_progress.total_sims = projected_simulations(
+                n_sims, min(batch_simulations, max_simulations - n_sims), precision, tolerance,
+                time.monotonic() - started_at, time_budget, max_simulations)
+        if tolerance is not None and precision <= tolerance:
+            stop_reason = 'tolerance'
+            break
+        if time_budget is not None and time.monotonic() - started_at >= time_budget:
+            stop_reason = 'timeBudget'
+            break
+    else:
+        stop_reason = 'maxSimulations'
+
+    if precision is None:
+        precision = win_probability_precision(reduction['winner'], n_sims)
+
+    print(f"--- Simulation Complete ({n_sims} sims, {time.monotonic() - started_at:.2f}s) ---")
+
+    results = format_outputs(reduction, driver_ids_ordered, constructor_ids_ordered, n_sims, current_points)
+    if outputs is None and not adaptive:
+        return results['winner']
+
+    results = {output: results[output] for output in requested_outputs}
+    results['simulation'] = {
+        'simulations': n_sims,
+        'precision': precision,
+        'confidence': CONFIDENCE_LEVEL,
+        'stopReason': stop_reason,
+    }
+    return results
+
+def run_scenario_batch(current_standings_json, remaining_races_json, scenarios, outputs=None,
+                       seed=None, workers=None, progress=None):
+
+    if MODEL is None or FEATURE_SNAPSHOT is None:
+        return {"error": "Model or Data not loaded."}
 
-    predicted_points_batch = MODEL.predict(model_input, batch_size=4096, verbose=0)
-    print("Prediction complete.")
+    if not isinstance(scenarios, list) or not scenarios:
+        return {"error": "'scenarios' must be a non-empty list."}
 
-    noise = np.random.normal(0, NOISE_FACTOR, size=predicted_points_batch.shape)
-    simulated_points = np.maximum(0, predicted_points_batch + noise)
+    requested_outputs = list(outputs) if outputs else ['winner']
+    unknown_outputs = [output for output in requested_outputs if output not in SIMULATION_OUTPUTS]
+    if unknown_outputs:
+        return {"error": f"Unknown simulation outputs: {unknown_outputs}."}
 
-    dnf_rate = base_features_df['dnf_rate'].values
-    dnf_rolls = np.random.rand(N_SIMULATIONS, n_events, n_drivers)
-    dnf_chances = np.tile(dnf_rate, (N_SIMULATIONS, n_events, 1))
-    is_dnf = (dnf_rolls < dnf_chances).flatten()
-    simulated_points[is_dnf] = 0.0
+    seed = SIM_SEED if seed is None else seed
+    workers = max(1, min(workers or SIM_WORKERS, N_SIMULATIONS))
+    n_scenarios = len(scenarios)
 
-    points_tensor = simulated_points.reshape((N_SIMULATIONS, n_events, n_drivers))
-    total_sim_points = points_tensor.sum(axis=1)
+    print(f"--- Starting Scenario Monte Carlo ({n_scenarios} scenarios, {N_SIMULATIONS} runs, "
+          f"{workers} worker(s)) ---")
 
+    current_standings_map = {s['driver']['driverId']: s['points'] for s in current_standings_json}
+    constructors_map = {s['driver']['driverId']: s['constructor']['constructorId'] for s in current_standings_json}
+    driver_ids_ordered = list(current_standings_map.keys())
+    n_drivers = len(driver_ids_ordered)
     current_points = np.array([current_standings_map[driver_id] for driver_id in driver_ids_ordered])
-    final_standings = total_sim_points + current_points
 
-    winner_indices = np.argmax(final_standings, axis=1)
-    unique_indices, counts = np.unique(winner_indices, return_counts=True)
-
-    print("--- Simulation Complete ---")
-
-    results = {}
-    for idx, wins in zip(unique_indices, counts):
-        driver_db_id = driver_ids_ordered[idx]
-        probability = (wins / N_SIMULATIONS) * 100.0
-        results[driver_db_id] = probability
+    base_events = parse_remaining_events(remaining_races_json)
+
+    invalid_scenarios = validate_scenarios(scenarios, current_standings_map)
+    if invalid_scenarios:
+        return {"error": "Invalid scenarios.", "scenarioErrors": invalid_scenarios}
+
+    scenario_names = [scenario.get('name', f"scenario_{idx}") for idx, scenario in enumerate(scenarios)]
+    scenario_events = []
+    scenario_constructors = []
+    final_offsets = []
+    for scenario in scenarios:
+        removed_events = scenario.get('removeEvents', [])
+        events = [event for event in base_events
+                  if not any(int(removed['round']) == event[0] and removed.get('type', event[1]) == event[1]
+                             for removed in removed_events)]
+        events += parse_remaining_events(scenario.get('addRaces', []))
+        scenario_events.append(set(events))
+
+        constructor_changes = scenario.get('constructorChanges', {})
+        points_adjustments = scenario.get('pointsAdjustments', {})
+        scenario_constructors.append({**constructors_map, **constructor_changes})
+        final_offsets.append(current_points + np.array([points_adjustments.get(driver_id, 0.0)
+                                                        for driver_id in driver_ids_ordered]))
+
+    union_events = sorted(set().union(*scenario_events))
+    if not union_events:
+        return {"error": "No remaining events."}
+    n_events = len(union_events)
+    event_masks = np.array([[event in events for event in union_events] for events in scenario_events])
 
-    return results
\ No newline at end of file
+    try:
+        scenario_features = [prepare_simulation_features(FEATURE_SNAPSHOT, driver_ids_ordered, scenario_map)
+                             for scenario_map in scenario_constructors]
+    except ValueError as e:
+        return {"error": str(e)}
+
+    # One model call tabulates every scenario: constructor changes only move their drivers' rows.
+    stacked_features = pd.concat(scenario_features)
+    points_tables = build_points_table(stacked_features['driver_points_roll_5'].values,
+                                       stacked_features['constructor_points_roll_5'].values,
+                                       stacked_features['driver_encoded'].values,
+                                       stacked_features['constructor_encoded'].values)
+    points_tables = points_tables.reshape((n_scenarios, n_drivers, len(GRID_SLOTS)))
+
+    scenario_constructor_ids = []
+    constructor_indexes = []
+    for scenario_map in scenario_constructors:
+        constructor_ids_ordered = list(dict.fromkeys(scenario_map[driver_id] for driver_id in driver_ids_ordered))
+        scenario_constructor_ids.append(constructor_ids_ordered)
+        constructor_indexes.append(np.array([constructor_ids_ordered.index(scenario_map[driver_id])
+                                             for driver_id in driver_ids_ordered]))
+
+    shard_memory_mb = max(1, SIM_MEMORY_MB // workers)
+    shard_plan = (n_events, scenario_features[0], points_tables, event_masks, final_offsets, constructor_indexes,
+                  [len(constructor_ids) for constructor_ids in scenario_constructor_ids], NOISE_FACTOR,
+                  shard_memory_mb, requested_outputs)
+
+    scenario_reductions = run_simulation_batch(N_SIMULATIONS, np.random.SeedSequence(seed), workers, shard_plan,
+                                               shard_function=simulate_scenario_shard,
+                                               progress=progress_reporter(progress, N_SIMULATIONS))
+
+    print("--- Scenario Simulation Complete ---")
+
+    results = []
+    for scenario_idx, scenario_name in enumerate(scenario_names):
+        formatted = format_outputs(scenario_reductions[scenario_idx], driver_ids_ordered,
+                                   scenario_constructor_ids[scenario_idx], N_SIMULATIONS,
+                                   final_offsets[scenario_idx])
+        results.append({'name': scenario_name, **formatted})
+
+    return {
+        'scenarios': results,
+        'simulation': {'simulations': N_SIMULATIONS, 'events': n_events},
+    }
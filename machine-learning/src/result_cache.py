@@ -0,0 +1,167 @@
+import hashlib
+import json
+import multiprocessing
+import os
+import threading
+import time
+from collections import OrderedDict
+
+CACHE_SIZE = int(os.environ.get('REDLINE_CACHE_SIZE', 128))
+CACHE_TTL_SECONDS = float(os.environ.get('REDLINE_CACHE_TTL', 6 * 60 * 60))
+CACHE_DIR = os.environ.get('REDLINE_CACHE_DIR')
+
+COUNTERS = ('hits', 'disk_hits', 'misses', 'evictions', 'expired')
+
+
+def make_cache_key(payload, **options) -> str:
+    canonical = json.dumps({'payload': payload, 'options': options}, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+class ResultCache:
+
+    def __init__(self, max_entries=CACHE_SIZE, ttl_seconds=CACHE_TTL_SECONDS, disk_dir=CACHE_DIR):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.disk_dir = disk_dir
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        # Shared memory: a pre-fork server creates the cache before forking, so every worker counts into the same
+        # totals and sees every invalidation. The generation is bumped by each full invalidation; a worker that finds
+        # it moved drops its in-memory tier and falls back to the disk tier.
+        self._shared_lock = multiprocessing.Lock()
+        self._counters = multiprocessing.RawArray('q', len(COUNTERS))
+        self._generation = multiprocessing.RawValue('q', 0)
+        self._seen_generation = 0
+
+        if self.disk_dir:
+            os.makedirs(self.disk_dir, exist_ok=True)
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            self._sync_generation()
+            entry = self._entries.get(key)
+            if entry is not None:
+                created, result = entry
+                if now - created > self.ttl_seconds:
+                    del self._entries[key]
+                    self._count('expired')
+                elif self.disk_dir and not os.path.exists(self._disk_path(key)):
+                    # The disk tier is the shared record: a missing file means another worker invalidated the key.
+                    del self._entries[key]
+                else:
+                    self._entries.move_to_end(key)
+                    self._count('hits')
+                    return result
+
+        entry = self._read_disk(key, now)
+        with self._lock:
+            if entry is None:
+                self._count('misses')
+                return None
+            self._count('disk_hits')
+            self._store(key, entry)
+            return entry[1]
+
+    def put(self, key, result):
+        entry = (time.time(), result)
+        # Disk first: a memory hit without its disk entry counts as invalidated.
+        self._write_disk(key, entry)
+        with self._lock:
+            self._sync_generation()
+            self._store(key, entry)
+
+    def invalidate(self, key=None) -> int:
+        with self._lock:
+            if key is None:
+                # Only a full flush moves the generation; one key is dropped through its disk entry alone.
+                with self._shared_lock:
+                    self._generation.value += 1
+                self._seen_generation = self._generation.value
+                removed = set(self._entries)
+                self._entries.clear()
+            else:
+                removed = {key} if self._entries.pop(key, None) is not None else set()
+
+        if self.disk_dir:
+            keys = [key] if key is not None else [name[:-len('.json')] for name in os.listdir(self.disk_dir)
+                                                   if name.endswith('.json')]
+            for disk_key in keys:
+                try:
+                    os.remove(self._disk_path(disk_key))
+                    removed.add(disk_key)
+                except FileNotFoundError:
+                    pass
+        return len(removed)
+
+    def stats(self) -> dict:
+        with self._shared_lock:
+            counters = dict(zip(COUNTERS, self._counters))
+        lookups = counters['hits'] + counters['disk_hits'] + counters['misses']
+        hit_rate = (counters['hits'] + counters['disk_hits']) / lookups if lookups else 0.0
+        disk_entries = None
+        if self.disk_dir:
+            disk_entries = sum(1 for name in os.listdir(self.disk_dir) if name.endswith('.json'))
+
+        with self._lock:
+            self._sync_generation()
+            return {
+                **counters,
+                # The in-memory tier of the process that answered; the disk tier is shared.
+                'entries': len(self._entries),
+                'disk_entries': disk_entries,
+                'max_entries': self.max_entries,
+                'ttl_seconds': self.ttl_seconds,
+                'disk_dir': self.disk_dir,
+                'hit_rate': hit_rate,
+            }
+
+    def _count(self, name):
+        with self._shared_lock:
+            self._counters[COUNTERS.index(name)] += 1
+
+    def _sync_generation(self):
+        generation = self._generation.value
+        if generation != self._seen_generation:
+            self._entries.clear()
+            self._seen_generation = generation
+
+    def _store(self, key, entry):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._count('evictions')
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, f"{key}.json")
+
+    def _read_disk(self, key, now):
+        if not self.disk_dir:
+            return None
+        try:
+            with open(self._disk_path(key), 'r') as f:
+                stored = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+        if now - stored['created'] > self.ttl_seconds:
+            try:
+                os.remove(self._disk_path(key))
+            except FileNotFoundError:
+                pass
+            return None
+        return stored['created'], stored['result']
+
+    def _write_disk(self, key, entry):
+        if not self.disk_dir:
+            return
+        created, result = entry
+        tmp_path = f"{self._disk_path(key)}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, 'w') as f:
+                json.dump({'created': created, 'result': result}, f)
+            os.replace(tmp_path, self._disk_path(key))
+        except OSError as e:
+            print(f"Warning: could not write cache entry {key}: {e}")
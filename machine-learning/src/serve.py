@@ -0,0 +1,160 @@
+import argparse
+import collections
+import gc
+import os
+import shutil
+import tempfile
+import time
+
+from gunicorn.app.base import BaseApplication
+
+SERVE_WORKERS = int(os.environ.get('REDLINE_SERVE_WORKERS', os.cpu_count() or 1))
+# Request threads per worker (gunicorn's gthread worker); 1 runs the synchronous worker.
+SERVE_THREADS = int(os.environ.get('REDLINE_SERVE_THREADS', 4))
+WARM_UP_TIMEOUT_SECONDS = float(os.environ.get('REDLINE_WARM_UP_TIMEOUT', 120))
+
+# A replacement for a worker that died is delayed 0.5s, 1s, 2s, ... per exit in the window, up to the cap.
+RESPAWN_BACKOFF_SECONDS = float(os.environ.get('REDLINE_RESPAWN_BACKOFF', 0.5))
+RESPAWN_BACKOFF_MAX_SECONDS = float(os.environ.get('REDLINE_RESPAWN_BACKOFF_MAX', 30))
+RESPAWN_WINDOW_SECONDS = 60
+
+MEMORY_FIELDS = ('Rss', 'Pss', 'Private_Clean', 'Private_Dirty')
+
+_worker_exits = collections.deque()
+_state_dir = None
+
+
+def process_memory_mb(pid) -> dict:
+    fields = {}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                parts = line.split()
+                name = parts[0].rstrip(':')
+                if name in MEMORY_FIELDS:
+                    fields[name] = int(parts[1]) / 1024.0
+    except OSError:
+        return {}
+
+    return {
+        'rss_mb': fields.get('Rss', 0.0),
+        'pss_mb': fields.get('Pss', 0.0),
+        # Unique set size: what this process costs on top of the pages it shares with the master.
+        'uss_mb': fields.get('Private_Clean', 0.0) + fields.get('Private_Dirty', 0.0),
+    }
+
+
+def shared_state_dir():
+    # Workers share one listening socket, so any of them may answer a poll: job and cache state live on disk.
+    # The feature snapshot is rebuilt by one worker after an ingestion and loaded from here by the others.
+    if all(os.environ.get(name) for name in ('REDLINE_CACHE_DIR', 'REDLINE_JOB_DIR', 'REDLINE_FEATURE_DIR')):
+        return None
+    state_dir = tempfile.mkdtemp(prefix='redline-serve-')
+    os.environ.setdefault('REDLINE_CACHE_DIR', os.path.join(state_dir, "cache"))
+    os.environ.setdefault('REDLINE_JOB_DIR', os.path.join(state_dir, "jobs"))
+    os.environ.setdefault('REDLINE_FEATURE_DIR', os.path.join(state_dir, "features"))
+    return state_dir
+
+
+def when_ready(server):
+    usage = process_memory_mb(os.getpid())
+    if usage:
+        print(f"--- Master {os.getpid()} ready: {usage['rss_mb']:.1f} MB RSS ---")
+
+
+def pre_fork(server, worker):
+    now = time.monotonic()
+    while _worker_exits and now - _worker_exits[0] > RESPAWN_WINDOW_SECONDS:
+        _worker_exits.popleft()
+    if _worker_exits:
+        delay = min(RESPAWN_BACKOFF_MAX_SECONDS, RESPAWN_BACKOFF_SECONDS * 2 ** (len(_worker_exits) - 1))
+        print(f"{len(_worker_exits)} worker exit(s) in the last {RESPAWN_WINDOW_SECONDS}s; "
+              f"starting a replacement in {delay:.1f}s.")
+        time.sleep(delay)
+
+
+def post_fork(server, worker):
+    import src.model.simulate_championship as simulation_runner
+
+    warm_up_seconds = simulation_runner.warm_up()
+    if warm_up_seconds is None:
+        print(f"Worker {os.getpid()}: warm-up skipped (model or features not loaded).")
+    else:
+        print(f"Worker {os.getpid()}: warm-up prediction took {warm_up_seconds * 1000:.1f} ms.")
+
+
+def post_worker_init(worker):
+    usage = process_memory_mb(os.getpid())
+    if not usage:
+        print(f"Worker {os.getpid()} ready (/proc/<pid>/smaps_rollup not readable).")
+        return
+    print(f"Worker {os.getpid()} ready: RSS {usage['rss_mb']:.1f} MB, PSS {usage['pss_mb']:.1f} MB, "
+          f"unique {usage['uss_mb']:.1f} MB (extra memory for this worker)")
+
+
+def child_exit(server, worker):
+    _worker_exits.append(time.monotonic())
+
+
+def on_exit(server):
+    if _state_dir:
+        shutil.rmtree(_state_dir, ignore_errors=True)
+
+
+class RedlineServer(BaseApplication):
+
+    def __init__(self, options):
+        self.options = options
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            self.cfg.set(key, value)
+
+    def load(self):
+        global _state_dir
+        # Before the app is imported: the cache and the job queue read these directories at import.
+        _state_dir = shared_state_dir()
+
+        print(f"--- Loading model and features once in master {os.getpid()} ---")
+        import src.model.simulate_championship as simulation_runner
+        from src.app import app
+
+        if simulation_runner.INFERENCE_BACKEND == 'keras':
+            print("Warning: TensorFlow is not fork-safe; REDLINE_INFERENCE_BACKEND=numpy is recommended for "
+                  "multi-worker serving.")
+
+        # Move everything loaded so far out of the collector's reach so workers do not dirty shared pages.
+        gc.collect()
+        gc.freeze()
+        return app
+
+
+def serve(host, port, n_workers, threads=SERVE_THREADS):
+    RedlineServer({
+        'bind': f"{host}:{port}",
+        'workers': n_workers,
+        'worker_class': 'gthread' if threads > 1 else 'sync',
+        'threads': threads,
+        # The app (model, scaler, encoders, snapshot) is imported once in the master and shared copy-on-write.
+        'preload_app': True,
+        # Covers the warm-up in post_fork, which runs before a worker's first heartbeat.
+        'timeout': int(WARM_UP_TIMEOUT_SECONDS),
+        'when_ready': when_ready,
+        'pre_fork': pre_fork,
+        'post_fork': post_fork,
+        'post_worker_init': post_worker_init,
+        'child_exit': child_exit,
+        'on_exit': on_exit,
+    }).run()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Pre-fork gunicorn server for the Redline simulation API.")
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=int(os.environ.get('PORT', 5000)))
+    parser.add_argument('--workers', type=int, default=SERVE_WORKERS)
+    parser.add_argument('--threads', type=int, default=SERVE_THREADS)
+    args = parser.parse_args()
+
+    serve(args.host, args.port, args.workers, args.threads)
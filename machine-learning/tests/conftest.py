@@ -0,0 +1,33 @@
+import os
+import tempfile
+
+import pytest
+
+# simulate_championship loads its tools at import: point it at a synthetic serving bundle and the NumPy
+# backend so the tests never reach PostgreSQL or TensorFlow.
+BUNDLE_PATH = os.path.join(tempfile.mkdtemp(prefix='redline-tests-'), "serving_bundle.npz")
+os.environ['REDLINE_SERVING_BUNDLE'] = BUNDLE_PATH
+os.environ['REDLINE_INFERENCE_BACKEND'] = 'numpy'
+
+
+@pytest.fixture(scope='session')
+def synthetic_fixture():
+    from benchmarks.synthetic import simulation_fixture
+    from src.model.serving_bundle import save_serving_bundle
+
+    fixture = simulation_fixture(seasons=3)
+    features_df, model, scaler, driver_encoder, constructor_encoder, noise_factor, snapshot = fixture
+    save_serving_bundle(BUNDLE_PATH, snapshot, noise_factor, driver_encoder, constructor_encoder)
+    return fixture
+
+
+@pytest.fixture
+def simulation_runner(synthetic_fixture, monkeypatch):
+    from src.model import simulate_championship as sc
+
+    features_df, model, scaler, driver_encoder, constructor_encoder, noise_factor, snapshot = synthetic_fixture
+    for name, value in (('MODEL', model), ('SCALER', scaler), ('DRIVER_ENC', driver_encoder),
+                        ('CONSTRUCTOR_ENC', constructor_encoder), ('NOISE_FACTOR', noise_factor),
+                        ('FEATURE_SNAPSHOT', snapshot), ('SIM_WORKERS', 1), ('SIM_SEED', None)):
+        monkeypatch.setattr(sc, name, value)
+    return sc
@@ -0,0 +1,80 @@
+import pytest
+
+from benchmarks.synthetic import simulation_request
+
+
+@pytest.fixture
+def client(simulation_runner, monkeypatch):
+    from src import app as app_module
+
+    monkeypatch.setattr(simulation_runner, 'N_SIMULATIONS', 2000)
+    monkeypatch.setattr(simulation_runner, 'FEATURE_REFRESH_SECONDS', 0)
+    monkeypatch.setattr(app_module, 'served_feature_version', simulation_runner.FEATURE_SNAPSHOT.version)
+    app_module.result_cache.invalidate()
+    return app_module.app.test_client()
+
+
+def request_body(**fields):
+    standings, races = simulation_request(n_drivers=20, remaining_rounds=4, sprints=1)
+    return {'currentStandings': standings, 'remainingRaces': races, **fields}
+
+
+@pytest.mark.parametrize('fields', [
+    {'tolerance': 'tight'},
+    {'tolerance': -0.5},
+    {'maxSimulations': 0},
+    {'maxSimulations': 2500.5},
+    {'maxSimulations': True},
+    {'timeBudget': '10'},
+    {'timeBudget': -1},
+])
+def test_invalid_adaptive_options_are_rejected(client, fields):
+    for path in ('/simulate', '/jobs/simulate'):
+        response = client.post(path, json=request_body(**fields))
+        assert response.status_code == 400
+        assert 'error' in response.get_json()
+
+
+def test_max_simulations_is_clamped_to_the_configured_ceiling(client, simulation_runner, monkeypatch):
+    monkeypatch.setattr(simulation_runner, 'ADAPTIVE_MAX_SIMULATIONS', 3000)
+    monkeypatch.setattr(simulation_runner, 'ADAPTIVE_BATCH_SIMULATIONS', 1000)
+
+    response = client.post('/simulate', json=request_body(maxSimulations=10 ** 9))
+    assert response.status_code == 200
+    simulation = response.get_json()['simulation']
+    assert simulation['simulations'] == 3000
+    assert simulation['stopReason'] == 'maxSimulations'
+
+
+@pytest.mark.parametrize('scenario', [
+    {'name': 'no round', 'removeEvents': [{'type': 'S'}]},
+    {'name': 'bad round', 'removeEvents': [{'round': 'last'}]},
+    {'name': 'bad type', 'removeEvents': [{'round': 22, 'type': 'Q'}]},
+    {'name': 'bad race', 'addRaces': [{'Sprint': {}}]},
+    {'name': 'bad delta', 'pointsAdjustments': {'driver_00': 'ten'}},
+    {'name': 'unknown driver', 'pointsAdjustments': {'nobody': 5}},
+    {'name': 'bad change', 'constructorChanges': {'driver_00': 7}},
+    'not an object',
+])
+def test_malformed_scenarios_are_rejected(client, scenario):
+    response = client.post('/simulate/batch', json=request_body(scenarios=[{'name': 'base'}, scenario]))
+    assert response.status_code == 400
+    body = response.get_json()
+    assert list(body['scenarioErrors']) == [scenario['name'] if isinstance(scenario, dict) else 'scenario_1']
+
+
+def test_batch_cache_key_follows_the_inference_backend_only(client, simulation_runner, monkeypatch):
+    from src import app as app_module
+
+    body = request_body(scenarios=[{'name': 'base'}, {'name': 'penalty', 'pointsAdjustments': {'driver_00': -10}}])
+    assert client.post('/simulate/batch', json=body).status_code == 200
+    misses = app_module.result_cache.stats()['misses']
+
+    # Scenario batches are tabulated whatever the inference mode, so the cached result still applies.
+    monkeypatch.setattr(simulation_runner, 'INFERENCE_MODE', 'full')
+    assert client.post('/simulate/batch', json=body).status_code == 200
+    assert app_module.result_cache.stats()['misses'] == misses
+
+    monkeypatch.setattr(simulation_runner, 'INFERENCE_BACKEND', 'keras')
+    assert client.post('/simulate/batch', json=body).status_code == 200
+    assert app_module.result_cache.stats()['misses'] == misses + 1
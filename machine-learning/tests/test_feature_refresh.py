@@ -0,0 +1,47 @@
+import multiprocessing
+
+from src.model.feature_snapshot import build_feature_snapshot, data_version
+
+
+def test_workers_rebuild_the_snapshot_once_and_adopt_it(simulation_runner, synthetic_fixture, monkeypatch, tmp_path):
+    features_df = synthetic_fixture[0]
+    last_year = features_df['race_year'].max()
+    last_round = features_df.loc[features_df['race_year'] == last_year, 'race_round'].max()
+    before_ingestion = features_df[(features_df['race_year'] < last_year) | (features_df['race_round'] < last_round)]
+    monkeypatch.setattr(simulation_runner, 'FEATURE_SNAPSHOT', build_feature_snapshot(
+        before_ingestion, simulation_runner.DRIVER_ENC, simulation_runner.CONSTRUCTOR_ENC))
+
+    history_loads = tmp_path / "history_loads"
+
+    def load_history():
+        with open(history_loads, 'a') as f:
+            f.write("load\n")
+        return features_df
+
+    monkeypatch.setattr(simulation_runner, 'FEATURE_SHARE_DIR', str(tmp_path / "features"))
+    monkeypatch.setattr(simulation_runner, 'load_historical_data_for_features', load_history)
+    monkeypatch.setattr(simulation_runner.data_loader, 'FEATURE_SOURCE', 'pandas')
+    monkeypatch.setattr(simulation_runner.data_loader, 'fetch_ingestion_watermark', lambda: (1, 1, 'now'))
+    monkeypatch.setattr(simulation_runner.data_loader, 'fetch_data_version', lambda: data_version(features_df))
+
+    context = multiprocessing.get_context('fork')
+    start = context.Barrier(3)
+    outcomes = context.Queue()
+
+    def worker():
+        start.wait()
+        changed = simulation_runner.check_feature_snapshot(force=True)
+        outcomes.put((changed, simulation_runner.FEATURE_SNAPSHOT.version,
+                      simulation_runner.refreshed_feature_version is not None))
+
+    workers = [context.Process(target=worker) for _ in range(3)]
+    for process in workers:
+        process.start()
+    results = [outcomes.get(timeout=60) for _ in workers]
+    for process in workers:
+        process.join()
+
+    assert history_loads.read_text().count("load") == 1
+    assert all(changed and version == data_version(features_df) for changed, version, _ in results)
+    # Only the worker that rebuilt it invalidates the shared result cache.
+    assert sum(rebuilt for _, _, rebuilt in results) == 1
@@ -0,0 +1,58 @@
+import json
+import os
+import subprocess
+import sys
+import threading
+
+from src.jobs import SimulationJobQueue
+
+
+def blocking_simulation(release, progress=None):
+    progress(0.5)
+    release.wait(10)
+    return {'driver_00': 100.0}
+
+
+def wait_for(queue, job_id, status):
+    for _ in range(200):
+        job = queue.get(job_id)
+        if job['status'] == status:
+            return job
+        threading.Event().wait(0.01)
+    raise AssertionError(f"job {job_id} never reached {status}")
+
+
+def test_jobs_are_visible_to_every_queue_sharing_the_directory(tmp_path):
+    # Two queues on one directory stand in for two server workers behind one socket.
+    owner = SimulationJobQueue(max_workers=1, store_dir=str(tmp_path))
+    other = SimulationJobQueue(max_workers=1, store_dir=str(tmp_path))
+    release = threading.Event()
+
+    job = owner.submit('key', blocking_simulation, release)
+    wait_for(other, job['jobId'], 'running')
+
+    duplicate = other.submit('key', blocking_simulation, release)
+    assert duplicate['jobId'] == job['jobId'] and duplicate['deduplicated']
+    assert other.stats()['jobs'] == {'running': 1}
+
+    release.set()
+    finished = wait_for(other, job['jobId'], 'done')
+    assert finished['result'] == {'driver_00': 100.0}
+    assert other.get('../../etc/passwd') is None
+
+
+def test_jobs_of_a_dead_process_are_reported_failed(tmp_path):
+    queue = SimulationJobQueue(max_workers=1, store_dir=str(tmp_path))
+    exited = subprocess.run([sys.executable, '-c', 'import os; print(os.getpid())'], capture_output=True, text=True)
+    job_id = 'ab' * 16
+    with open(os.path.join(tmp_path, f"{job_id}.json"), 'w') as f:
+        json.dump({'id': job_id, 'key': 'key', 'status': 'running', 'progress': 0.3, 'result': None, 'error': None,
+                   'created_at': 0.0, 'finished_at': None, 'pid': int(exited.stdout)}, f)
+    with open(os.path.join(tmp_path, "in_flight", 'key'), 'w') as f:
+        f.write(job_id)
+
+    assert queue.get(job_id)['status'] == 'failed'
+    # The stale in-flight marker no longer deduplicates new submissions.
+    release = threading.Event()
+    release.set()
+    assert queue.submit('key', blocking_simulation, release)['jobId'] != job_id
@@ -0,0 +1,76 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+tf = pytest.importorskip('tensorflow')
+
+from sklearn.preprocessing import StandardScaler
+
+from src.model.numpy_backend import MODEL_DIR, NUMPY_WEIGHTS_PATH, NumpyPointsModel, export_numpy_weights
+
+N_ROWS = 20000
+ATOL = 1e-4
+RTOL = 1e-4
+
+
+def random_inputs(rng, n_drivers, n_constructors, n_rows=N_ROWS):
+    num_features = np.column_stack([
+        rng.integers(1, 21, n_rows),
+        rng.integers(1, 21, n_rows),
+        rng.uniform(0, 26, n_rows),
+        rng.uniform(0, 45, n_rows),
+    ]).astype(np.float64)
+    return num_features, rng.integers(0, n_drivers, n_rows), rng.integers(0, n_constructors, n_rows)
+
+
+def keras_points(model, scaler, num_features, driver_ids, constructor_ids):
+    if hasattr(scaler, 'feature_names_in_'):
+        num_features = pd.DataFrame(num_features, columns=scaler.feature_names_in_)
+    return model.predict([scaler.transform(num_features).astype(np.float32), driver_ids, constructor_ids],
+                         batch_size=4096, verbose=0)
+
+
+def test_exported_weights_match_keras(tmp_path):
+    from src.model.model_trainer import build_model
+
+    rng = np.random.default_rng(0)
+    tf.keras.utils.set_random_seed(0)
+    vocabs = {'driverid': 37, 'constructorid': 13}
+    model = build_model(vocabs, num_features_shape=4)
+    # Non-zero biases, so the folded first-layer bias is exercised too.
+    model.set_weights([rng.normal(0, 0.3, weights.shape).astype(np.float32) for weights in model.get_weights()])
+
+    num_features, driver_ids, constructor_ids = random_inputs(rng, vocabs['driverid'], vocabs['constructorid'])
+    scaler = StandardScaler().fit(num_features)
+
+    weights_path = os.path.join(tmp_path, "model_weights.npz")
+    export_numpy_weights(model, scaler, weights_path)
+    numpy_model = NumpyPointsModel.load(weights_path)
+
+    expected = keras_points(model, scaler, num_features, driver_ids, constructor_ids)
+    # Odd batch size, so the last partial batch goes through the preallocated buffers as well.
+    actual = numpy_model.predict([num_features, driver_ids, constructor_ids], batch_size=1000 + 7)
+    np.testing.assert_allclose(actual, expected, atol=ATOL, rtol=RTOL)
+
+
+@pytest.mark.skipif(not all(os.path.exists(path) for path in (NUMPY_WEIGHTS_PATH,
+                                                                   os.path.join(MODEL_DIR, "model.keras"),
+                                                                   os.path.join(MODEL_DIR, "scaler.joblib"))),
+                    reason="No trained model artifacts.")
+def test_shipped_weights_match_shipped_model():
+    import joblib
+    from tensorflow.keras.models import load_model
+
+    model = load_model(os.path.join(MODEL_DIR, "model.keras"))
+    scaler = joblib.load(os.path.join(MODEL_DIR, "scaler.joblib"))
+    numpy_model = NumpyPointsModel.load(NUMPY_WEIGHTS_PATH)
+
+    n_drivers = model.get_layer("embedding_driver").input_dim
+    n_constructors = model.get_layer("embedding_constructor").input_dim
+    num_features, driver_ids, constructor_ids = random_inputs(np.random.default_rng(1), n_drivers, n_constructors)
+
+    expected = keras_points(model, scaler, num_features, driver_ids, constructor_ids)
+    actual = numpy_model.predict([num_features, driver_ids, constructor_ids])
+    np.testing.assert_allclose(actual, expected, atol=ATOL, rtol=RTOL)
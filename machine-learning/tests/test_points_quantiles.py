@@ -0,0 +1,25 @@
+import numpy as np
+
+
+def test_histogram_quantiles_match_exact_percentiles(simulation_runner):
+    sc = simulation_runner
+    rng = np.random.default_rng(7)
+    n_events, n_drivers = 10, 6
+    current_points = rng.uniform(0, 200, n_drivers)
+    season_points = rng.gamma(4.0, 25.0, size=(40000, n_drivers))
+    final_standings = season_points + current_points
+    constructor_index = np.arange(n_drivers) // 2
+
+    reduction = None
+    for chunk in np.array_split(final_standings, 16):
+        chunk_reduction = sc.reduce_standings(chunk, ['pointsQuantiles'], constructor_index, 3, current_points,
+                                              n_events)
+        reduction = chunk_reduction if reduction is None else sc.merge_reductions([reduction, chunk_reduction])
+
+    # Merging chunks sums fixed-size counts instead of keeping every simulated standing.
+    assert reduction['pointsQuantiles'].shape == (n_drivers, sc.points_histogram_bins(n_events))
+    assert reduction['pointsQuantiles'].sum() == final_standings.size
+
+    quantiles = sc.histogram_percentiles(reduction['pointsQuantiles'], sc.POINTS_PERCENTILES) + current_points
+    exact = np.percentile(final_standings, sc.POINTS_PERCENTILES, axis=0)
+    np.testing.assert_allclose(quantiles, exact, atol=sc.POINTS_BIN_WIDTH)
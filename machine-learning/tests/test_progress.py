@@ -0,0 +1,19 @@
+from benchmarks.synthetic import simulation_request
+
+
+def test_adaptive_progress_follows_the_stopping_rule(simulation_runner, monkeypatch):
+    monkeypatch.setattr(simulation_runner, 'ADAPTIVE_BATCH_SIMULATIONS', 1000)
+    standings, races = simulation_request(n_drivers=20, remaining_rounds=4, sprints=1)
+    reports = []
+
+    result = simulation_runner.run_full_simulation(
+        standings, races, tolerance=1.0, outputs=['winner'],
+        progress=lambda fraction, **details: reports.append((fraction, details)))
+
+    assert result['simulation']['stopReason'] == 'tolerance'
+    fractions = [fraction for fraction, _ in reports]
+    assert fractions == sorted(fractions) and fractions[-1] == 1.0
+    # Measured against the projected stop rather than the 500000-simulation ceiling.
+    assert fractions[len(fractions) // 2] > 0.3
+    assert reports[-1][1]['simulations'] == result['simulation']['simulations']
+    assert reports[-1][1]['precision'] is not None
@@ -0,0 +1,34 @@
+import multiprocessing
+
+from src.result_cache import ResultCache
+
+
+def in_other_worker(function):
+    # A forked child shares the cache's counters and generation, like a worker of the pre-fork server.
+    process = multiprocessing.get_context('fork').Process(target=function)
+    process.start()
+    process.join()
+    assert process.exitcode == 0
+
+
+def test_invalidating_one_key_keeps_other_workers_entries(tmp_path):
+    cache = ResultCache(disk_dir=str(tmp_path))
+    cache.put('kept', {'driver_00': 60.0})
+    cache.put('dropped', {'driver_00': 40.0})
+
+    in_other_worker(lambda: cache.invalidate('dropped'))
+
+    assert cache.get('kept') == {'driver_00': 60.0}
+    assert cache.get('dropped') is None
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['entries']) == (1, 1, 1)
+
+
+def test_full_invalidation_reaches_other_workers(tmp_path):
+    cache = ResultCache(disk_dir=str(tmp_path))
+    cache.put('key', {'driver_00': 60.0})
+
+    in_other_worker(lambda: cache.invalidate())
+
+    assert cache.get('key') is None
+    assert cache.stats()['disk_entries'] == 0
@@ -0,0 +1,97 @@
+import numpy as np
+import pytest
+
+from benchmarks.synthetic import simulation_request
+
+N_DRIVERS = 20
+REMAINING_ROUNDS = 6
+REMAINING_SPRINTS = 2
+REFERENCE_SIMULATIONS = 3000
+VECTORIZED_SIMULATIONS = 20000
+# Two independent samples of one distribution: allow 5 standard errors of the difference per probability.
+Z_TOLERANCE = 5.0
+
+
+def close_race_request():
+    standings, races = simulation_request(N_DRIVERS, REMAINING_ROUNDS, REMAINING_SPRINTS)
+    # A tight gap at the top, so several drivers have a real chance and the comparison is not all zeros.
+    for idx, standing in enumerate(standings):
+        standing['points'] = float(max(0, 120 - 6 * idx))
+    return standings, races
+
+
+def reference_simulation(sc, standings, races, n_sims, seed):
+    # The original algorithm, one simulated season at a time.
+    rng = np.random.default_rng(seed)
+    driver_ids = [s['driver']['driverId'] for s in standings]
+    constructors = {s['driver']['driverId']: s['constructor']['constructorId'] for s in standings}
+    current_points = np.array([s['points'] for s in standings])
+    features = sc.prepare_simulation_features(sc.FEATURE_SNAPSHOT, driver_ids, constructors)
+    n_events = len(sc.parse_remaining_events(races))
+    n_drivers = len(driver_ids)
+
+    winners = np.zeros(n_drivers)
+    positions = np.zeros((n_drivers, n_drivers))
+    for _ in range(n_sims):
+        season_points = current_points.copy()
+        for _ in range(n_events):
+            grid = np.round(np.clip(rng.normal(features['q_proxy'].values, features['q_stdev'].values), 1, 20))
+            num_features = np.column_stack([grid, grid, features['driver_points_roll_5'].values,
+                                            features['constructor_points_roll_5'].values])
+            predicted = sc.predict_points(num_features, features['driver_encoded'].values,
+                                          features['constructor_encoded'].values).reshape(-1)
+            points = np.maximum(0, predicted + rng.normal(0, sc.NOISE_FACTOR, n_drivers))
+            points[rng.random(n_drivers) < features['dnf_rate'].values] = 0.0
+            season_points += points
+
+        winners[np.argmax(season_points)] += 1
+        finishing_order = np.argsort(-season_points, kind='stable')
+        positions[finishing_order, np.arange(n_drivers)] += 1
+
+    return driver_ids, winners / n_sims, positions / n_sims
+
+
+def assert_same_distribution(reference, vectorized, label):
+    pooled = (reference * REFERENCE_SIMULATIONS + vectorized * VECTORIZED_SIMULATIONS) / (
+        REFERENCE_SIMULATIONS + VECTORIZED_SIMULATIONS)
+    standard_error = np.sqrt(pooled * (1 - pooled) * (1 / REFERENCE_SIMULATIONS + 1 / VECTORIZED_SIMULATIONS))
+    # The floor keeps cells that are zero in one sample and rare in the other from failing on a single hit.
+    allowed = Z_TOLERANCE * np.maximum(standard_error, 1 / REFERENCE_SIMULATIONS)
+    worst = np.max(np.abs(reference - vectorized) - allowed)
+    assert worst <= 0, f"{label} probabilities differ from the reference loop by {worst:.4f} beyond tolerance"
+
+
+@pytest.fixture(scope='module')
+def reference_results(synthetic_fixture):
+    from src.model import simulate_championship as sc
+
+    features_df, model, scaler, driver_encoder, constructor_encoder, noise_factor, snapshot = synthetic_fixture
+    saved = (sc.MODEL, sc.SCALER, sc.DRIVER_ENC, sc.CONSTRUCTOR_ENC, sc.NOISE_FACTOR, sc.FEATURE_SNAPSHOT)
+    sc.MODEL, sc.SCALER, sc.DRIVER_ENC, sc.CONSTRUCTOR_ENC = model, scaler, driver_encoder, constructor_encoder
+    sc.NOISE_FACTOR, sc.FEATURE_SNAPSHOT = noise_factor, snapshot
+    try:
+        standings, races = close_race_request()
+        return reference_simulation(sc, standings, races, REFERENCE_SIMULATIONS, seed=1234)
+    finally:
+        (sc.MODEL, sc.SCALER, sc.DRIVER_ENC, sc.CONSTRUCTOR_ENC, sc.NOISE_FACTOR, sc.FEATURE_SNAPSHOT) = saved
+
+
+@pytest.mark.parametrize('inference_mode', ['tabulated', 'full', 'fused'])
+def test_inference_modes_match_reference_loop(simulation_runner, reference_results, monkeypatch, inference_mode):
+    if inference_mode == 'fused' and not simulation_runner.NUMBA_AVAILABLE:
+        pytest.skip("The fused inference mode requires numba.")
+    monkeypatch.setattr(simulation_runner, 'N_SIMULATIONS', VECTORIZED_SIMULATIONS)
+
+    driver_ids, reference_winners, reference_positions = reference_results
+    standings, races = close_race_request()
+    results = simulation_runner.run_full_simulation(standings, races, inference_mode=inference_mode, seed=42,
+                                                    outputs=['winner', 'positions'])
+    assert 'error' not in results
+
+    winners = np.array([results['winner'].get(driver_id, 0.0) for driver_id in driver_ids]) / 100.0
+    positions = np.array([results['positions'][driver_id] for driver_id in driver_ids]) / 100.0
+    assert results['simulation']['simulations'] == VECTORIZED_SIMULATIONS
+    assert reference_winners.max() < 0.9, "the test scenario should leave the title open"
+
+    assert_same_distribution(reference_winners, winners, f"{inference_mode} winner")
+    assert_same_distribution(reference_positions, positions, f"{inference_mode} position")